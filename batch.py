@@ -0,0 +1,181 @@
+import os
+import sys
+import json
+import time
+import argparse
+import datetime
+import multiprocessing
+import concurrent.futures
+
+import berth_solver
+import fleet_loader
+import port_layout
+import portfolio
+import quay_geometry
+import scene_file
+import solver_cache
+
+# Batch planning without a GUI, for nightly re-plans of the days ahead:
+#
+#   python main.py batch --fleet ships --scene season.scn --first 2026-06-01
+#
+# Ships, the scene file and the quay are read the same way the planner reads
+# them. Every day of the range the scene file has a plan for is solved in a
+# pool of worker processes, one day per worker, going through the solver
+# cache first like the scheduler does. Each plan is written to
+# <out>/<day>.json.
+#
+# Headless, nothing in here may import Qt.
+
+DEFAULT_DAYS = 14 # Days planned from --first when --last is not given
+OUTPUT_PATH = os.path.join(os.getcwd(), "plans")
+
+# Workers are forked where the platform can, a spawned worker would run the
+# __main__ module again, and main.py imports Qt
+def _context():
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return multiprocessing.get_context("spawn")
+
+# Calls of a day's plan and the name of each one's ship. Ships are taken
+# from the fleet, or from the plan's own copy for ships the fleet lacks.
+# Ships with missing values are left out and named in `skipped`.
+def day_calls(plan: scene_file.DayPlan, store) -> tuple[list[berth_solver.Call], list[str],
+                                                          list[str]]:
+    calls, names, skipped = [], [], []
+    for i in range(len(plan)):
+        row = plan.slots[i]
+        name = plan.names[row["ship"]]
+        ship = store.find(name)
+        if ship is None:
+            ship = store.add_from_dict(name, plan.ship_dict(int(row["ship"])))
+        if not store.is_valid(ship):
+            skipped.append(name)
+            continue
+        calls.append(berth_solver.Call.from_store(store, ship, f"{len(calls)}: {name}",
+                                                  int(row["arrival"]), int(row["departure"])))
+        names.append(name)
+    return calls, names, skipped
+
+# Runs in a worker. Plans come from the cache when it has them, otherwise
+# from a warm start or a search, returned as the arrays of a Solution.
+def _solve(problem: berth_solver.Problem, deadline: float, cache_path: str) -> tuple:
+    cache = solver_cache.SolverCache(cache_path)
+    solution = cache.get(problem)
+    if solution is None:
+        solution = cache.warm_start(problem)
+        if solution is None or not solution.feasible:
+            searched = berth_solver.Solver(problem, portfolio.MAX_NODES,
+                                           deadline=time.time() + deadline,
+                                           **portfolio.STRATEGIES[0]).solve()
+            if solution is None or searched.dropped <= solution.dropped:
+                solution = searched
+        try:
+            cache.put(problem, solution)
+        except OSError:
+            pass # Only a lost speed up
+    return solution.starts, solution.sides, solution.bollards, solution.nodes, solution.optimal
+
+# Plan of a day as JSON. Times are seconds from midnight, chainages feet,
+# bollards the ids of the port layout's registry.
+def plan_dict(day: datetime.date, solution: berth_solver.Solution, names: list[str],
+              skipped: list[str]) -> dict:
+    quay = solution.problem.quay
+    berths = solution.berths()
+    calls = []
+    for call, name in zip(solution.problem.calls, names):
+        entry = {"ship": name, "arrival": int(call.arrival),
+                 "departure": int(call.departure), "berth": None}
+        berth = berths.get(call.name)
+        if berth is not None:
+            rows = quay.registry.lookup(berth.bollards)
+            entry["berth"] = {"start": berth.start, "end": berth.end,
+                              "side": ("port", "starboard")[berth.side],
+                              "bollards": [quay.registry.ids[row] for row in rows.tolist()
+                                           if row >= 0]}
+        calls.append(entry)
+    return {"day": day.isoformat(), "calls": calls, "dropped": solution.dropped,
+            "optimal": bool(solution.optimal), "skipped": skipped}
+
+# Write next to the target first, so a reader never sees half a plan
+def write_json(path: str, data: dict):
+    temp = f"{path}.tmp"
+    with open(temp, "w") as file:
+        json.dump(data, file, indent=2)
+    os.replace(temp, path)
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="main.py batch",
+                                     description="Solve the berth plans of a range of days.")
+    parser.add_argument("--fleet", required=True, help="directory of ship .json files")
+    parser.add_argument("--scene", required=True, help="scene file with the days to plan")
+    parser.add_argument("--first", type=datetime.date.fromisoformat,
+                        default=datetime.date.today(), help="first day, YYYY-MM-DD (today)")
+    parser.add_argument("--last", type=datetime.date.fromisoformat,
+                        help=f"last day, YYYY-MM-DD (first day + {DEFAULT_DAYS - 1})")
+    parser.add_argument("--out", default=OUTPUT_PATH, help="directory for the JSON plans")
+    parser.add_argument("--deadline", type=float, default=portfolio.DEADLINE,
+                        help="seconds of search per day")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--cache", default=solver_cache.CACHE_PATH,
+                        help="solver cache directory")
+    args = parser.parse_args(argv)
+    if args.last is None:
+        args.last = args.first + datetime.timedelta(days=DEFAULT_DAYS - 1)
+    return args
+
+# Returns the exit code: 0 once every day was written, 1 otherwise,
+# including when the range holds no planned day
+def main(argv: list[str]) -> int:
+    args = parse_args(argv)
+    # SceneFile starts an empty scene at a new path, which is not what a
+    # mistyped path means here
+    if not os.path.isfile(args.scene):
+        print(f"{args.scene}: no such scene file", file=sys.stderr)
+        return 1
+    store, report = fleet_loader.load_library(args.fleet)
+    for name, error in report.errors.items():
+        print(f"{name}: {error}", file=sys.stderr)
+    try:
+        scene = scene_file.SceneFile(args.scene)
+    except (OSError, scene_file.SceneError) as error:
+        print(error, file=sys.stderr)
+        return 1
+    days = [day for day in scene.days() if args.first <= day <= args.last]
+    if not days:
+        print(f"{args.scene}: no planned days from {args.first} to {args.last}",
+              file=sys.stderr)
+        return 1
+    quay = berth_solver.Quay.from_layout(port_layout.load_layout(), quay_geometry.load_edge())
+    os.makedirs(args.out, exist_ok=True)
+
+    failed = False
+    with concurrent.futures.ProcessPoolExecutor(args.workers, mp_context=_context()) as pool:
+        tasks = {}
+        for day in days:
+            try:
+                calls, names, skipped = day_calls(scene.load(day), store)
+            except scene_file.SceneError as error:
+                print(error, file=sys.stderr)
+                failed = True
+                continue
+            problem = berth_solver.Problem(calls, quay)
+            tasks[pool.submit(_solve, problem, args.deadline, args.cache)] = \
+                (day, problem, names, skipped)
+
+        for future in concurrent.futures.as_completed(tasks):
+            day, problem, names, skipped = tasks[future]
+            try:
+                solution = berth_solver.Solution(problem, *future.result())
+                write_json(os.path.join(args.out, f"{day.isoformat()}.json"),
+                           plan_dict(day, solution, names, skipped))
+            except (OSError, concurrent.futures.process.BrokenProcessPool) as error:
+                print(f"{day}: {error}", file=sys.stderr)
+                failed = True
+                continue
+            print(f"{day}: berthed {len(problem.calls) - solution.dropped} of "
+                  f"{len(problem.calls)} calls" + (f", {len(skipped)} skipped" if skipped else ""))
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,663 @@
+import heapq
+import typing
+import numpy as np
+
+from PySide6.QtCore import *
+from PySide6.QtGui import *
+from PySide6.QtWidgets import *
+
+import berth_solver
+import port_layout
+import tides
+
+# Gantt chart of the shown day's calls. Time runs left to right and every
+# berth of the quay is a row, split into as many lanes as it has calls
+# alongside at once. Calls without a berth share a row at the top.
+#
+# Calls are plain ShipCall records in a CallModel, so a season of them costs no
+# widgets. GanttView paints from arrays rebuilt only when the model changes,
+# and only the rows, hours and bars inside the viewport. Editing is in place
+# through delegates: a double click near either end of a bar edits arrival
+# or departure, anywhere else on it the ship. The bollards of a berthed call
+# are picked from the quay's registry through the bar's context menu.
+
+SECONDS_IN_DAY = 60 * 60 * 24
+DEFAULT_ARRIVAL = 7 * 3600 # Window of a newly added call
+DEFAULT_DEPARTURE = 18 * 3600
+BERTH_SECTION = 600.0 # Feet per row when the quay has no gangways to name berths after
+
+LABEL_WIDTH = 90 # Pixels
+HEADER_HEIGHT = 20
+LANE_HEIGHT = 22
+BAR_MARGIN = 3
+MIN_BAR_WIDTH = 3
+END_GRAB = 8 # Pixels at either end of a bar whose double click edits a time
+EDITOR_WIDTH = 90
+HOUR_WIDTH = 60 # Pixels per hour at the start, ctrl + wheel zooms
+MIN_HOUR_WIDTH = 6
+MAX_HOUR_WIDTH = 1920
+MIN_LABEL_SPACING = 40 # Pixels between hour labels
+
+SIDE_NAMES = {berth_solver.PORT: "port", berth_solver.STARBOARD: "starboard"}
+
+BOLLARD_ROWS = 10 # Rows shown by the bollard picker
+
+# Model columns
+SHIP, ARRIVAL, DEPARTURE, BERTH, BOLLARDS = range(5)
+HEADERS = ("Ship", "Arrival", "Departure", "Berth", "Bollards")
+
+seconds = lambda t = QTime: t.hour() * 3600 + t.minute() * 60 + t.second()
+clock = lambda s = int: QTime(0, 0).addSecs(int(s)).toString("HH:mm")
+
+# Labels and [c0, c1) chainage bounds of the berth rows, one per gangway
+# with the quay split halfway between them
+def berth_rows(quay: berth_solver.Quay) -> tuple[list[str], np.ndarray]:
+    gangways = quay.gangways
+    if len(gangways):
+        middles = (gangways.chainage[1:] + gangways.chainage[:-1]) / 2
+        bounds = np.concatenate(([0.0], middles, [quay.length]))
+        return [f"Berth {name}" for name in gangways.ids], bounds
+    bounds = np.append(np.arange(0, quay.length, BERTH_SECTION), quay.length)
+    return [f"{c0:g}-{c1:g} ft" for c0, c1 in zip(bounds[:-1], bounds[1:])], bounds
+
+# One call of the shown day
+class ShipCall:
+    __slots__ = ("ship", "arrival", "departure", "berth", "conflicts", "workable")
+
+    def __init__(self, ship=None, arrival: int = DEFAULT_ARRIVAL,
+                 departure: int = DEFAULT_DEPARTURE):
+        self.ship = ship # ship_editor.Ship, None until one is picked
+        self.arrival = arrival
+        self.departure = departure
+        self.berth = None
+        self.conflicts = 0
+        self.workable = None # Minutes of the day the doors can be worked, on the berth side
+
+    def window(self) -> tuple[int, int]:
+        return self.arrival, self.departure
+
+    # Has a ship with a complete set of values
+    def valid(self) -> bool:
+        return self.ship is not None and self.ship.is_valid()
+
+    def to_call(self, i: int) -> berth_solver.Call:
+        return berth_solver.Call.from_store(self.ship.store, self.ship.id,
+                                            f"{i}: {self.ship.text()}", *self.window())
+
+    # [start, end) seconds of the stretches of the stay when the tide puts
+    # every door out of gangway reach
+    def cut_off(self) -> np.ndarray:
+        if self.workable is None:
+            return np.zeros((0, 2), dtype=np.int64)
+        stay = np.zeros(len(self.workable), dtype=bool)
+        stay[self.arrival // tides.MINUTE:-(-self.departure // tides.MINUTE)] = True
+        return tides.windows(stay & ~self.workable)
+
+    def describe(self) -> str:
+        if self.berth is None:
+            return "Unassigned"
+        text = (f"{self.berth.start:g} - {self.berth.end:g} ft, "
+                f"{SIDE_NAMES[self.berth.side]} side to")
+        if self.conflicts:
+            text += f", clashes with {self.conflicts}"
+        cut_off = self.cut_off()
+        if len(cut_off):
+            text += ", no gangway " + ", ".join(f"{clock(t0)}-{clock(t1)}" for t0, t1 in cut_off)
+        return text
+
+# Table of the shown day's calls, a row per ShipCall. Bollards are edited as
+# rows of the quay's bollard registry.
+class CallModel(QAbstractTableModel):
+    window_changed = Signal(object) # ShipCall whose arrival or departure was edited
+    ship_changed = Signal(object) # ShipCall given another ship
+    bollards_changed = Signal(object) # ShipCall made fast to other bollards
+
+    def __init__(self, registry: port_layout.BollardRegistry, parent: QObject = None):
+        super().__init__(parent)
+        self.registry = registry
+        self.slots = []
+        self.ship_model = None # ship_editor.FleetModel ships are picked from
+
+    def set_ship_model(self, model: QAbstractItemModel):
+        self.ship_model = model
+
+    def set_slots(self, slots: list[ShipCall]):
+        self.beginResetModel()
+        self.slots = list(slots)
+        self.endResetModel()
+
+    # Append a slot, returns its row
+    def add_slot(self, slot: ShipCall) -> int:
+        row = len(self.slots)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.slots.append(slot)
+        self.endInsertRows()
+        return row
+
+    # Registry rows of a call's bollards, empty without a berth
+    def bollard_rows(self, slot: ShipCall) -> list[int]:
+        if slot.berth is None:
+            return []
+        return [row for row in self.registry.lookup(slot.berth.bollards).tolist() if row >= 0]
+
+    def bollard_text(self, slot: ShipCall) -> str:
+        return ", ".join(self.registry.ids[row] for row in self.bollard_rows(slot))
+
+    # Add a bollard to a berthed call, or take it off when it is already used
+    def toggle_bollard(self, row: int, bollard: int) -> bool:
+        rows = set(self.bollard_rows(self.slots[row]))
+        rows ^= {bollard}
+        return self.setData(self.index(row, BOLLARDS), sorted(rows))
+
+    # Call after berths, clashes or tide checks of the slots changed
+    def refresh(self):
+        if self.slots:
+            self.dataChanged.emit(self.index(0, 0),
+                                  self.index(len(self.slots) - 1, len(HEADERS) - 1))
+
+    @typing.override
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.slots)
+
+    @typing.override
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(HEADERS)
+
+    @typing.override
+    def headerData(self, section: int, orientation: Qt.Orientation,
+                   role: int = Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return HEADERS[section]
+        return None
+
+    @typing.override
+    def flags(self, index: QModelIndex) -> Qt.ItemFlag:
+        flags = Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable
+        if index.column() in (ARRIVAL, DEPARTURE) or (index.column() == SHIP and
+                                                     self.ship_model is not None):
+            flags |= Qt.ItemFlag.ItemIsEditable
+        if index.column() == BOLLARDS and self.slots[index.row()].berth is not None:
+            flags |= Qt.ItemFlag.ItemIsEditable
+        return flags
+
+    @typing.override
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        slot = self.slots[index.row()]
+        column = index.column()
+        name = slot.ship.text() if slot.ship is not None else "(no ship)"
+        if role == Qt.ItemDataRole.DisplayRole:
+            return (name, clock(slot.arrival), clock(slot.departure), slot.describe(),
+                    self.bollard_text(slot))[column]
+        if role == Qt.ItemDataRole.EditRole:
+            if column == SHIP:
+                return slot.ship.id if slot.ship is not None else -1
+            if column in (ARRIVAL, DEPARTURE):
+                return QTime(0, 0).addSecs(slot.window()[column - ARRIVAL])
+            if column == BOLLARDS:
+                return self.bollard_rows(slot)
+        if role == Qt.ItemDataRole.ToolTipRole:
+            text = f"{name}\n{clock(slot.arrival)} - {clock(slot.departure)}\n{slot.describe()}"
+            if slot.berth is not None:
+                text += f"\nBollards: {self.bollard_text(slot) or 'none'}"
+            return text
+        return None
+
+    @typing.override
+    def setData(self, index: QModelIndex, value, role: int = Qt.ItemDataRole.EditRole) -> bool:
+        if not index.isValid() or role != Qt.ItemDataRole.EditRole:
+            return False
+        slot = self.slots[index.row()]
+        column = index.column()
+        if column == SHIP:
+            ship = self.ship_model.ship(self.ship_model.ship_index(int(value)))
+            if ship is None or ship is slot.ship:
+                return False
+            slot.ship = ship
+        elif column in (ARRIVAL, DEPARTURE):
+            time = seconds(value)
+            if time == slot.window()[column - ARRIVAL]:
+                return False
+            if column == ARRIVAL:
+                slot.arrival = time
+            else:
+                slot.departure = time
+        elif column == BOLLARDS:
+            rows = sorted(set(int(row) for row in value))
+            if slot.berth is None or rows == self.bollard_rows(slot):
+                return False
+            slot.berth.bollards = self.registry.chainage[np.array(rows, dtype=np.int64)]
+        else:
+            return False
+        self.dataChanged.emit(self.index(index.row(), 0),
+                              self.index(index.row(), len(HEADERS) - 1))
+        if column == SHIP:
+            self.ship_changed.emit(slot)
+        elif column == BOLLARDS:
+            self.bollards_changed.emit(slot)
+        else:
+            self.window_changed.emit(slot)
+        return True
+
+class GanttView(QAbstractItemView):
+    def __init__(self, quay: berth_solver.Quay, parent: QObject = None):
+        super().__init__(parent)
+        self.labels, self.bounds = berth_rows(quay)
+        self.labels.insert(0, "Unassigned")
+        self.scale = HOUR_WIDTH / 3600 # Pixels per second
+        self.time = None # Marked with a line, the timeline's time
+        self._dirty = True
+        self._arrival = np.zeros(0)
+        self._departure = np.zeros(0)
+        self._top = np.zeros(0) # Bar tops in content pixels
+        self._row_top = np.zeros(1) # Row tops in content pixels, and the bottom of the last
+
+        self.setSelectionMode(self.SelectionMode.ExtendedSelection)
+        self.setSelectionBehavior(self.SelectionBehavior.SelectRows)
+        self.setEditTriggers(self.EditTrigger.DoubleClicked | self.EditTrigger.EditKeyPressed)
+        self.setItemDelegateForColumn(SHIP, self.ShipDelegate(self))
+        self.setItemDelegateForColumn(ARRIVAL, self.TimeDelegate(self))
+        self.setItemDelegateForColumn(DEPARTURE, self.TimeDelegate(self))
+        self.setItemDelegateForColumn(BOLLARDS, self.BollardDelegate(self))
+        self.horizontalScrollBar().setSingleStep(HOUR_WIDTH // 4)
+        self.verticalScrollBar().setSingleStep(LANE_HEIGHT)
+        self.setMinimumHeight(HEADER_HEIGHT + 6 * LANE_HEIGHT)
+
+    @typing.override
+    def setModel(self, model: QAbstractItemModel):
+        super().setModel(model)
+        for signal in (model.modelReset, model.rowsInserted, model.rowsRemoved,
+                       model.dataChanged, model.layoutChanged):
+            signal.connect(self._invalidate)
+        self._invalidate()
+
+    @Slot()
+    def _invalidate(self):
+        self._dirty = True
+        self.updateGeometries()
+        self.viewport().update()
+
+    @Slot(int)
+    def set_time(self, time: int):
+        self.time = time
+        self.viewport().update()
+
+    # Row and lane of every bar. Rows follow the middle of the berth, lanes
+    # are handed out in order of arrival, each call taking the lowest lane
+    # free by then.
+    def _layout(self):
+        if not self._dirty:
+            return
+        self._dirty = False
+        slots = self.model().slots if self.model() is not None else []
+        n = len(slots)
+        self._arrival = np.array([slot.arrival for slot in slots], dtype=np.float64)
+        self._departure = np.array([slot.departure for slot in slots], dtype=np.float64)
+        middle = np.array([np.nan if slot.berth is None else
+                           (slot.berth.start + slot.berth.end) / 2 for slot in slots])
+        rows = np.where(np.isnan(middle), 0,
+                        np.searchsorted(self.bounds[1:-1], middle, side="right") + 1)
+
+        lanes = np.zeros(n, dtype=np.int64)
+        counts = np.ones(len(self.labels), dtype=np.int64)
+        busy = [[] for _ in self.labels] # (departure, lane) of bars still alongside
+        free = [[] for _ in self.labels]
+        for i in np.lexsort((self._arrival, rows)).tolist():
+            row = rows[i]
+            while busy[row] and busy[row][0][0] <= self._arrival[i]:
+                heapq.heappush(free[row], heapq.heappop(busy[row])[1])
+            lane = heapq.heappop(free[row]) if free[row] else (counts[row] if busy[row] else 0)
+            counts[row] = max(counts[row], lane + 1)
+            heapq.heappush(busy[row], (self._departure[i], lane))
+            lanes[i] = lane
+        self._row_top = HEADER_HEIGHT + np.concatenate(([0], np.cumsum(counts))) * LANE_HEIGHT
+        self._top = self._row_top[rows] + lanes * LANE_HEIGHT
+
+    # Bar of a model row in viewport pixels
+    def _bar(self, row: int) -> QRect:
+        self._layout()
+        x0 = self._arrival[row] * self.scale
+        x1 = max(self._departure[row] * self.scale, x0 + MIN_BAR_WIDTH)
+        left = LABEL_WIDTH + x0 - self.horizontalOffset()
+        top = self._top[row] + BAR_MARGIN - self.verticalOffset()
+        return QRect(int(left), int(top), int(x1 - x0), LANE_HEIGHT - 2 * BAR_MARGIN)
+
+    # Model rows of the bars meeting a rectangle of the viewport
+    def _bars_in(self, rect: QRect) -> np.ndarray:
+        self._layout()
+        hoffset, voffset = self.horizontalOffset(), self.verticalOffset()
+        t0 = (rect.left() - LABEL_WIDTH + hoffset) / self.scale
+        t1 = (rect.right() + 1 - LABEL_WIDTH + hoffset) / self.scale
+        y0, y1 = rect.top() + voffset, rect.bottom() + 1 + voffset
+        end = np.maximum(self._departure, self._arrival + MIN_BAR_WIDTH / self.scale)
+        return np.flatnonzero((self._arrival < t1) & (end > t0) &
+                              (self._top + BAR_MARGIN < y1) &
+                              (self._top + LANE_HEIGHT - BAR_MARGIN > y0))
+
+    @typing.override
+    def visualRect(self, index: QModelIndex) -> QRect:
+        if not index.isValid():
+            return QRect()
+        bar = self._bar(index.row())
+        if index.column() == ARRIVAL:
+            return QRect(bar.left(), bar.top(), EDITOR_WIDTH, bar.height())
+        if index.column() == DEPARTURE:
+            return QRect(bar.right() - EDITOR_WIDTH, bar.top(), EDITOR_WIDTH, bar.height())
+        if index.column() == BOLLARDS:
+            return QRect(bar.left(), bar.top(), max(bar.width(), 2 * EDITOR_WIDTH),
+                         BOLLARD_ROWS * LANE_HEIGHT)
+        return QRect(bar.left(), bar.top(), max(bar.width(), 2 * EDITOR_WIDTH), bar.height())
+
+    @typing.override
+    def indexAt(self, point: QPoint) -> QModelIndex:
+        if point.x() < LABEL_WIDTH or point.y() < HEADER_HEIGHT:
+            return QModelIndex()
+        rows = self._bars_in(QRect(point, QSize(1, 1)))
+        return self.model().index(int(rows[-1]), SHIP) if len(rows) else QModelIndex()
+
+    @typing.override
+    def scrollTo(self, index: QModelIndex, hint=QAbstractItemView.ScrollHint.EnsureVisible):
+        if not index.isValid():
+            return
+        bar = self._bar(index.row())
+        area = self.viewport().rect().adjusted(LABEL_WIDTH, HEADER_HEIGHT, 0, 0)
+        horizontal, vertical = self.horizontalScrollBar(), self.verticalScrollBar()
+        if bar.left() < area.left() or bar.width() > area.width():
+            horizontal.setValue(horizontal.value() + bar.left() - area.left())
+        elif bar.right() > area.right():
+            horizontal.setValue(horizontal.value() + bar.right() - area.right())
+        if bar.top() < area.top():
+            vertical.setValue(vertical.value() + bar.top() - area.top())
+        elif bar.bottom() > area.bottom():
+            vertical.setValue(vertical.value() + bar.bottom() - area.bottom())
+
+    @typing.override
+    def moveCursor(self, action, modifiers) -> QModelIndex:
+        current = self.currentIndex()
+        count = self.model().rowCount() if self.model() is not None else 0
+        if count == 0:
+            return QModelIndex()
+        row = current.row() if current.isValid() else 0
+        Action = QAbstractItemView.CursorAction
+        if action in (Action.MoveUp, Action.MovePrevious, Action.MoveLeft):
+            row -= 1
+        elif action in (Action.MoveDown, Action.MoveNext, Action.MoveRight):
+            row += 1
+        elif action == Action.MoveHome:
+            row = 0
+        elif action == Action.MoveEnd:
+            row = count - 1
+        return self.model().index(min(max(row, 0), count - 1), SHIP)
+
+    @typing.override
+    def horizontalOffset(self) -> int:
+        return self.horizontalScrollBar().value()
+
+    @typing.override
+    def verticalOffset(self) -> int:
+        return self.verticalScrollBar().value()
+
+    @typing.override
+    def isIndexHidden(self, index: QModelIndex) -> bool:
+        return False
+
+    @typing.override
+    def setSelection(self, rect: QRect, command):
+        model = self.model()
+        selection = QItemSelection()
+        for row in self._bars_in(rect.normalized()).tolist():
+            selection.select(model.index(row, 0), model.index(row, len(HEADERS) - 1))
+        self.selectionModel().select(selection, command)
+
+    @typing.override
+    def visualRegionForSelection(self, selection: QItemSelection) -> QRegion:
+        region = QRegion()
+        for selected in selection:
+            for row in range(selected.top(), selected.bottom() + 1):
+                region += self._bar(row).adjusted(-2, -2, 2, 2)
+        return region
+
+    @typing.override
+    def updateGeometries(self):
+        self._layout()
+        area = self.viewport().size()
+        width = int(SECONDS_IN_DAY * self.scale) - (area.width() - LABEL_WIDTH)
+        height = int(self._row_top[-1]) - area.height()
+        self.horizontalScrollBar().setRange(0, max(width, 0))
+        self.horizontalScrollBar().setPageStep(area.width() - LABEL_WIDTH)
+        self.verticalScrollBar().setRange(0, max(height, 0))
+        self.verticalScrollBar().setPageStep(area.height() - HEADER_HEIGHT)
+        super().updateGeometries()
+
+    # The header and row labels stay put, so scrolling repaints instead of
+    # moving pixels
+    @typing.override
+    def scrollContentsBy(self, dx: int, dy: int):
+        self.viewport().update()
+
+    @typing.override
+    def resizeEvent(self, event: QResizeEvent):
+        super().resizeEvent(event)
+        self.updateGeometries()
+
+    # Ctrl + wheel zooms the time axis about the pointer
+    @typing.override
+    def wheelEvent(self, event: QWheelEvent):
+        if not event.modifiers() & Qt.KeyboardModifier.ControlModifier:
+            super().wheelEvent(event)
+            return
+        x = event.position().x() - LABEL_WIDTH
+        time = (x + self.horizontalOffset()) / self.scale
+        factor = 2.0 if event.angleDelta().y() > 0 else 0.5
+        hour_width = min(max(self.scale * 3600 * factor, MIN_HOUR_WIDTH), MAX_HOUR_WIDTH)
+        self.scale = hour_width / 3600
+        self.updateGeometries()
+        self.horizontalScrollBar().setValue(int(time * self.scale - x))
+        self.viewport().update()
+        event.accept()
+
+    # Double clicks near the ends of a bar edit its times
+    @typing.override
+    def mouseDoubleClickEvent(self, event: QMouseEvent):
+        index = self.indexAt(event.position().toPoint())
+        if not index.isValid():
+            super().mouseDoubleClickEvent(event)
+            return
+        bar = self._bar(index.row())
+        x = event.position().x()
+        column = SHIP
+        if bar.width() > 3 * END_GRAB and x < bar.left() + END_GRAB:
+            column = ARRIVAL
+        elif bar.width() > 3 * END_GRAB and x > bar.right() - END_GRAB:
+            column = DEPARTURE
+        self.edit(self.model().index(index.row(), column),
+                  self.EditTrigger.DoubleClicked, event)
+
+    # Every field of a call can be edited from its bar's menu
+    @typing.override
+    def contextMenuEvent(self, event: QContextMenuEvent):
+        index = self.indexAt(event.pos())
+        if not index.isValid():
+            return
+        model = self.model()
+        menu = QMenu(self)
+        for column in (SHIP, ARRIVAL, DEPARTURE, BOLLARDS):
+            target = model.index(index.row(), column)
+            action = menu.addAction(f"Edit {HEADERS[column].lower()}...")
+            action.setEnabled(bool(model.flags(target) & Qt.ItemFlag.ItemIsEditable))
+            action.triggered.connect(lambda checked=False, target=target: self.edit(target))
+        menu.exec(event.globalPos())
+
+    @typing.override
+    def viewportEvent(self, event: QEvent) -> bool:
+        if event.type() == QEvent.Type.ToolTip:
+            index = self.indexAt(event.pos())
+            if index.isValid():
+                QToolTip.showText(event.globalPos(),
+                                  self.model().data(index, Qt.ItemDataRole.ToolTipRole), self)
+            else:
+                QToolTip.hideText()
+            return True
+        return super().viewportEvent(event)
+
+    @typing.override
+    def paintEvent(self, event: QPaintEvent):
+        self._layout()
+        painter = QPainter(self.viewport())
+        palette = self.palette()
+        area = self.viewport().rect()
+        body = area.adjusted(LABEL_WIDTH, HEADER_HEIGHT, 0, 0)
+        hoffset, voffset = self.horizontalOffset(), self.verticalOffset()
+        t0 = hoffset / self.scale
+        t1 = (hoffset + body.width()) / self.scale
+        x_of = lambda t: LABEL_WIDTH + t * self.scale - hoffset
+
+        # Row bands of the visible rows
+        painter.setClipRect(body)
+        first = max(int(np.searchsorted(self._row_top, voffset + HEADER_HEIGHT, "right")) - 1, 0)
+        last = int(np.searchsorted(self._row_top, voffset + area.height(), "right"))
+        for row in range(first, min(last, len(self.labels))):
+            top = int(self._row_top[row]) - voffset
+            height = int(self._row_top[row + 1] - self._row_top[row])
+            role = QPalette.ColorRole.AlternateBase if row % 2 else QPalette.ColorRole.Base
+            painter.fillRect(QRect(body.left(), top, body.width(), height), palette.color(role))
+
+        # Hour lines, spaced so their labels do not overlap
+        step = 3600
+        while step * self.scale < MIN_LABEL_SPACING and step < SECONDS_IN_DAY:
+            step *= 2 if step < 4 * 3600 else 3
+        hours = np.arange(np.floor(t0 / step) * step, min(t1, SECONDS_IN_DAY) + 1, step)
+        painter.setPen(palette.color(QPalette.ColorRole.Mid))
+        for hour in hours:
+            painter.drawLine(QPointF(x_of(hour), body.top()), QPointF(x_of(hour), body.bottom()))
+
+        # Bars
+        slots = self.model().slots
+        selected = self.selectionModel().selectedRows() if self.selectionModel() else []
+        selected = {index.row() for index in selected}
+        hatch = QBrush(QColor(0, 0, 0, 90), Qt.BrushStyle.BDiagPattern)
+        for row in self._bars_in(body).tolist():
+            slot = slots[row]
+            bar = self._bar(row)
+            text_color = palette.color(QPalette.ColorRole.Text)
+            if slot.ship is None:
+                painter.setBrush(Qt.BrushStyle.NoBrush)
+                pen = QPen(palette.color(QPalette.ColorRole.Mid), 1, Qt.PenStyle.DashLine)
+            else:
+                color = QColor(int(max(slot.ship.store.ships["color"][slot.ship.id], 0)))
+                painter.setBrush(color)
+                pen = QPen(Qt.GlobalColor.red if slot.conflicts else Qt.GlobalColor.black)
+                text_color = QColor(Qt.GlobalColor.white if color.lightness() < 128
+                                    else Qt.GlobalColor.black)
+            if row in selected:
+                pen = QPen(palette.color(QPalette.ColorRole.Highlight), 2)
+            painter.setPen(pen)
+            painter.drawRect(bar)
+
+            # Hatch the stretches when no gangway reaches a door
+            for start, end in slot.cut_off():
+                painter.fillRect(QRectF(x_of(start), bar.top(), (end - start) * self.scale,
+                                        bar.height()), hatch)
+            # Name on the visible part of the bar
+            shown = bar.intersected(body)
+            if shown.width() > MIN_LABEL_SPACING:
+                painter.setPen(text_color)
+                name = slot.ship.text() if slot.ship is not None else "(no ship)"
+                text = painter.fontMetrics().elidedText(name, Qt.TextElideMode.ElideRight,
+                                                        shown.width() - 4)
+                painter.drawText(shown.adjusted(2, 0, -2, 0), Qt.AlignmentFlag.AlignVCenter, text)
+
+        # Time shown on the timeline
+        if self.time is not None and t0 <= self.time <= t1:
+            painter.setPen(QPen(palette.color(QPalette.ColorRole.Highlight), 1))
+            painter.drawLine(QPointF(x_of(self.time), body.top()),
+                             QPointF(x_of(self.time), body.bottom()))
+
+        # Header with the hours, then the row labels over everything
+        painter.setClipping(False)
+        painter.fillRect(QRect(0, 0, area.width(), HEADER_HEIGHT),
+                         palette.color(QPalette.ColorRole.Button))
+        painter.setPen(palette.color(QPalette.ColorRole.ButtonText))
+        for hour in hours:
+            if x_of(hour) >= LABEL_WIDTH:
+                painter.drawText(QPointF(x_of(hour) + 2, HEADER_HEIGHT - 5), clock(hour))
+        painter.fillRect(QRect(0, HEADER_HEIGHT, LABEL_WIDTH, area.height()),
+                         palette.color(QPalette.ColorRole.Button))
+        for row in range(first, min(last, len(self.labels))):
+            top = int(self._row_top[row]) - voffset
+            painter.drawText(QRect(4, max(top, HEADER_HEIGHT), LABEL_WIDTH - 8, LANE_HEIGHT),
+                             Qt.AlignmentFlag.AlignVCenter, self.labels[row])
+        painter.end()
+
+    # Picks the ship of a call from the fleet
+    class ShipDelegate(QStyledItemDelegate):
+        @typing.override
+        def createEditor(self, parent: QWidget, option, index: QModelIndex) -> QWidget:
+            editor = QComboBox(parent)
+            editor.setModel(index.model().ship_model)
+            return editor
+
+        @typing.override
+        def setEditorData(self, editor: QComboBox, index: QModelIndex):
+            ship = index.data(Qt.ItemDataRole.EditRole)
+            if ship >= 0:
+                index.model().ship_model.fetch_ship(ship)
+            editor.setCurrentIndex(ship)
+
+        @typing.override
+        def setModelData(self, editor: QComboBox, model: QAbstractItemModel, index: QModelIndex):
+            if editor.currentIndex() >= 0:
+                model.setData(index, editor.currentIndex())
+
+        @typing.override
+        def updateEditorGeometry(self, editor: QWidget, option, index: QModelIndex):
+            editor.setGeometry(option.rect)
+
+    class TimeDelegate(QStyledItemDelegate):
+        @typing.override
+        def createEditor(self, parent: QWidget, option, index: QModelIndex) -> QWidget:
+            editor = QTimeEdit(parent)
+            editor.setDisplayFormat("HH:mm")
+            return editor
+
+        @typing.override
+        def setEditorData(self, editor: QTimeEdit, index: QModelIndex):
+            editor.setTime(index.data(Qt.ItemDataRole.EditRole))
+
+        @typing.override
+        def setModelData(self, editor: QTimeEdit, model: QAbstractItemModel, index: QModelIndex):
+            model.setData(index, editor.time())
+
+        @typing.override
+        def updateEditorGeometry(self, editor: QWidget, option, index: QModelIndex):
+            editor.setGeometry(option.rect)
+
+    # Picks the bollards of a berthed call from the quay's registry
+    class BollardDelegate(QStyledItemDelegate):
+        @typing.override
+        def createEditor(self, parent: QWidget, option, index: QModelIndex) -> QWidget:
+            editor = QListWidget(parent)
+            editor.setSelectionMode(QListWidget.SelectionMode.MultiSelection)
+            registry = index.model().registry
+            for i, chainage in enumerate(registry.chainage.tolist()):
+                editor.addItem(f"{registry.ids[i]} ({chainage:g} ft, {registry.swl[i]:g} t)")
+            return editor
+
+        @typing.override
+        def setEditorData(self, editor: QListWidget, index: QModelIndex):
+            editor.clearSelection()
+            rows = index.data(Qt.ItemDataRole.EditRole)
+            for row in rows:
+                editor.item(row).setSelected(True)
+            if rows:
+                editor.scrollToItem(editor.item(rows[0]))
+
+        @typing.override
+        def setModelData(self, editor: QListWidget, model: QAbstractItemModel,
+                         index: QModelIndex):
+            model.setData(index, sorted(editor.row(item) for item in editor.selectedItems()))
+
+        @typing.override
+        def updateEditorGeometry(self, editor: QWidget, option, index: QModelIndex):
+            editor.setGeometry(option.rect)
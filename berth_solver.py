@@ -0,0 +1,777 @@
+import time
+import collections
+import numpy as np
+
+from fleet_store import DOOR_FIELDS
+from port_layout import BollardRegistry, GangwayRegistry, WaterTreeRegistry
+from quay_geometry import QuayEdge
+
+# Headless berth assignment engine. Nothing in here may import Qt, so the
+# planner, exports and batch jobs can all share it.
+#
+# Distances are in scene units (feet) measured along the quay ("chainage"),
+# times are in seconds.
+
+QUAY_LENGTH = 3000.0
+BOLLARD_SPACING = 60.0
+POSITION_STEP = 5.0
+CLEARANCE = 30.0 # Minimum gap between two ships alongside at the same time
+LINE_REACH = 120.0 # How far past either end of the hull a mooring line may run
+LINES_PER_END = 2
+ACCESS_CACHE_SIZE = 1024 # Ship geometries whose access ranges are kept
+EDGE_TOLERANCE = 1.0 # Feet a hull may overlap the drawn quay edge
+MAX_NODES = 20000
+REPAIR_NODES = 3000 # Per round of a repair
+REPAIR_TIME = 0.5 # Seconds a repair may take over all its rounds
+REPAIR_REACH = (300.0, 1200.0, None) # Neighbourhood of each round, None for the whole quay
+CHECK_INTERVAL = 256 # Nodes between checks of the deadline and stop callback
+
+# Search strategies, see Solver
+VARIABLE_ORDERS = ("mrv", "arrival", "random")
+VALUE_ORDERS = ("chainage", "reverse", "centre", "random")
+
+# Mirrors ship_editor.Side as plain ints
+PORT = 0
+STARBOARD = 1
+BOTH = 2
+SIDES = (PORT, STARBOARD)
+
+# Solver states of a call that has no side assigned
+FREE = -1
+DROPPED = -2
+UNPLACEABLE = -3
+KEPT = -4 # Unplaced and left out of a repair
+NO_BOLLARDS = np.zeros(0, dtype=np.int64)
+
+# Column order of a door row follows fleet_store.DOOR_FIELDS
+DOOR_SIDE = DOOR_FIELDS.index("side")
+DOOR_BOW = DOOR_FIELDS.index("bow_distance")
+DOOR_WIDTH = DOOR_FIELDS.index("width")
+DOOR_SILL = DOOR_FIELDS.index("height_above_waterline")
+
+class Call:
+    def __init__(self, name: str, length: float, width: float,
+                 doors, arrival: int, departure: int):
+        self.name = name
+        self.length = float(length)
+        self.width = float(width)
+        self.doors = np.asarray(doors, dtype=np.float64).reshape(-1, len(DOOR_FIELDS))
+        self.arrival = int(arrival)
+        self.departure = int(departure)
+
+    # Build a call from the dict form of a ship (see ship_editor.Ship.to_dict),
+    # which is also the layout of the ship .json files
+    @classmethod
+    def from_ship_dict(cls, name: str, d: dict, arrival: int, departure: int):
+        doors = [[float(door[key]) for key in DOOR_FIELDS]
+                 for door in d.values() if type(door) == dict]
+        return cls(name, d["length"], d["width"], doors, arrival, departure)
+
+    # Build a call straight from the columns of a fleet_store.FleetStore
+    @classmethod
+    def from_store(cls, store, ship: int, name: str, arrival: int, departure: int):
+        doors = store.doors[store.doors_of(ship)]
+        return cls(name, store.ships["length"][ship], store.ships["width"][ship],
+                   np.column_stack([doors[field] for field in DOOR_FIELDS]),
+                   arrival, departure)
+
+    # Chainage of every door for a ship whose hull starts at `start`.
+    # Port side to the quay puts the bow at the high chainage end.
+    def door_chainages(self, start: float, side: int) -> np.ndarray:
+        bow = self.doors[:, DOOR_BOW]
+        if side == PORT:
+            return start + self.length - bow
+        return start + bow
+
+    def usable_doors(self, side: int) -> np.ndarray:
+        door_side = self.doors[:, DOOR_SIDE]
+        return (door_side == side) | (door_side == BOTH)
+
+# Sorted, disjoint [lo, hi] intervals covering the same ground as `ranges`
+def merge_ranges(ranges: np.ndarray) -> np.ndarray:
+    ranges = ranges[ranges[:, 1] >= ranges[:, 0]]
+    if len(ranges) == 0:
+        return np.zeros((0, 2))
+    ranges = ranges[np.argsort(ranges[:, 0], kind="stable")]
+    reach = np.maximum.accumulate(ranges[:, 1])
+    first = np.concatenate(([True], ranges[1:, 0] > reach[:-1]))
+    last = np.concatenate((first[1:], [True]))
+    return np.column_stack((ranges[first, 0], reach[last]))
+
+# Ground covered by both of two interval sets
+def intersect_ranges(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    lo = np.maximum(a[:, None, 0], b[None, :, 0]).ravel()
+    hi = np.minimum(a[:, None, 1], b[None, :, 1]).ravel()
+    return merge_ranges(np.column_stack((lo, hi)))
+
+# Hull starts at which a ship can be worked: a shore gangway reaches one of
+# its doors on the side it lies, and a water tree stands within hose reach
+# of the hull. Kept as allowed ranges of start chainage, worked out once per
+# ship geometry and side, so the solver and drag snapping only look them up.
+# Door heights move with the tide and are checked over time instead, see
+# tides.workable.
+class AccessTable:
+    def __init__(self, length: float, gangways: GangwayRegistry,
+                 water_trees: WaterTreeRegistry, cache_size: int = ACCESS_CACHE_SIZE):
+        self.length = length
+        self.gangways = gangways
+        self.water_trees = water_trees
+        self.cache_size = cache_size
+        self._ranges = collections.OrderedDict()
+
+    # Allowed [lo, hi] start ranges of a hull with `doors` (rows in
+    # DOOR_FIELDS order) lying with `side` to the quay
+    def ranges(self, length: float, doors: np.ndarray, side: int) -> np.ndarray:
+        key = (float(length), doors.tobytes(), side)
+        ranges = self._ranges.get(key)
+        if ranges is not None:
+            self._ranges.move_to_end(key)
+            return ranges
+
+        ranges = self._compute(float(length), doors, side)
+        self._ranges[key] = ranges
+        if len(self._ranges) > self.cache_size:
+            self._ranges.popitem(last=False)
+        return ranges
+
+    def _compute(self, length: float, doors: np.ndarray, side: int) -> np.ndarray:
+        door_side = doors[:, DOOR_SIDE]
+        doors = doors[(door_side == side) | (door_side == BOTH)]
+        if len(doors) == 0 or not length <= self.length:
+            return np.zeros((0, 2))
+        ranges = np.array([[0.0, self.length - length]])
+
+        # Every door and gangway pair that fits gives one range of starts
+        gangways = self.gangways
+        if len(gangways):
+            bow = doors[:, DOOR_BOW]
+            offset = length - bow if side == PORT else bow # Door along the hull
+            fits = doors[:, DOOR_WIDTH, None] >= gangways.min_width
+            lo = gangways.chainage - gangways.reach - offset[:, None]
+            hi = gangways.chainage + gangways.reach - offset[:, None]
+            ranges = intersect_ranges(ranges, merge_ranges(np.column_stack((lo[fits], hi[fits]))))
+
+        trees = self.water_trees
+        if len(trees):
+            water = np.column_stack((trees.chainage - trees.reach - length,
+                                     trees.chainage + trees.reach))
+            ranges = intersect_ranges(ranges, merge_ranges(water))
+        return ranges
+
+    # True for every start in `starts` inside the allowed ranges
+    def allowed(self, length: float, doors: np.ndarray, side: int,
+                starts: np.ndarray) -> np.ndarray:
+        ranges = self.ranges(length, doors, side)
+        if len(ranges) == 0:
+            return np.zeros(len(starts), dtype=bool)
+        i = np.searchsorted(ranges[:, 0], starts, side="right") - 1
+        return (i >= 0) & (starts <= ranges[i.clip(0), 1])
+
+# Bollard indices used by the solver are rows of the quay's registry. With
+# an edge drawn from the port layers, hulls must also clear its bends.
+class Quay:
+    def __init__(self, length: float = QUAY_LENGTH,
+                 registry: BollardRegistry | None = None,
+                 gangways: GangwayRegistry | None = None,
+                 water_trees: WaterTreeRegistry | None = None,
+                 apron_height: float = 0.0, edge: QuayEdge | None = None):
+        self.length = float(length)
+        self.edge = edge
+        self.apron_height = float(apron_height) # Feet above chart datum
+        if registry is None:
+            registry = BollardRegistry.uniform(self.length, BOLLARD_SPACING)
+        self.registry = registry
+        self.bollards = registry.chainage
+        self.gangways = gangways if gangways is not None else GangwayRegistry.empty()
+        self.water_trees = water_trees if water_trees is not None else WaterTreeRegistry.empty()
+        self.access = AccessTable(self.length, self.gangways, self.water_trees)
+
+    @classmethod
+    def from_layout(cls, layout, edge: QuayEdge | None = None):
+        length = edge.length if edge is not None else layout.quay_length
+        return cls(length, layout.bollards, layout.gangways, layout.water_trees,
+                   layout.apron_height, edge)
+
+    # True for every start at which a straight hull lies clear of the quay
+    # edge. Only a bent edge can get in the way.
+    def clear(self, length: float, width: float, starts: np.ndarray) -> np.ndarray:
+        if self.edge is None or len(self.edge.points) < 3:
+            return np.ones(len(starts), dtype=bool)
+        hulls = self.edge.hulls(starts, length, width)
+        return self.edge.clearance(hulls) >= -EDGE_TOLERANCE
+
+class Berth:
+    __slots__ = ("start", "end", "side", "bollards")
+
+    def __init__(self, start: float, end: float, side: int, bollards: np.ndarray):
+        self.start = start
+        self.end = end
+        self.side = side
+        self.bollards = bollards
+
+    def __repr__(self):
+        return (f"Berth({self.start:g}-{self.end:g}, side={self.side}, "
+                f"bollards={self.bollards.tolist()})")
+
+class Problem:
+    def __init__(self, calls: list[Call], quay: Quay | None = None,
+                 step: float = POSITION_STEP, clearance: float = CLEARANCE):
+        self.calls = list(calls)
+        self.quay = quay if quay is not None else Quay()
+        self.step = step
+        self.clearance = clearance
+        self.positions = np.arange(0, self.quay.length, step)
+
+        n = len(self.calls)
+        self.lengths = np.array([c.length for c in self.calls], dtype=np.float64)
+        self.windows = np.array([[c.arrival, c.departure] for c in self.calls],
+                                dtype=np.int64).reshape(n, 2)
+
+        # Pairs of calls that are alongside at the same time
+        arrival, departure = self.windows[:, 0], self.windows[:, 1]
+        self.overlap = ((arrival[:, None] < departure[None, :]) &
+                        (arrival[None, :] < departure[:, None]))
+        np.fill_diagonal(self.overlap, False)
+
+        self.domains = self._initial_domains()
+
+        # For the solver's capacity bound: the calls alongside at every
+        # arrival, and the stretch of quay [reach_start, reach_end) any hull
+        # can cover
+        instants = np.unique(arrival)
+        self.alongside = ((arrival[None, :] <= instants[:, None]) &
+                          (instants[:, None] < departure[None, :]))
+        reach = self.domains.any(axis=1)
+        placeable = reach.any(axis=1)
+        self.reach_start = self.reach_end = 0.0
+        if placeable.any():
+            first = self.positions[np.argmax(reach, axis=1)]
+            last = self.positions[reach.shape[1] - 1 - np.argmax(reach[:, ::-1], axis=1)]
+            self.reach_start = float(first[placeable].min())
+            self.reach_end = float((last + self.lengths)[placeable].max())
+
+    # domains[call, side, position] is True while the hull may start at that
+    # position with that side to the quay
+    def _initial_domains(self) -> np.ndarray:
+        n, p = len(self.calls), len(self.positions)
+        domains = np.zeros((n, len(SIDES), p), dtype=bool)
+        if n == 0:
+            return domains
+
+        moorable = self.moorable(self.lengths, self.quay.bollards)
+        valid_window = self.windows[:, 1] > self.windows[:, 0]
+        clear = np.array([self.quay.clear(c.length, c.width, self.positions) for c in self.calls])
+        for side in SIDES:
+            access = np.array([self.quay.access.allowed(c.length, c.doors, side, self.positions)
+                               for c in self.calls])
+            domains[:, side, :] = access & moorable & clear & valid_window[:, None]
+        return domains
+
+    # True where a hull of each length has enough of `bollards` within reach of
+    # both of its ends
+    def moorable(self, lengths: np.ndarray, bollards: np.ndarray) -> np.ndarray:
+        start = self.positions[None, :]
+        end = start + lengths[:, None]
+        aft = (np.searchsorted(bollards, start, side="right") -
+               np.searchsorted(bollards, start - LINE_REACH, side="left"))
+        fore = (np.searchsorted(bollards, end + LINE_REACH, side="right") -
+                np.searchsorted(bollards, end, side="left"))
+        return (aft >= LINES_PER_END) & (fore >= LINES_PER_END)
+
+    # Calls split into groups that can be planned on their own. Two calls
+    # interact when they are alongside at the same time and the stretches of
+    # quay they could use, mooring lines included, come within clearance of
+    # each other. Each group holds call indices in increasing order.
+    def components(self) -> list[np.ndarray]:
+        n = len(self.calls)
+        reach = self.domains.any(axis=1)
+        placeable = reach.any(axis=1)
+        first = np.argmax(reach, axis=1)
+        last = reach.shape[1] - 1 - np.argmax(reach[:, ::-1], axis=1)
+        pad = LINE_REACH + self.clearance
+        lo = self.positions[first] - pad
+        hi = self.positions[last] + self.lengths + pad
+        linked = (self.overlap & (lo[:, None] < hi[None, :]) & (lo[None, :] < hi[:, None]) &
+                  placeable[:, None] & placeable[None, :])
+
+        # Flood fill the interaction graph one component at a time
+        labels = np.full(n, -1, dtype=np.int64)
+        groups = []
+        for seed in range(n):
+            if labels[seed] >= 0:
+                continue
+            labels[seed] = len(groups)
+            frontier = np.array([seed])
+            while len(frontier):
+                reached = linked[frontier].any(axis=0) & (labels < 0)
+                labels[reached] = len(groups)
+                frontier = np.flatnonzero(reached)
+            groups.append(np.flatnonzero(labels == len(groups)))
+        return groups
+
+    # Problem of only the calls in `rows`, on the same quay
+    def subproblem(self, rows: np.ndarray):
+        return Problem([self.calls[i] for i in rows], self.quay, self.step, self.clearance)
+
+    # Positions left free for each call in `others` once `call` starts at `start`
+    def free_mask(self, call: int, start: float, others: np.ndarray) -> np.ndarray:
+        lo = start - self.lengths[others] - self.clearance
+        hi = start + self.lengths[call] + self.clearance
+        return ~((self.positions[None, :] > lo[:, None]) &
+                 (self.positions[None, :] < hi))
+
+class Solution:
+    def __init__(self, problem: Problem, starts: np.ndarray, sides: np.ndarray,
+                 bollards: list, nodes: int, optimal: bool = False):
+        self.problem = problem
+        self.starts = starts
+        self.sides = sides
+        self.bollards = bollards
+        self.nodes = nodes
+        self.optimal = optimal # No plan drops fewer calls
+
+    # Plan of a whole problem put together from plans of its components,
+    # `parts[k]` solving problem.subproblem(groups[k])
+    @classmethod
+    def merge(cls, problem: Problem, groups: list[np.ndarray], parts: list):
+        n = len(problem.calls)
+        starts = np.full(n, np.nan)
+        sides = np.full(n, FREE, dtype=np.int64)
+        bollards = [NO_BOLLARDS] * n
+        for rows, part in zip(groups, parts):
+            starts[rows] = part.starts
+            sides[rows] = part.sides
+            for row, used in zip(rows.tolist(), part.bollards):
+                bollards[row] = used
+        return cls(problem, starts, sides, bollards, sum(part.nodes for part in parts),
+                   all(part.optimal for part in parts))
+
+    # Plan of a problem from the berths its calls already have, None for
+    # calls without one. Bollards are matched to rows of the quay's registry.
+    @classmethod
+    def from_berths(cls, problem: Problem, berths: list):
+        n = len(problem.calls)
+        starts = np.full(n, np.nan)
+        sides = np.full(n, FREE, dtype=np.int64)
+        bollards = [NO_BOLLARDS] * n
+        for i, berth in enumerate(berths):
+            if berth is None:
+                continue
+            starts[i] = berth.start
+            sides[i] = berth.side
+            rows = problem.quay.registry.lookup(np.asarray(berth.bollards, np.float64))
+            bollards[i] = rows[rows >= 0]
+        return cls(problem, starts, sides, bollards, 0)
+
+    # True for berthed calls that clash with another call alongside at the
+    # same time, by coming within clearance or by sharing a bollard
+    def clashes(self) -> np.ndarray:
+        problem = self.problem
+        assigned = self.assigned
+        start = np.where(assigned, self.starts, np.nan)
+        end = start + problem.lengths
+        near = ((start[:, None] < end[None, :] + problem.clearance) &
+                (start[None, :] < end[:, None] + problem.clearance))
+        used = np.zeros((len(problem.calls), len(problem.quay.bollards)), dtype=np.int64)
+        for i in np.flatnonzero(assigned):
+            used[i, self.bollards[i]] = 1
+        shared = (used @ used.T) > 0
+        pairs = problem.overlap & assigned[:, None] & assigned[None, :] & (near | shared)
+        return pairs.any(axis=1)
+
+    @property
+    def dropped(self) -> int:
+        return int((~self.assigned).sum())
+
+    @property
+    def assigned(self) -> np.ndarray:
+        return self.sides >= 0
+
+    @property
+    def feasible(self) -> bool:
+        return bool(self.assigned.all())
+
+    def unassigned(self) -> list[Call]:
+        return [c for c, a in zip(self.problem.calls, self.assigned) if not a]
+
+    def berths(self) -> dict[str, Berth]:
+        berths = {}
+        for i, call in enumerate(self.problem.calls):
+            if self.sides[i] >= 0:
+                berths[call.name] = Berth(float(self.starts[i]),
+                                          float(self.starts[i] + call.length),
+                                          int(self.sides[i]),
+                                          self.problem.quay.bollards[self.bollards[i]])
+        return berths
+
+# Variable order picks the next call: "mrv" takes the most constrained call
+# and breaks ties by the longest ship, "arrival" breaks them by the earliest
+# arrival, "random" at random. Value order is the order positions are tried
+# in: "chainage" from the start of the quay, "reverse" from its end,
+# "centre" from its middle outwards, or "random". The search stops early
+# once time.time() passes `deadline` or `stop()` returns True.
+class Solver:
+    def __init__(self, problem: Problem, max_nodes: int = MAX_NODES,
+                 variable_order: str = "mrv", value_order: str = "chainage",
+                 seed: int | None = None, deadline: float | None = None,
+                 stop=None):
+        if variable_order not in VARIABLE_ORDERS:
+            raise ValueError(f"Unknown variable order {variable_order!r}")
+        if value_order not in VALUE_ORDERS:
+            raise ValueError(f"Unknown value order {value_order!r}")
+        self.problem = problem
+        self.max_nodes = max_nodes
+        self.variable_order = variable_order
+        self.value_order = value_order
+        self.rng = np.random.default_rng(seed)
+        self.deadline = deadline
+        self.stop = stop
+        n = len(problem.calls)
+        self.starts = np.full(n, np.nan)
+        self.sides = np.full(n, FREE, dtype=np.int64)
+        self.bollards = [NO_BOLLARDS] * n
+        self.used = np.zeros((n, len(problem.quay.bollards)), dtype=bool)
+        self.nodes = 0
+        self.best = None
+        self.optimal = False
+        self.searched = np.zeros(n, dtype=bool)
+        self.anchors = np.full(n, np.nan) # Starts tried first, see repair
+        self.anchor_sides = np.full(n, FREE, dtype=np.int64)
+        self._by_size = np.argsort(problem.lengths, kind="stable")
+        # Identical calls before and after each call, see _find_twins
+        self._earlier = [NO_BOLLARDS] * n
+        self._later = [NO_BOLLARDS] * n
+
+        # Tie breaks of the variable order, lower goes first
+        if variable_order == "mrv":
+            self._ties = -problem.lengths
+        elif variable_order == "arrival":
+            self._ties = problem.windows[:, 0].astype(np.float64)
+        else:
+            self._ties = self.rng.random(n)
+
+    # Most constrained free call first
+    def _select(self, domains: np.ndarray) -> int:
+        free = self.sides == FREE
+        sizes = domains.sum(axis=(1, 2))
+        order = np.lexsort((self._ties, sizes))
+        return int(order[free[order]][0])
+
+    # Candidate (side, position index) pairs in the value order. Calls with
+    # an anchor try the positions nearest to it first, on its side first.
+    def _values(self, domains: np.ndarray, call: int) -> list[tuple[int, int]]:
+        p, side = np.nonzero(domains[call].T)
+        if not np.isnan(self.anchors[call]):
+            order = np.lexsort((side != self.anchor_sides[call],
+                                np.abs(self.problem.positions[p] - self.anchors[call])))
+            p, side = p[order], side[order]
+        elif self.value_order == "reverse":
+            p, side = p[::-1], side[::-1]
+        elif self.value_order == "centre":
+            middle = (self.problem.quay.length - self.problem.lengths[call]) / 2
+            order = np.argsort(np.abs(self.problem.positions[p] - middle), kind="stable")
+            p, side = p[order], side[order]
+        elif self.value_order == "random":
+            order = self.rng.permutation(len(p))
+            p, side = p[order], side[order]
+        return list(zip(side.tolist(), p.tolist()))
+
+    # True once the deadline has passed or the caller asked to stop
+    def _interrupted(self, deadline: float | None) -> bool:
+        if deadline is not None and time.time() >= deadline:
+            return True
+        return self.stop is not None and self.stop()
+
+    # Pick the bollards nearest each end of the hull that no overlapping call uses
+    def _pick_bollards(self, call: int, start: float) -> np.ndarray | None:
+        quay = self.problem.quay
+        taken = self.used[self.problem.overlap[call] & (self.sides >= 0)].any(axis=0)
+        end = start + self.problem.lengths[call]
+
+        aft = quay.registry.in_range(start - LINE_REACH, start)
+        aft = aft[~taken[aft]][::-1][:LINES_PER_END]
+        fore = quay.registry.in_range(end, end + LINE_REACH)
+        fore = fore[~taken[fore]][:LINES_PER_END]
+
+        if len(aft) < LINES_PER_END or len(fore) < LINES_PER_END:
+            return None
+        return np.concatenate((aft[::-1], fore))
+
+    # Positions where each call in `others` could still find free bollards
+    def _moorable(self, others: np.ndarray) -> np.ndarray:
+        bollards = self.problem.quay.bollards
+        assigned = self.sides >= 0
+        masks = np.empty((len(others), len(self.problem.positions)), dtype=bool)
+        for k, other in enumerate(others):
+            taken = self.used[self.problem.overlap[other] & assigned].any(axis=0)
+            masks[k] = self.problem.moorable(self.problem.lengths[other:other + 1],
+                                             bollards[~taken])[0]
+        return masks
+
+    # Least number of the calls in `waiting` that must still be dropped. At
+    # every arrival the hulls alongside, clearance between them, have to fit
+    # on the stretch of quay a hull can reach, so at most the shortest ones
+    # that fit in the room the placed calls leave can be berthed. Placed
+    # calls only take up the part of that stretch they lie on, as kept
+    # berths of a repair may be anywhere.
+    def _drop_bound(self, waiting: np.ndarray) -> int:
+        problem = self.problem
+        size = problem.lengths + problem.clearance
+        lo, hi = problem.reach_start, problem.reach_end + problem.clearance
+        start = np.where(self.sides >= 0, self.starts, lo)
+        taken = np.clip(start + size, lo, hi) - np.clip(start, lo, hi)
+        room = hi - lo - problem.alongside @ np.where(self.sides >= 0, taken, 0.0)
+        order = self._by_size
+        waiting = problem.alongside[:, order] & waiting[order]
+        filled = np.cumsum(np.where(waiting, size[order], 0.0), axis=1)
+        fit = (waiting & (filled <= room[:, None] + 1e-9)).sum(axis=1)
+        return int((waiting.sum(axis=1) - fit).max(initial=0))
+
+    # Calls with the same ship and window are interchangeable, so only plans
+    # where each one starts no further up the quay than the identical calls
+    # after it, and dropped ones come last, are searched
+    def _find_twins(self, domains: np.ndarray):
+        problem = self.problem
+        groups = collections.defaultdict(list)
+        for i in np.flatnonzero(self.sides == FREE).tolist():
+            call = problem.calls[i]
+            groups[(call.length, call.width, call.doors.tobytes(), call.arrival,
+                    call.departure, domains[i].tobytes())].append(i)
+        for group in groups.values():
+            for k, i in enumerate(group):
+                self._earlier[i] = np.array(group[:k], dtype=np.int64)
+                self._later[i] = np.array(group[k + 1:], dtype=np.int64)
+
+    def _assign(self, call: int, side: int, start: float, bollards: np.ndarray):
+        self.starts[call] = start
+        self.sides[call] = side
+        self.bollards[call] = bollards
+        self.used[call, bollards] = True
+
+    def _unassign(self, call: int):
+        self.used[call] = False
+        self.starts[call] = np.nan
+        self.sides[call] = FREE
+        self.bollards[call] = NO_BOLLARDS
+
+    # Domains after placing `call`, or None if the value is not possible
+    def _place(self, domains: np.ndarray, call: int, side: int, p: int) -> np.ndarray | None:
+        problem = self.problem
+        child = domains.copy()
+        child[call] = False
+        later, earlier = self._later[call], self._earlier[call]
+        if side == DROPPED:
+            if (self.sides[later] >= 0).any():
+                return None
+            self.sides[call] = DROPPED
+            child[later] = False
+            return child
+
+        start = float(problem.positions[p])
+        bollards = self._pick_bollards(call, start)
+        if bollards is None:
+            return None
+        self._assign(call, side, start, bollards)
+        child[call, side, p] = True
+        child[later, :, :p] = False
+        child[earlier, :, p + 1:] = False
+
+        # Remove clashing positions from calls alongside at the same time
+        others = np.flatnonzero(problem.overlap[call] & (self.sides == FREE))
+        if len(others):
+            child[others] &= problem.free_mask(call, start, others)[:, None, :]
+            child[others] &= self._moorable(others)[:, None, :]
+        return child
+
+    # Depth first branch and bound on the number of dropped calls, with
+    # forward checking on the domains. Values that empty another call's domain
+    # are deferred, and dropping the call is the last resort. A branch is cut
+    # once the calls dropped, wiped out and bound to be dropped for lack of
+    # quay reach best_dropped. Returns True if the search ran to completion,
+    # so no better plan exists.
+    def _search(self, domains: np.ndarray, best_dropped: int, max_nodes: int,
+                deadline: float | None) -> bool:
+        stack = []
+        free = self.sides == FREE
+        if free.any() and (int((self.sides == DROPPED).sum()) +
+                           self._drop_bound(free) < best_dropped):
+            call = self._select(domains)
+            stack.append((call, domains, iter(self._values(domains, call)), []))
+        complete = True
+        check = self.nodes
+        while stack:
+            if self.nodes >= check:
+                check = self.nodes + CHECK_INTERVAL
+                if self._interrupted(deadline):
+                    complete = False
+                    break
+            if self.nodes >= max_nodes:
+                complete = False
+                break
+            call, domains, values, deferred = stack[-1]
+            if self.sides[call] != FREE:
+                self._unassign(call)
+
+            for side, p in values:
+                self.nodes += 1
+                child = self._place(domains, call, side, p)
+                if child is None:
+                    continue
+                free = self.sides == FREE
+                dropped = int((self.sides == DROPPED).sum())
+                empty = free & ~child.any(axis=(1, 2))
+                wiped = int(empty.sum())
+                if (dropped + wiped >= best_dropped or
+                        dropped + wiped + self._drop_bound(free & ~empty) >= best_dropped):
+                    self._unassign(call)
+                    continue
+                if wiped and deferred is not None:
+                    self._unassign(call)
+                    deferred.append((side, p))
+                    continue
+                break
+            else:
+                if deferred is None:
+                    stack.pop()
+                else:
+                    stack[-1] = (call, domains, iter(deferred + [(DROPPED, -1)]), None)
+                continue
+
+            if not free.any():
+                best_dropped = dropped
+                self.best = (self.starts.copy(), self.sides.copy(), list(self.bollards))
+                if dropped == 0:
+                    break
+                continue
+            nxt = self._select(child)
+            stack.append((nxt, child, iter(self._values(child, nxt)), []))
+
+        # Leave every searchable call free again
+        for call in np.flatnonzero(self.searched):
+            self._unassign(call)
+        return complete
+
+    def solve(self) -> Solution:
+        # Calls that can never be placed are left out of the search
+        domains = self.problem.domains.copy()
+        self.sides[~domains.any(axis=(1, 2))] = UNPLACEABLE
+        self._find_twins(domains)
+        return self._run(domains)
+
+    # Keep the plan of every call outside `rows` and search again only for
+    # the calls in it. Anchored calls try their old berth first, so a change
+    # moves as little of the plan as possible, otherwise the value order
+    # applies. Optimal here means no better repair of these rows exists.
+    def repair(self, solution: Solution, rows: np.ndarray, anchored: bool = True) -> Solution:
+        problem = self.problem
+        domains = problem.domains.copy()
+        searched = np.zeros(len(problem.calls), dtype=bool)
+        searched[rows] = True
+        self.sides[~searched & ~solution.assigned] = KEPT
+        self.sides[searched & ~domains.any(axis=(1, 2))] = UNPLACEABLE
+        if anchored:
+            self.anchors = np.where(searched, solution.starts, np.nan)
+            self.anchor_sides = solution.sides.copy()
+
+        # Place the kept calls and narrow the domains of the others around them
+        for call in np.flatnonzero(~searched & solution.assigned):
+            self._assign(call, int(solution.sides[call]), float(solution.starts[call]),
+                         solution.bollards[call])
+            domains[call] = False
+        for call in np.flatnonzero(~searched & solution.assigned):
+            others = np.flatnonzero(problem.overlap[call] & (self.sides == FREE))
+            if len(others):
+                domains[others] &= problem.free_mask(call, self.starts[call], others)[:, None, :]
+        others = np.flatnonzero(self.sides == FREE)
+        if len(others):
+            domains[others] &= self._moorable(others)[:, None, :]
+        return self._run(domains)
+
+    def _run(self, domains: np.ndarray) -> Solution:
+        problem = self.problem
+        self.searched = self.sides == FREE
+        remaining = int(self.searched.sum())
+
+        # Look for a plan that places every call first, then settle for the
+        # one that drops the fewest. Each phase gets half the time.
+        halfway = None
+        if self.deadline is not None:
+            halfway = (time.time() + self.deadline) / 2
+        complete = self._search(domains, 1, self.max_nodes // 2, halfway)
+        self.optimal = self.best is not None
+        if self.best is None:
+            # A completed first phase proves some call has to be dropped
+            relaxed = self._search(domains, remaining + 1, self.max_nodes, self.deadline)
+            self.optimal = complete and relaxed
+
+        if self.best is None:
+            starts, sides, bollards = self.starts.copy(), self.sides.copy(), list(self.bollards)
+        else:
+            starts, sides, bollards = self.best
+        sides[sides < 0] = FREE
+        return Solution(problem, starts, sides, bollards, self.nodes, self.optimal)
+
+# Starts along the quay where a hull of `length` fits and can be moored.
+# With `doors` only starts where the ship can be worked on either side count.
+def berth_positions(quay: Quay, length: float, step: float = POSITION_STEP,
+                    doors: np.ndarray | None = None, width: float | None = None) -> np.ndarray:
+    start = np.arange(0, quay.length, step)
+    end = start + length
+    aft = quay.registry.count(start - LINE_REACH, start)
+    fore = quay.registry.count(end, end + LINE_REACH)
+    keep = (end <= quay.length) & (aft >= LINES_PER_END) & (fore >= LINES_PER_END)
+    if doors is not None:
+        keep &= np.logical_or.reduce([quay.access.allowed(length, doors, side, start)
+                                      for side in SIDES])
+    if width is not None:
+        keep &= quay.clear(length, width, start)
+    return start[keep]
+
+def solve(calls: list[Call], quay: Quay | None = None, **kwargs) -> Solution:
+    return Solver(Problem(calls, quay), **kwargs).solve()
+
+# Mend `solution` after the calls in `changed` were edited. Only the changed
+# calls, those clashing with anything and their berthed neighbours alongside
+# at the same time are searched again, everything else keeps its berth. The
+# neighbourhood widens through REPAIR_REACH until the repair berths every
+# call it touched that had a berth before, and every changed call that has
+# somewhere it can lie.
+def repair(problem: Problem, solution: Solution, changed: np.ndarray,
+           max_nodes: int = REPAIR_NODES, time_limit: float = REPAIR_TIME) -> Solution:
+    clashing = solution.clashes()
+    seeds = np.zeros(len(problem.calls), dtype=bool)
+    seeds[changed] = True
+    seeds &= clashing | ~solution.assigned
+    seeds |= clashing
+    if not seeds.any():
+        return solution
+
+    # Gap along the quay between every two berths, inf where either has none.
+    # A seed without a berth is as near to a berth as the closest start its
+    # domain allows.
+    start = np.where(solution.assigned, solution.starts, np.nan)
+    end = start + problem.lengths
+    gap = np.fmax(start[None, :] - end[:, None], start[:, None] - end[None, :])
+    gap[np.isnan(gap)] = np.inf
+    placeable = problem.domains.any(axis=(1, 2))
+    for seed in np.flatnonzero(seeds & ~solution.assigned & placeable):
+        starts = problem.positions[problem.domains[seed].any(axis=0)]
+        seed_gap = np.fmax(starts[:, None] - end[None, :],
+                           start[None, :] - (starts[:, None] + problem.lengths[seed])).min(axis=0)
+        gap[seed] = np.where(np.isnan(seed_gap), np.inf, seed_gap)
+    linked = problem.overlap & seeds[:, None] & solution.assigned[None, :]
+
+    deadline = time.time() + time_limit
+    best = solution
+    for round, reach in enumerate(REPAIR_REACH):
+        near = linked if reach is None else linked & (gap < reach)
+        rows = np.flatnonzero(seeds | near.any(axis=0))
+        rounds_left = len(REPAIR_REACH) - round
+        limit = time.time() + (deadline - time.time()) / rounds_left
+        repaired = Solver(problem, max_nodes, deadline=limit).repair(solution, rows)
+        if best is solution or repaired.dropped < best.dropped:
+            best = repaired
+        wanted = solution.assigned[rows] | (seeds[rows] & placeable[rows])
+        if not (wanted & ~repaired.assigned[rows]).any():
+            break
+    return best
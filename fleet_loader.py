@@ -0,0 +1,195 @@
+import os
+import json
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+import fleet_store
+from fleet_store import SHIP_DTYPE, DOOR_DTYPE, SHIP_FIELDS, DOOR_FIELDS
+
+# Bulk loader for a directory of ship .json files. Files are parsed in a
+# process pool and the result is kept in a binary index of .npy tables next
+# to the ships, so later startups memory-map the tables and only re-parse
+# files whose modification time or size changed. Files that failed to parse
+# keep an entry with their error and no ship, so they are not parsed again
+# until they change.
+
+INDEX_DIR = ".index"
+INDEX_TABLES = ("files", "names", "errors", "ships", "doors", "door_names")
+PARALLEL_THRESHOLD = 32 # Fewer files than this are parsed in process
+
+FILE_DTYPE = np.dtype([("mtime", np.int64),
+                       ("size", np.int64),
+                       ("ship", np.int64), # -1 for a file that failed to parse
+                       ("door_start", np.int64),
+                       ("door_count", np.int64)])
+
+class LoadReport:
+    def __init__(self):
+        self.parsed = []
+        self.cached = []
+        self.errors = {} # File name: error message
+
+    def __repr__(self):
+        return (f"LoadReport(parsed={len(self.parsed)}, cached={len(self.cached)}, "
+                f"errors={len(self.errors)})")
+
+# Ship values and (door name, door values) pairs from the dict of a ship file
+def parse_ship(d: dict) -> tuple[tuple, list[tuple[str, tuple]]]:
+    if type(d) != dict:
+        raise ValueError(f"Expected an object, not {type(d).__name__}")
+    missing = [field for field in SHIP_FIELDS if field not in d]
+    if missing:
+        raise ValueError(f"Missing {', '.join(missing)}")
+    ship = tuple(d[field] for field in SHIP_FIELDS)
+
+    doors = []
+    for name, door in d.items():
+        if name in SHIP_FIELDS:
+            continue
+        if type(door) != dict:
+            raise ValueError(f"Door {name} must be an object")
+        missing = [field for field in DOOR_FIELDS if field not in door]
+        if missing:
+            raise ValueError(f"Door {name} is missing {', '.join(missing)}")
+        doors.append((name, tuple(door[field] for field in DOOR_FIELDS)))
+
+    # Let NumPy check every value converts to its column type
+    np.array([ship], SHIP_DTYPE)
+    np.array([(0, *door) for _, door in doors], DOOR_DTYPE)
+    return ship, doors
+
+# Worker entry point, returns (ship, doors, None) or (None, None, error)
+def parse_file(path: str) -> tuple:
+    try:
+        with open(path) as file:
+            return (*parse_ship(json.load(file)), None)
+    except (OSError, ValueError, TypeError, OverflowError) as error:
+        return None, None, f"{type(error).__name__}: {error}"
+
+def _scan(directory: str) -> dict[str, os.stat_result]:
+    files = {}
+    for entry in os.scandir(directory):
+        if entry.is_file() and entry.name.endswith(".json"):
+            files[entry.name] = entry.stat()
+    return files
+
+def _read_index(directory: str) -> dict | None:
+    path = os.path.join(directory, INDEX_DIR)
+    try:
+        index = {table: np.load(os.path.join(path, f"{table}.npy"), mmap_mode='r')
+                 for table in INDEX_TABLES}
+    except (OSError, ValueError):
+        return None
+    if (index["files"].dtype != FILE_DTYPE or index["ships"].dtype != SHIP_DTYPE or
+        index["doors"].dtype != DOOR_DTYPE):
+        return None
+
+    # The small tables are read whole, ships and doors stay mapped
+    for table in ("files", "names", "errors"):
+        index[table] = np.array(index[table])
+    return index
+
+# Store straight from the mapped tables of an index every file still matches
+def _from_index(index: dict, report: LoadReport) -> fleet_store.FleetStore:
+    names = index["names"]
+    parsed = index["files"]["ship"] >= 0
+    report.cached = names[parsed].tolist()
+    report.errors = dict(zip(names[~parsed].tolist(), index["errors"][~parsed].tolist()))
+    ship_names = [os.path.splitext(name)[0] for name in report.cached]
+    return fleet_store.FleetStore.from_arrays(ship_names, index["ships"],
+                                              index["door_names"].tolist(), index["doors"])
+
+# Write every table to a temporary file first so a crash never leaves a
+# half written index behind
+def _write_index(directory: str, tables: dict[str, np.ndarray]):
+    path = os.path.join(directory, INDEX_DIR)
+    os.makedirs(path, exist_ok=True)
+    for table, array in tables.items():
+        temp = os.path.join(path, f"{table}.tmp.npy")
+        np.save(temp, array)
+        os.replace(temp, os.path.join(path, f"{table}.npy"))
+
+def _parse_all(paths: list[str], workers: int | None) -> list[tuple]:
+    if len(paths) < PARALLEL_THRESHOLD:
+        return [parse_file(path) for path in paths]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(parse_file, paths, chunksize=16))
+
+def load_library(directory: str, workers: int | None = None,
+                 use_index: bool = True) -> tuple[fleet_store.FleetStore, LoadReport]:
+    report = LoadReport()
+    files = _scan(directory)
+    index = _read_index(directory) if use_index else None
+
+    # Files whose index entry still matches their mtime and size
+    cached = {}
+    if index is not None:
+        for i, name in enumerate(index["names"].tolist()):
+            stat = files.get(name)
+            entry = index["files"][i]
+            if (stat is not None and stat.st_mtime_ns == entry["mtime"] and
+                stat.st_size == entry["size"]):
+                cached[name] = i
+
+    # Nothing was added, changed or removed
+    if index is not None and len(cached) == len(files) == len(index["names"]):
+        return _from_index(index, report), report
+
+    stale = sorted(name for name in files if name not in cached)
+    results = dict(zip(stale, _parse_all([os.path.join(directory, name) for name in stale],
+                                         workers)))
+
+    # Assemble the tables in file name order
+    names, ships, doors, door_names = [], [], [], []
+    file_names, file_rows, errors = [], [], []
+    door_start = 0
+    for name in sorted(files):
+        ship = len(names)
+        stat = files[name]
+        if name in cached:
+            entry = index["files"][cached[name]]
+            error = str(index["errors"][cached[name]]) if entry["ship"] < 0 else None
+            if error is None:
+                start, count = int(entry["door_start"]), int(entry["door_count"])
+                ship_row = index["ships"][int(entry["ship"])].copy()
+                door_rows = np.array(index["doors"][start:start + count])
+                door_rows["ship"] = ship
+                door_names.extend(index["door_names"][start:start + count].tolist())
+                report.cached.append(name)
+        else:
+            ship_row, door_list, error = results[name]
+            if error is None:
+                ship_row = np.array([ship_row], SHIP_DTYPE)[0]
+                door_rows = np.array([(ship, *door) for _, door in door_list], DOOR_DTYPE)
+                door_names.extend(door_name for door_name, _ in door_list)
+                report.parsed.append(name)
+        file_names.append(name)
+        errors.append(error or "")
+        if error is not None:
+            report.errors[name] = error
+            file_rows.append((stat.st_mtime_ns, stat.st_size, -1, door_start, 0))
+            continue
+        file_rows.append((stat.st_mtime_ns, stat.st_size, ship, door_start, len(door_rows)))
+        door_start += len(door_rows)
+        names.append(name)
+        ships.append(ship_row)
+        doors.append(door_rows)
+
+    ship_table = np.array(ships, SHIP_DTYPE)
+    door_table = np.concatenate(doors) if doors else np.zeros(0, DOOR_DTYPE)
+
+    # Rewrite the index if any file was added, changed or removed. The old
+    # tables are released first so their files can be replaced.
+    changed = index is None or len(stale) > 0 or len(cached) != len(index["names"])
+    del index
+    if use_index and changed:
+        _write_index(directory, {"files": np.array(file_rows, FILE_DTYPE),
+                                 "names": np.array(file_names, dtype=str),
+                                 "errors": np.array(errors, dtype=str),
+                                 "ships": ship_table,
+                                 "doors": door_table,
+                                 "door_names": np.array(door_names, dtype=str)})
+
+    ship_names = [os.path.splitext(name)[0] for name in names]
+    store = fleet_store.FleetStore.from_arrays(ship_names, ship_table, door_names, door_table)
+    return store, report
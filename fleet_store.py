@@ -0,0 +1,179 @@
+import numpy as np
+
+# Columnar store of the fleet library: one structured array row per ship
+# with a column per SHIP_ATTR attribute, and a door table keyed by ship id
+# with a column per DOOR_ATTR attribute. Nothing in here may import Qt;
+# ship_editor is a view onto it, the solver and exports read it directly.
+#
+# Missing or invalid values are NaN in float columns and -1 in int columns.
+
+SHIP_DTYPE = np.dtype([("length", np.float64),
+                       ("pattern", np.int32),
+                       ("color", np.int64),
+                       ("width", np.float64)])
+DOOR_DTYPE = np.dtype([("ship", np.int64),
+                       ("side", np.int8),
+                       ("bow_distance", np.float64),
+                       ("stern_distance", np.float64),
+                       ("width", np.float64),
+                       ("height", np.float64),
+                       ("height_above_waterline", np.float64)])
+
+SHIP_FIELDS = SHIP_DTYPE.names
+DOOR_FIELDS = DOOR_DTYPE.names[1:]
+
+INITIAL_CAPACITY = 64
+
+def _missing_row(dtype: np.dtype) -> np.ndarray:
+    row = np.zeros(1, dtype)
+    for field in dtype.names:
+        row[field] = np.nan if dtype[field].kind == 'f' else -1
+    return row[0]
+
+MISSING_SHIP = _missing_row(SHIP_DTYPE)
+MISSING_DOOR = _missing_row(DOOR_DTYPE)
+
+# True where every listed column of a table holds a value
+def _complete(table: np.ndarray, fields: tuple) -> np.ndarray:
+    complete = np.ones(len(table), dtype=bool)
+    for field in fields:
+        column = table[field]
+        complete &= np.isfinite(column) if column.dtype.kind == 'f' else column >= 0
+    return complete
+
+class FleetStore:
+    def __init__(self):
+        self._ships = np.zeros(INITIAL_CAPACITY, SHIP_DTYPE)
+        self._doors = np.zeros(INITIAL_CAPACITY, DOOR_DTYPE)
+        self.ship_count = 0
+        self.door_count = 0
+        self.names = []
+        self.door_names = []
+        self._ship_doors = [] # Door ids of every ship, in door order
+
+    # Build a store from whole tables, doors["ship"] indexes into `ships`
+    @classmethod
+    def from_arrays(cls, names: list, ships: np.ndarray, door_names: list,
+                    doors: np.ndarray):
+        store = cls()
+        order = np.argsort(doors["ship"], kind="stable")
+        store._ships = np.array(ships, SHIP_DTYPE)
+        store._doors = np.array(doors[order], DOOR_DTYPE)
+        store.ship_count = len(store._ships)
+        store.door_count = len(store._doors)
+        store.names = list(names)
+        store.door_names = [door_names[i] for i in order]
+        bounds = np.searchsorted(store._doors["ship"], np.arange(store.ship_count + 1))
+        store._ship_doors = [list(range(bounds[i], bounds[i + 1]))
+                             for i in range(store.ship_count)]
+        return store
+
+    def __len__(self) -> int:
+        return self.ship_count
+
+    # Live views of the used part of each table
+    @property
+    def ships(self) -> np.ndarray:
+        return self._ships[:self.ship_count]
+
+    @property
+    def doors(self) -> np.ndarray:
+        return self._doors[:self.door_count]
+
+    # Double a table's capacity when it is full
+    @staticmethod
+    def _grow(table: np.ndarray, count: int) -> np.ndarray:
+        if count < len(table):
+            return table
+        grown = np.zeros(max(INITIAL_CAPACITY, len(table) * 2), table.dtype)
+        grown[:count] = table[:count]
+        return grown
+
+    def add_ship(self, name: str, values: dict | None = None) -> int:
+        self._ships = self._grow(self._ships, self.ship_count)
+        ship = self.ship_count
+        self._ships[ship] = MISSING_SHIP
+        self.ship_count += 1
+        self.names.append(name)
+        self._ship_doors.append([])
+        for field, value in (values or {}).items():
+            self.set_ship_value(ship, field, value)
+        return ship
+
+    def add_door(self, ship: int, name: str, values: dict | None = None) -> int:
+        self._doors = self._grow(self._doors, self.door_count)
+        door = self.door_count
+        self._doors[door] = MISSING_DOOR
+        self._doors["ship"][door] = ship
+        self.door_count += 1
+        self.door_names.append(name)
+        self._ship_doors[ship].append(door)
+        for field, value in (values or {}).items():
+            self.set_door_value(door, field, value)
+        return door
+
+    # A value of None marks the field as missing
+    def set_ship_value(self, ship: int, field: str, value):
+        self._ships[field][ship] = MISSING_SHIP[field] if value is None else value
+
+    def set_door_value(self, door: int, field: str, value):
+        self._doors[field][door] = MISSING_DOOR[field] if value is None else value
+
+    def ship_value(self, ship: int, field: str):
+        return self._ships[field][ship].item()
+
+    def door_value(self, door: int, field: str):
+        return self._doors[field][door].item()
+
+    def doors_of(self, ship: int) -> np.ndarray:
+        return np.array(self._ship_doors[ship], dtype=np.int64)
+
+    # Position of a door among the doors of its ship
+    def door_index(self, door: int) -> int:
+        return self._ship_doors[self._doors["ship"][door]].index(door)
+
+    def find(self, name: str) -> int | None:
+        try:
+            return self.names.index(name)
+        except ValueError:
+            return None
+
+    # Ships with every attribute set and at least one complete door
+    def valid(self) -> np.ndarray:
+        ships, doors = self.ships, self.doors
+        door_count = np.bincount(doors["ship"], minlength=len(ships))
+        bad_doors = np.bincount(doors["ship"], weights=~_complete(doors, DOOR_FIELDS),
+                                minlength=len(ships))
+        return _complete(ships, SHIP_FIELDS) & (door_count > 0) & (bad_doors == 0)
+
+    def door_valid(self, doors: np.ndarray | None = None) -> np.ndarray:
+        return _complete(self.doors if doors is None else self._doors[doors], DOOR_FIELDS)
+
+    # Number of missing values of a ship and its doors
+    def missing_count(self, ship: int) -> int:
+        row = self._ships[ship:ship + 1]
+        doors = self._doors[self.doors_of(ship)]
+        missing = sum(int(not _complete(row, (field,))[0]) for field in SHIP_FIELDS)
+        missing += sum(int((~_complete(doors, (field,))).sum()) for field in DOOR_FIELDS)
+        return missing
+
+    def is_valid(self, ship: int) -> bool:
+        doors = self._doors[self.doors_of(ship)]
+        return bool(len(doors) > 0 and
+                    _complete(self._ships[ship:ship + 1], SHIP_FIELDS)[0] and
+                    _complete(doors, DOOR_FIELDS).all())
+
+    # Values of a ship in the layout of the ship .json files
+    def to_dict(self, ship: int) -> dict:
+        d = {field: self.ship_value(ship, field) for field in SHIP_FIELDS}
+        for door in self._ship_doors[ship]:
+            d[self.door_names[door]] = {field: self.door_value(door, field)
+                                        for field in DOOR_FIELDS}
+        return d
+
+    def add_from_dict(self, name: str, d: dict) -> int:
+        ship = self.add_ship(name, {field: d[field] for field in SHIP_FIELDS})
+        for door_name, door in d.items():
+            if type(door) == dict:
+                self.add_door(ship, door_name, {field: door[field] for field in DOOR_FIELDS})
+        return ship
@@ -1,5 +1,14 @@
 import sys
 import os
+import typing
+import datetime
+from concurrent.futures.process import BrokenProcessPool
+
+# `main.py batch ...` plans days without a GUI, see batch.py. It has to be
+# handled before Qt is imported.
+if __name__ == "__main__" and sys.argv[1:2] == ["batch"]:
+    import batch
+    sys.exit(batch.main(sys.argv[2:]))
 
 from PySide6.QtCore import *
 from PySide6.QtGui import *
@@ -8,10 +17,16 @@ from PySide6.QtWidgets import *
 import ship_map
 import ship_editor
 import ship_planner
+import scene_file
+import schedule_db
+import portfolio
+import plan_sheets
 
 PROGRAM_NAME = "Flynn Cruiseport Planner"
 get_icon = lambda s: os.path.join(os.getcwd(), "icons", f"{s}.png")
 LOGO = get_icon("logo")
+SCENE_FILTER = "Scene files (*.scn)"
+SHEET_FILTER = "PDF (*.pdf);;PNG images, one per day (*.png)"
 
 #FIXME: Redundant
 PALLETTE_MASSPORT = QPalette()
@@ -43,15 +58,195 @@ class Window(QMainWindow):
         QIcon.setThemeName("Material Symbols Outlined")
 
         # Setup widgets
-        self.setCentralWidget(ship_map.ShipMap())
+        port_map = ship_map.ShipMap()
+        self.setCentralWidget(port_map)
 
         # pane = ship_editor.ShipPane() 
+        editor = ship_editor.ShipView()
+        editor.load_library()
+        timeline = ship_planner.Timeline()
+        scheduler = ship_planner.Scheduler()
+        scheduler.set_ship_model(editor.model())
+
+        # Share the scheduler's quay occupancy with the timeline and map
+        timeline.set_occupancy(scheduler.occupancy)
+        port_map.set_occupancy(scheduler.occupancy)
+        timeline.time_changed.connect(port_map.set_time)
+        timeline.time_changed.connect(scheduler.gantt.set_time)
+        scheduler.occupancy_changed.connect(timeline.update_alongside)
+        scheduler.occupancy_changed.connect(port_map.update_occupancy)
+        scheduler.workable_changed.connect(timeline.set_workable)
+        scheduler.playback_changed.connect(port_map.set_playback)
+        port_map.bollard_clicked.connect(scheduler.toggle_bollard)
+
+        # Days of the local schedule, or of the open scene file, are swapped
+        # in as the calendar moves
+        timeline.day_closing.connect(scheduler.close_day)
+        timeline.day_changed.connect(scheduler.show_day)
+        self.timeline = timeline
+        self.scheduler = scheduler
+        self.scene = None
+        self.schedule = schedule_db.ScheduleDB()
+        scheduler.set_schedule(self.schedule)
+        timeline.set_schedule(self.schedule)
+
+        # File menu
+        open_action = QAction("Open Scene...", self)
+        open_action.setShortcut(QKeySequence.Open)
+        open_action.triggered.connect(self.open_scene)
+        new_action = QAction("New Scene...", self)
+        new_action.setShortcut(QKeySequence.New)
+        new_action.triggered.connect(lambda: self.open_scene(new=True))
+        save_action = QAction("Save Scene", self)
+        save_action.setShortcut(QKeySequence.Save)
+        save_action.triggered.connect(self.save_scene)
+        export_action = QAction("Export Plan Sheets...", self)
+        export_action.triggered.connect(self.export_sheets)
+        self.export_action = export_action
+        self._export_thread = None
+        file_menu = self.menuBar().addMenu("File")
+        for action in (new_action, open_action, save_action, export_action, exit_action):
+            file_menu.addAction(action)
+
         self.addDockWidget(Qt.DockWidgetArea.LeftDockWidgetArea,
-                           DockWidget(ship_editor.ShipView()))
+                           DockWidget(editor))
         self.addDockWidget(Qt.DockWidgetArea.RightDockWidgetArea,
-                           DockWidget(ship_planner.Timeline()))
+                           DockWidget(timeline))
         self.addDockWidget(Qt.DockWidgetArea.RightDockWidgetArea,
-                           DockWidget(ship_planner.Scheduler()))
+                           DockWidget(scheduler))
+
+    @Slot()
+    def open_scene(self, new: bool = False):
+        if new:
+            path, _ = QFileDialog.getSaveFileName(self, "New Scene", filter=SCENE_FILTER)
+        else:
+            path, _ = QFileDialog.getOpenFileName(self, "Open Scene", filter=SCENE_FILTER)
+        if not path:
+            return
+        try:
+            self.scene = scene_file.SceneFile(path)
+        except (OSError, scene_file.SceneError) as error:
+            QMessageBox.warning(self, "Open Scene", str(error))
+            return
+        self.scheduler.set_scene(self.scene)
+        # A new file starts with the day being planned
+        if new:
+            self.scheduler.close_day(self.timeline.date.toPython())
+        self.timeline.set_scene(self.scene)
+
+    # Write the shown day and every other changed day to the scene file
+    @Slot()
+    def save_scene(self):
+        if self.scene is None:
+            self.open_scene(new=True)
+            if self.scene is None:
+                return
+        self.scheduler.close_day(self.timeline.date.toPython())
+        try:
+            self.scene.save()
+        except OSError as error:
+            QMessageBox.warning(self, "Save Scene", str(error))
+
+    # Print sheets of every planned day of the month shown in the calendar,
+    # from the open scene file or else the local schedule
+    @Slot()
+    def export_sheets(self):
+        if self._export_thread is not None:
+            return
+        path, chosen = QFileDialog.getSaveFileName(self, "Export Plan Sheets",
+                                                   filter=SHEET_FILTER)
+        if not path:
+            return
+        if chosen.startswith("PNG"):
+            path = os.path.splitext(path)[0] # Directory of the images
+        elif not path.lower().endswith(".pdf"):
+            path += ".pdf"
+
+        self.scheduler.close_day(self.timeline.date.toPython())
+        calender = self.timeline.calender
+        first = datetime.date(calender.yearShown(), calender.monthShown(), 1)
+        last = (first + datetime.timedelta(days=31)).replace(day=1) - datetime.timedelta(days=1)
+        store = self.scheduler.ship_model.store
+        try:
+            if self.scene is not None:
+                plans = [(day, self.scene.load(day)) for day in self.scene.days()
+                         if first <= day <= last]
+            else:
+                plans = [(day, self.schedule.load_day(day, store))
+                         for day in self.schedule.days_with_calls(first, last)]
+        except scene_file.SceneError as error:
+            QMessageBox.warning(self, "Export Plan Sheets", str(error))
+            return
+        plans = [(day, plan) for day, plan in plans if plan is not None and len(plan)]
+        if not plans:
+            QMessageBox.information(self, "Export Plan Sheets",
+                                    f"No plans for {first.strftime('%B %Y')}")
+            return
+
+        thread = self.ExportThread(plans, path, self)
+        thread.progress.connect(self._export_progress)
+        thread.exported.connect(self._exported)
+        thread.failed.connect(self._export_failed)
+        thread.finished.connect(self._export_finished)
+        thread.finished.connect(thread.deleteLater)
+        self._export_thread = thread
+        self.export_action.setEnabled(False)
+        self.statusBar().showMessage(f"Exporting {len(plans)} plan sheets...")
+        thread.start()
+
+    @Slot(int, int)
+    def _export_progress(self, done: int, total: int):
+        self.statusBar().showMessage(f"Exporting plan sheets, {done} of {total} done")
+
+    @Slot(list)
+    def _exported(self, paths: list):
+        self.statusBar().showMessage(f"Exported plan sheets to {os.path.dirname(paths[0])}"
+                                     if len(paths) > 1 else f"Exported {paths[0]}")
+
+    @Slot(str)
+    def _export_failed(self, message: str):
+        self.statusBar().clearMessage()
+        QMessageBox.warning(self, "Export Plan Sheets", message)
+
+    # Also reached when the export raised, so it can always be started again
+    @Slot()
+    def _export_finished(self):
+        self._export_thread = None
+        self.export_action.setEnabled(True)
+
+    # Keep the shown day in the local schedule. A running export is finished
+    # first, its sheets are written in worker processes.
+    @typing.override
+    def closeEvent(self, event: QCloseEvent):
+        self.scheduler.stop_solving()
+        self.scheduler.stop_optimising()
+        if self._export_thread is not None:
+            self._export_thread.wait()
+        self.scheduler.close_day(self.timeline.date.toPython())
+        self.schedule.close()
+        portfolio.shutdown()
+        super().closeEvent(event)
+
+    # Renders plan sheets off the GUI thread, plan_sheets.export hands the
+    # days to worker processes and assembles the PDF
+    class ExportThread(QThread):
+        progress = Signal(int, int) # Sheets done, total
+        exported = Signal(list) # Paths written
+        failed = Signal(str)
+
+        def __init__(self, plans: list, path: str, parent: QObject=None):
+            super().__init__(parent)
+            self.plans = plans
+            self.path = path
+
+        @typing.override
+        def run(self):
+            try:
+                paths = plan_sheets.export(self.plans, self.path, progress=self.progress.emit)
+            except (OSError, BrokenProcessPool) as error:
+                self.failed.emit(str(error) or type(error).__name__)
+                return
+            self.exported.emit(paths)
 
 if __name__ == "__main__":
     app = QApplication()
@@ -0,0 +1,148 @@
+import random
+
+# Occupancy of the quay over time. Every entry is a rectangle of quay
+# chainage [c0, c1) by time [t0, t1) and is kept in a treap ordered by t0.
+# Each node also carries the latest t1 and the chainage extent of its
+# subtree, so overlap queries skip whole subtrees in both dimensions.
+#
+# Insert, remove and move are O(log n) expected, an overlap query is
+# O(log n + k) for k hits.
+
+class _Node:
+    __slots__ = ("key", "c0", "c1", "t0", "t1", "priority", "left", "right",
+                 "max_t1", "min_c0", "max_c1")
+
+    def __init__(self, key, c0: float, c1: float, t0: float, t1: float):
+        self.key = key
+        self.c0 = c0
+        self.c1 = c1
+        self.t0 = t0
+        self.t1 = t1
+        self.priority = random.random()
+        self.left = None
+        self.right = None
+        self.update()
+
+    # Order by start time, ties broken by insertion id
+    def order(self) -> tuple:
+        return (self.t0, id(self))
+
+    def update(self):
+        self.max_t1 = self.t1
+        self.min_c0 = self.c0
+        self.max_c1 = self.c1
+        for child in (self.left, self.right):
+            if child is not None:
+                if child.max_t1 > self.max_t1:
+                    self.max_t1 = child.max_t1
+                if child.min_c0 < self.min_c0:
+                    self.min_c0 = child.min_c0
+                if child.max_c1 > self.max_c1:
+                    self.max_c1 = child.max_c1
+
+# Split into nodes ordered before `order` and the rest
+def _split(node: _Node | None, order: tuple) -> tuple:
+    if node is None:
+        return None, None
+    if node.order() < order:
+        node.right, right = _split(node.right, order)
+        node.update()
+        return node, right
+    left, node.left = _split(node.left, order)
+    node.update()
+    return left, node
+
+def _merge(left: _Node | None, right: _Node | None) -> _Node | None:
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.priority > right.priority:
+        left.right = _merge(left.right, right)
+        left.update()
+        return left
+    right.left = _merge(left, right.left)
+    right.update()
+    return right
+
+def _remove(node: _Node, target: _Node) -> _Node | None:
+    if node is target:
+        return _merge(node.left, node.right)
+    if target.order() < node.order():
+        node.left = _remove(node.left, target)
+    else:
+        node.right = _remove(node.right, target)
+    node.update()
+    return node
+
+class OccupancyIndex:
+    def __init__(self):
+        self._root = None
+        self._nodes = {}
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def __contains__(self, key) -> bool:
+        return key in self._nodes
+
+    def __iter__(self):
+        return iter(self._nodes)
+
+    def clear(self):
+        self._root = None
+        self._nodes.clear()
+
+    def get(self, key) -> tuple[float, float, float, float]:
+        node = self._nodes[key]
+        return node.c0, node.c1, node.t0, node.t1
+
+    def insert(self, key, c0: float, c1: float, t0: float, t1: float):
+        if key in self._nodes:
+            self.remove(key)
+        node = _Node(key, c0, c1, t0, t1)
+        left, right = _split(self._root, node.order())
+        self._root = _merge(_merge(left, node), right)
+        self._nodes[key] = node
+
+    def remove(self, key):
+        node = self._nodes.pop(key)
+        self._root = _remove(self._root, node)
+
+    def discard(self, key):
+        if key in self._nodes:
+            self.remove(key)
+
+    def move(self, key, c0: float, c1: float, t0: float, t1: float):
+        self.insert(key, c0, c1, t0, t1)
+
+    # Keys of every entry overlapping [c0, c1) x [t0, t1)
+    def overlaps(self, c0: float, c1: float, t0: float, t1: float,
+                 exclude=None) -> list:
+        hits = []
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            if (node is None or node.max_t1 <= t0 or
+                node.min_c0 >= c1 or node.max_c1 <= c0):
+                continue
+            stack.append(node.left)
+            # Nodes right of one starting after t1 all start after t1 too
+            if node.t0 < t1:
+                stack.append(node.right)
+                if (node.t1 > t0 and node.c0 < c1 and node.c1 > c0 and
+                    node.key != exclude):
+                    hits.append(node.key)
+        return hits
+
+    def is_free(self, c0: float, c1: float, t0: float, t1: float,
+                exclude=None) -> bool:
+        return len(self.overlaps(c0, c1, t0, t1, exclude)) == 0
+
+    # Keys of the entries overlapping the entry stored under `key`
+    def conflicts(self, key) -> list:
+        return self.overlaps(*self.get(key), exclude=key)
+
+    # Keys of every entry alongside at time t
+    def at(self, t: float) -> list:
+        return self.overlaps(float("-inf"), float("inf"), t, t + 1)
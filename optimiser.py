@@ -0,0 +1,163 @@
+import time
+import numpy as np
+
+import berth_solver
+import port_layout
+
+# Anytime optimiser for a berth plan. Starting from a plan it keeps trying
+# to improve it by large neighbourhood search: each step frees a few calls
+# close to each other in time and along the quay, lets the solver place them
+# again in a random order and keeps the result if it scores better. It can
+# be stopped at any moment and always holds the best plan found so far.
+#
+# Plans are compared on dropped calls first, then on the weighted sum of the
+# secondary objectives:
+#
+#   gangway    feet every shore gangway of the layout slides between the
+#              doors of the calls it serves, in order of arrival
+#   water      calls that take water from another tree than the call before
+#              them on the same stretch of quay, each one is a hose moved
+#   bollards   bollards a call uses that the call before it on the same
+#              stretch of quay did not, each one is lines moved
+#   clearance  feet short of PREFERRED_CLEARANCE between ships alongside at
+#              the same time
+#
+# Headless, nothing in here may import Qt.
+
+PREFERRED_CLEARANCE = 100.0
+WEIGHTS = {"gangway": 1.0, "water": 50.0, "bollards": 50.0, "clearance": 2.0}
+OBJECTIVES = ("dropped", *WEIGHTS, "cost")
+NEIGHBOURHOOD = 4 # Calls freed per step
+STEP_NODES = 400
+START_NODES = 2000 # For the first plan when none is given, steps improve on it
+
+# Registry row of the gangway serving a call and the chainage it lands at.
+# Of the usable doors and the gangways wide enough for them, the pair the
+# gangway slides least for. -1 when the quay has no gangway for the call.
+def gangway_landing(call: berth_solver.Call, gangways: port_layout.GangwayRegistry,
+                    start: float, side: int) -> tuple[int, float]:
+    usable = call.usable_doors(side)
+    doors = call.door_chainages(start, side)[usable]
+    fits = call.doors[usable, berth_solver.DOOR_WIDTH, None] >= gangways.min_width
+    if not fits.any():
+        return -1, np.nan
+    slide = np.where(fits, np.abs(doors[:, None] - gangways.chainage), np.inf)
+    door, gangway = np.unravel_index(np.argmin(slide), slide.shape)
+    return int(gangway), float(doors[door])
+
+# Registry row of the water tree nearest the hull, -1 when the quay has none
+def water_tree(trees: port_layout.WaterTreeRegistry, start: float, end: float) -> int:
+    if len(trees) == 0:
+        return -1
+    return int(np.argmin(np.fmax(np.fmax(start - trees.chainage, trees.chainage - end), 0)))
+
+# Value of every objective for a plan, and their weighted cost
+def evaluate(solution: berth_solver.Solution, weights: dict = WEIGHTS) -> dict[str, float]:
+    problem = solution.problem
+    assigned = solution.assigned
+    start = np.where(assigned, solution.starts, np.nan)
+    end = start + problem.lengths
+    arrival, departure = problem.windows[:, 0], problem.windows[:, 1]
+
+    # Call before each one on an overlapping stretch of quay, the one that
+    # left last before it arrived
+    same_stretch = (start[:, None] < end[None, :]) & (start[None, :] < end[:, None])
+    before = same_stretch & (departure[:, None] <= arrival[None, :])
+    left = np.where(before, departure[:, None], np.iinfo(np.int64).min)
+    previous = np.argmax(left, axis=0)
+    has_previous = before.any(axis=0)
+
+    # Gangway and water tree each berthed call is worked from
+    quay = problem.quay
+    gangways = np.full(len(problem.calls), -1)
+    landings = np.full(len(problem.calls), np.nan)
+    trees = np.full(len(problem.calls), -1)
+    for call in np.flatnonzero(assigned):
+        gangways[call], landings[call] = gangway_landing(
+            problem.calls[call], quay.gangways, start[call], solution.sides[call])
+        trees[call] = water_tree(quay.water_trees, start[call], end[call])
+
+    gangway = 0.0
+    for row in range(len(quay.gangways)):
+        served = np.flatnonzero(gangways == row)
+        served = served[np.argsort(arrival[served], kind="stable")]
+        gangway += float(np.abs(np.diff(landings[served])).sum())
+
+    water = 0
+    bollards = 0
+    for call in np.flatnonzero(has_previous):
+        prev = previous[call]
+        water += int(trees[call] != trees[prev])
+        bollards += len(np.setdiff1d(solution.bollards[call], solution.bollards[prev]))
+
+    # Shortfall of every pair alongside at the same time, counted once
+    gap = np.fmax(start[None, :] - end[:, None], start[:, None] - end[None, :])
+    pairs = np.triu(problem.overlap & ~np.isnan(gap), 1)
+    clearance = float(np.clip(PREFERRED_CLEARANCE - gap[pairs], 0, None).sum())
+
+    values = {"dropped": solution.dropped, "gangway": gangway, "water": water,
+              "bollards": bollards, "clearance": clearance}
+    values["cost"] = sum(weights[name] * values[name] for name in weights)
+    return values
+
+# Lower is better
+score = lambda values = dict: (values["dropped"], values["cost"])
+
+class Optimiser:
+    def __init__(self, problem: berth_solver.Problem,
+                 solution: berth_solver.Solution | None = None,
+                 weights: dict = WEIGHTS, seed: int | None = None):
+        self.problem = problem
+        self.weights = weights
+        self.rng = np.random.default_rng(seed)
+        self.best = solution
+        self.values = None
+        self.steps = 0
+        self._stopped = False
+
+    # Safe to call from another thread, run returns after the current step
+    def stop(self):
+        self._stopped = True
+
+    # Calls freed in one step: a seed, dropped calls preferred, and the calls
+    # alongside at the same time nearest to it along the quay
+    def _neighbourhood(self) -> np.ndarray:
+        best = self.best
+        dropped = np.flatnonzero(~best.assigned & self.problem.domains.any(axis=(1, 2)))
+        if len(dropped) and self.rng.random() < 0.5:
+            seed = int(self.rng.choice(dropped))
+        else:
+            seed = int(self.rng.integers(len(self.problem.calls)))
+        others = np.flatnonzero(self.problem.overlap[seed] & best.assigned)
+        if not best.assigned[seed]:
+            return np.concatenate(([seed], self.rng.permutation(others)[:NEIGHBOURHOOD - 1]))
+        distance = np.abs(best.starts[others] - best.starts[seed])
+        return np.concatenate(([seed], others[np.argsort(distance)][:NEIGHBOURHOOD - 1]))
+
+    # Improve the plan until stopped or out of time. `improved(solution,
+    # values)` is called with every better plan, the first one included.
+    def run(self, improved=None, time_limit: float | None = None) -> berth_solver.Solution:
+        deadline = None if time_limit is None else time.time() + time_limit
+        if self.best is None:
+            self.best = berth_solver.Solver(self.problem, START_NODES, deadline=deadline,
+                                            stop=lambda: self._stopped).solve()
+        elif self.best.clashes().any():
+            self.best = berth_solver.repair(self.problem, self.best,
+                                            np.flatnonzero(self.best.clashes()))
+        self.values = evaluate(self.best, self.weights)
+        if improved is not None:
+            improved(self.best, self.values)
+
+        while len(self.problem.calls) > 1 and not self._stopped:
+            if deadline is not None and time.time() >= deadline:
+                break
+            self.steps += 1
+            solver = berth_solver.Solver(self.problem, STEP_NODES, value_order="random",
+                                         seed=int(self.rng.integers(1 << 31)))
+            candidate = solver.repair(self.best, self._neighbourhood(), anchored=False)
+            values = evaluate(candidate, self.weights)
+            if score(values) < score(self.values):
+                self.best, self.values = candidate, values
+                if improved is not None:
+                    improved(self.best, self.values)
+        return self.best
@@ -0,0 +1,278 @@
+import os
+import datetime
+import multiprocessing
+import concurrent.futures
+import numpy as np
+
+from PySide6.QtCore import *
+from PySide6.QtGui import *
+from PySide6.QtSvg import *
+
+import port_items
+import port_layout
+import quay_geometry
+import berth_solver
+import fleet_store
+import scene_file
+import schedule_db
+import tides
+import ship_hull
+import berth_gantt
+
+# Printable berth plan sheets, one per day: the port with every berthed
+# hull and the bollards it is made fast to, over a strip of the day's calls
+# against the clock. Sheets are drawn with a QPainter on images, so nothing
+# needs a window.
+#
+# The port layers, bollards and water trees are the same on every sheet.
+# They are rendered from the port_items SVGs once, and the image is handed
+# to every worker, which only paints the day on top. Days are rendered side
+# by side in worker processes and come back as PNG data, written out as
+# files or as the pages of one PDF.
+
+SHEET_DPI = 200
+SHEET_SIZE = QSize(2339, 1654) # A4 landscape at SHEET_DPI
+MARGIN = 60
+TITLE_HEIGHT = 70
+STRIP_GAP = 30 # Between the map and the strip
+STRIP_LABEL_WIDTH = 620
+STRIP_HEADER_HEIGHT = 30
+MAX_LANE_HEIGHT = 36
+BOLLARD_MARK = 6 # Pixels, radius of the ring round a used bollard
+FONT_SIZE = 18 # Pixels
+TITLE_FONT_SIZE = 36
+MAP_RECT = QRectF(0, 0, port_items.SCENE_WIDTH, port_items.SCENE_HEIGHT)
+
+_app = None
+_background = None # Set in every worker, see _init_worker
+
+# Part of the sheet the port is drawn into, keeping the scene's aspect
+def map_rect() -> QRect:
+    width = SHEET_SIZE.width() - 2 * MARGIN
+    return QRect(MARGIN, MARGIN + TITLE_HEIGHT, width,
+                 round(width * MAP_RECT.height() / MAP_RECT.width()))
+
+# Scene to sheet transform of the map
+def map_transform() -> QTransform:
+    rect = map_rect()
+    scale = rect.width() / MAP_RECT.width()
+    return QTransform(scale, 0, 0, scale, rect.left(), rect.top())
+
+# The parts of a sheet that do not change from day to day. Needs a
+# QGuiApplication.
+def background() -> QImage:
+    image = QImage(SHEET_SIZE, QImage.Format.Format_ARGB32_Premultiplied)
+    image.fill(Qt.GlobalColor.white)
+    painter = QPainter(image)
+    painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+    painter.setClipRect(map_rect())
+    painter.setTransform(map_transform())
+    for layer in port_items.Background.LAYERS:
+        renderer = QSvgRenderer(port_items.get_svg(layer))
+        renderer.render(painter, QRectF(QPointF(0, 0), QSizeF(renderer.defaultSize())))
+
+    # Bollards and water trees centred on their coordinates
+    layout = port_layout.load_layout()
+    for svg, registry in ((port_items.WATER_TREE_ID, layout.water_trees),
+                          (port_items.BOLLARD_ID, layout.bollards)):
+        renderer = QSvgRenderer(port_items.get_svg(svg))
+        size = QSizeF(renderer.defaultSize())
+        for x, y in zip(registry.x.tolist(), registry.y.tolist()):
+            renderer.render(painter, QRectF(QPointF(x - size.width() / 2,
+                                                    y - size.height() / 2), size))
+    painter.end()
+    return image
+
+def _init_worker(data: bytes, width: int, height: int):
+    global _app, _background
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    _app = QGuiApplication.instance() or QGuiApplication([])
+    _background = QImage(data, width, height,
+                         QImage.Format.Format_ARGB32_Premultiplied).copy()
+
+def _font(size: int, bold: bool = False) -> QFont:
+    font = QFont()
+    font.setPixelSize(size)
+    font.setBold(bold)
+    return font
+
+# Colour and brush of a ship, as the map draws it
+def _brush(store: fleet_store.FleetStore, ship: int) -> QBrush:
+    color = QColor(int(max(store.ships["color"][ship], 0)))
+    pattern = int(store.ships["pattern"][ship])
+    return QBrush(color, Qt.BrushStyle(pattern) if pattern > 0 else Qt.BrushStyle.SolidPattern)
+
+# Draws one day on a copy of the background
+def render(day: datetime.date, plan: scene_file.DayPlan, base: QImage) -> QImage:
+    image = base.copy()
+    store = fleet_store.FleetStore.from_arrays(plan.names, plan.ships, plan.door_names,
+                                               plan.doors)
+    layout = port_layout.load_layout()
+    quay = berth_solver.Quay.from_layout(layout, quay_geometry.load_edge())
+    edge = quay.edge
+    slots = plan.slots
+    ships = slots["ship"].tolist()
+    berthed = np.flatnonzero(~np.isnan(slots["start"])).tolist()
+    assigned = set(berthed)
+
+    painter = QPainter(image)
+    painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+    painter.setFont(_font(TITLE_FONT_SIZE, bold=True))
+    painter.drawText(QRect(MARGIN, MARGIN, SHEET_SIZE.width() - 2 * MARGIN, TITLE_HEIGHT),
+                     Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignTop,
+                     f"Berth plan {day.strftime('%A %d %B %Y')}")
+
+    # Hulls at their berths, placed and turned the way the map places them
+    area = map_rect()
+    transform = map_transform()
+    painter.setClipRect(area)
+    pen = QPen(Qt.GlobalColor.black)
+    pen.setCosmetic(True)
+    labels = []
+    for i in berthed:
+        geometry = ship_hull.hull_geometry(store, ships[i])
+        paths = ship_hull.hull_paths(geometry)
+        x, y = edge.point(float(slots["start"][i]))
+        hull = QTransform.fromTranslate(float(x), float(y))
+        if slots["side"][i] == berth_solver.STARBOARD and geometry is not None:
+            length, width, _ = geometry
+            hull = QTransform(-1, 0, 0, -1, length, width) * hull
+        painter.setTransform(hull * transform)
+        painter.setPen(pen)
+        painter.setBrush(_brush(store, ships[i]))
+        painter.drawPath(paths.hull)
+        painter.setBrush(Qt.GlobalColor.black)
+        painter.drawPath(paths.doors)
+        labels.append((i, (hull * transform).mapRect(paths.bounds).center()))
+
+    # Bollards of every berth, ringed in the colour of the ship on them
+    painter.resetTransform()
+    painter.setBrush(Qt.BrushStyle.NoBrush)
+    painter.setFont(_font(FONT_SIZE))
+    registry = layout.bollards
+    for i in berthed:
+        color = QColor(int(max(store.ships["color"][ships[i]], 0)))
+        painter.setPen(QPen(color, 3))
+        for row in registry.lookup(plan.bollards_of(i)).tolist():
+            if row < 0:
+                continue
+            centre = transform.map(QPointF(registry.x[row], registry.y[row]))
+            painter.drawEllipse(centre, BOLLARD_MARK, BOLLARD_MARK)
+    painter.setPen(Qt.GlobalColor.black)
+    for i, centre in labels:
+        painter.drawText(QRectF(centre.x() - 20, centre.y() - 20, 40, 40),
+                         Qt.AlignmentFlag.AlignCenter, str(i + 1))
+    painter.setClipping(False)
+
+    # Strip of the calls against the clock, a lane each
+    top = area.bottom() + STRIP_GAP
+    bottom = SHEET_SIZE.height() - MARGIN
+    body = QRect(MARGIN + STRIP_LABEL_WIDTH, top + STRIP_HEADER_HEIGHT,
+                 SHEET_SIZE.width() - 2 * MARGIN - STRIP_LABEL_WIDTH,
+                 bottom - top - STRIP_HEADER_HEIGHT)
+    lane = min(MAX_LANE_HEIGHT, body.height() / max(len(slots), 1))
+    x_of = lambda t: body.left() + body.width() * t / berth_gantt.SECONDS_IN_DAY
+    painter.setPen(QColor(Qt.GlobalColor.gray))
+    for hour in range(0, 24, 2):
+        painter.drawLine(QPointF(x_of(hour * 3600), top + STRIP_HEADER_HEIGHT),
+                         QPointF(x_of(hour * 3600), top + STRIP_HEADER_HEIGHT + lane * len(slots)))
+        painter.drawText(QPointF(x_of(hour * 3600) + 3, top + STRIP_HEADER_HEIGHT - 8),
+                         berth_gantt.clock(hour * 3600))
+
+    # Stretches when no gangway reaches a door, on the side each call lies
+    cut_offs = {}
+    if berthed:
+        try:
+            table = tides.load_tides()
+        except (OSError, ValueError, KeyError):
+            table = None # Door heights go unchecked
+        if table is not None:
+            calls = [berth_solver.Call.from_store(store, ships[i], str(i),
+                                                  int(slots["arrival"][i]),
+                                                  int(slots["departure"][i])) for i in berthed]
+            mask = tides.workable(table, calls, quay, schedule_db.instant(day, 0))
+            for k, i in enumerate(berthed):
+                stay = np.zeros(mask.shape[2], dtype=bool)
+                stay[int(slots["arrival"][i]) // tides.MINUTE:
+                     -(-int(slots["departure"][i]) // tides.MINUTE)] = True
+                cut_offs[i] = tides.windows(stay & ~mask[k, int(slots["side"][i])])
+
+    hatch = QBrush(QColor(0, 0, 0, 90), Qt.BrushStyle.BDiagPattern)
+    for i in range(len(slots)):
+        y = body.top() + i * lane
+        arrival, departure = int(slots["arrival"][i]), int(slots["departure"][i])
+        text = (f"{i + 1}  {plan.names[ships[i]]}  {berth_gantt.clock(arrival)}-"
+                f"{berth_gantt.clock(departure)}")
+        if i in assigned:
+            text += (f"  {slots['start'][i]:g}-{slots['end'][i]:g} ft "
+                     f"{berth_gantt.SIDE_NAMES[int(slots['side'][i])]}")
+        else:
+            text += "  unassigned"
+        painter.setPen(Qt.GlobalColor.black)
+        painter.drawText(QRectF(MARGIN, y, STRIP_LABEL_WIDTH - 10, lane),
+                         Qt.AlignmentFlag.AlignVCenter, painter.fontMetrics().elidedText(
+                             text, Qt.TextElideMode.ElideRight, STRIP_LABEL_WIDTH - 10))
+        bar = QRectF(x_of(arrival), y + lane * 0.15, x_of(departure) - x_of(arrival), lane * 0.7)
+        painter.setBrush(_brush(store, ships[i]) if i in assigned else Qt.BrushStyle.NoBrush)
+        painter.drawRect(bar)
+        for start, end in cut_offs.get(i, ()):
+            painter.fillRect(QRectF(x_of(start), bar.top(), x_of(end) - x_of(start),
+                                    bar.height()), hatch)
+    painter.end()
+    return image
+
+# Runs in a worker. Writes the sheet to `path`, or returns it as PNG data
+# without one.
+def _render(day: datetime.date, plan: scene_file.DayPlan, path: str | None) -> bytes | None:
+    image = render(day, plan, _background)
+    if path is not None:
+        if not image.save(path, "PNG"):
+            raise OSError(f"Could not write {path}")
+        return None
+    data = QByteArray()
+    buffer = QBuffer(data)
+    buffer.open(QIODevice.OpenModeFlag.WriteOnly)
+    image.save(buffer, "PNG")
+    return data.data()
+
+# Sheets of the given days. A path ending in .pdf gets one page per day,
+# any other path is a directory for a <day>.png per day. Returns the paths
+# written. `progress(done, total)` is called as sheets come back. Needs a
+# QGuiApplication, but not its thread.
+def export(plans: list[tuple[datetime.date, scene_file.DayPlan]], path: str,
+           workers: int | None = None, progress=None) -> list[str]:
+    if not plans:
+        return []
+    pdf = path.lower().endswith(".pdf")
+    if not pdf:
+        os.makedirs(path, exist_ok=True)
+    targets = [None if pdf else os.path.join(path, f"{day.isoformat()}.png")
+               for day, _ in plans]
+
+    # Workers are spawned, the caller has Qt running
+    base = background()
+    context = multiprocessing.get_context("spawn")
+    workers = min(workers or os.cpu_count(), len(plans))
+    with concurrent.futures.ProcessPoolExecutor(
+            workers, mp_context=context, initializer=_init_worker,
+            initargs=(bytes(base.constBits()), base.width(), base.height())) as pool:
+        pages = []
+        for page in pool.map(_render, *zip(*plans), targets):
+            pages.append(page)
+            if progress is not None:
+                progress(len(pages), len(plans))
+    if not pdf:
+        return targets
+
+    writer = QPdfWriter(path)
+    writer.setResolution(SHEET_DPI)
+    writer.setPageLayout(QPageLayout(QPageSize(QPageSize.PageSizeId.A4),
+                                     QPageLayout.Orientation.Landscape, QMarginsF()))
+    painter = QPainter(writer)
+    for i, page in enumerate(pages):
+        if i:
+            writer.newPage()
+        painter.drawImage(QRect(QPoint(0, 0), SHEET_SIZE), QImage.fromData(page, "PNG"))
+    if not painter.end():
+        raise OSError(f"Could not write {path}")
+    return [path]
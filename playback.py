@@ -0,0 +1,109 @@
+import numpy as np
+
+# Keyframes of every call over the port day, so the map can show any instant
+# without touching the schedule. A call arrives from sea, lies alongside for
+# each of its berths, shifts between consecutive berths and departs again.
+# Headless, the map only reads positions and states out of it.
+#
+# Keyframes of all calls live in one array sorted by (call, time). Looking
+# up an instant is a single searchsorted over keys of call * KEY_SPAN + time
+# for every call at once, then a linear interpolation to the next keyframe.
+
+MANOEUVRE_TIME = 20 * 60 # Seconds to come alongside or clear the quay
+SHIFT_TIME = 15 * 60 # Seconds to move between two berths of the same call
+APPROACH_OFFSET = 400.0 # Distance off the quay where arrivals appear, feet
+KEY_SPAN = 1 << 32 # Larger than any time range
+
+# States, each describes the motion from a keyframe to the next
+ABSENT = -1 # Not arrived yet
+ARRIVING = 0
+ALONGSIDE = 1
+SHIFTING = 2
+DEPARTING = 3
+DEPARTED = 4
+
+KEYFRAME_DTYPE = np.dtype([("call", np.int64),
+                           ("time", np.int64),
+                           ("chainage", np.float64),
+                           ("offset", np.float64),
+                           ("state", np.int8)])
+
+class Playback:
+    # `segments` holds, per call, its berths as (arrival, departure, chainage)
+    # in time order. Calls without berths never appear.
+    def __init__(self, segments: list[list[tuple[int, int, float]]],
+                 keys: list | None = None):
+        self.keys = list(keys) if keys is not None else list(range(len(segments)))
+        rows = []
+        for call, berths in enumerate(segments):
+            rows.extend(self._call_keyframes(call, berths))
+        self.keyframes = np.array(rows, KEYFRAME_DTYPE)
+        self.keyframes.sort(order=("call", "time"), kind="stable")
+        self._search = self.keyframes["call"] * KEY_SPAN + self.keyframes["time"]
+        self._calls = np.arange(len(segments), dtype=np.int64)
+
+        # First and last keyframe of every call, -1 for calls without any
+        self._first = np.searchsorted(self.keyframes["call"], self._calls, side="left")
+        self._last = np.searchsorted(self.keyframes["call"], self._calls, side="right") - 1
+        empty = self._last < self._first
+        self._first[empty] = -1
+        self._last[empty] = -1
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    @staticmethod
+    def _call_keyframes(call: int, berths: list) -> list[tuple]:
+        rows = []
+        for i, (arrival, departure, chainage) in enumerate(berths):
+            if i == 0:
+                rows.append((call, arrival - MANOEUVRE_TIME, chainage, APPROACH_OFFSET,
+                             ARRIVING))
+            else:
+                # Shifting takes the end of the previous stay
+                rows[-1] = rows[-1][:4] + (SHIFTING,)
+                shift_start = min(max(rows[-1][1], arrival - SHIFT_TIME), arrival)
+                rows[-1] = (call, shift_start) + rows[-1][2:]
+            rows.append((call, arrival, chainage, 0.0, ALONGSIDE))
+            rows.append((call, departure, chainage, 0.0, DEPARTING))
+        if rows:
+            last = rows[-1]
+            rows.append((call, last[1] + MANOEUVRE_TIME, last[2], APPROACH_OFFSET,
+                         DEPARTED))
+        return rows
+
+    # Chainage, offset from the quay and state of every call at time t
+    def at(self, t: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        n = len(self._calls)
+        chainage = np.zeros(n)
+        offset = np.full(n, APPROACH_OFFSET)
+        state = np.full(n, ABSENT, dtype=np.int8)
+        has_frames = self._first >= 0
+        if not has_frames.any():
+            return chainage, offset, state
+
+        # Last keyframe at or before t, per call
+        k = np.searchsorted(self._search, self._calls * KEY_SPAN + t, side="right") - 1
+        started = has_frames & (k >= self._first)
+        frames = self.keyframes
+        k = np.where(started, k, 0)
+        following = np.minimum(k + 1, np.maximum(self._last, 0))
+
+        t0 = frames["time"][k]
+        t1 = frames["time"][following]
+        span = np.maximum(t1 - t0, 1)
+        fraction = np.clip((t - t0) / span, 0.0, 1.0)
+        fraction[following == k] = 0.0
+
+        chainage = np.where(started, frames["chainage"][k] + fraction *
+                            (frames["chainage"][following] - frames["chainage"][k]),
+                            chainage)
+        offset = np.where(started, frames["offset"][k] + fraction *
+                          (frames["offset"][following] - frames["offset"][k]), offset)
+        state = np.where(started, frames["state"][k], state).astype(np.int8)
+        return chainage, offset, state
+
+    # True for the calls that are drawn at time t
+    @staticmethod
+    def visible(state: np.ndarray) -> np.ndarray:
+        return (state != ABSENT) & (state != DEPARTED)
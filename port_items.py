@@ -1,14 +1,17 @@
 import weakref
 import os
 import json
+import math
 import numpy as np
 import typing
 import enum
+from collections import OrderedDict
 from operator import call
 
 from PySide6.QtCore import *
 from PySide6.QtWidgets import *
 from PySide6.QtGui import *
+from PySide6.QtSvg import *
 from PySide6.QtSvgWidgets import *
 
 PEN = Qt.PenStyle.SolidLine
@@ -25,6 +28,97 @@ OCEAN_ID = "ocean"
 
 get_svg = lambda s = str: os.path.join(os.getcwd(), "geometry", f"{s}.svg")
 
+TILE_SIZE = 256 # Pixels
+TILE_BUDGET = 96 * 1024 * 1024 # Bytes of tile pixmaps kept across all layers
+MIN_ZOOM_BUCKET = -6 # Zoom levels are powers of two, 1/64x to 16x
+MAX_ZOOM_BUCKET = 4
+
+# Raster tiles of the port SVG layers. Each layer is rendered once per power
+# of two zoom level into TILE_SIZE pixel tiles, only tiles that become visible
+# are rendered, and the least recently used ones are dropped once the cache
+# grows past its budget. Tiles are shared by every item showing the same SVG,
+# so hundreds of bollards cost one tile per zoom level.
+class TileCache:
+    def __init__(self, budget: int = TILE_BUDGET):
+        self.budget = budget
+        self.size = 0
+        self._tiles = OrderedDict()
+
+    def clear(self):
+        self._tiles.clear()
+        self.size = 0
+
+    def tile(self, renderer: QSvgRenderer, key: str, rect: QRectF,
+             bucket: int, i: int, j: int) -> QPixmap:
+        tile_key = (key, bucket, i, j)
+        pixmap = self._tiles.get(tile_key)
+        if pixmap is not None:
+            self._tiles.move_to_end(tile_key)
+            return pixmap
+
+        # Render the part of the layer under this tile
+        scale = 2.0 ** bucket
+        pixmap = QPixmap(TILE_SIZE, TILE_SIZE)
+        pixmap.fill(Qt.GlobalColor.transparent)
+        painter = QPainter(pixmap)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        painter.translate(-i * TILE_SIZE, -j * TILE_SIZE)
+        painter.scale(scale, scale)
+        renderer.render(painter, rect)
+        painter.end()
+
+        self._tiles[tile_key] = pixmap
+        self.size += TILE_SIZE * TILE_SIZE * 4
+        while self.size > self.budget and len(self._tiles) > 1:
+            self._tiles.popitem(last=False)
+            self.size -= TILE_SIZE * TILE_SIZE * 4
+        return pixmap
+
+TILE_CACHE = TileCache()
+
+# Power of two zoom level closest to a painter's scale
+def zoom_bucket(painter: QPainter) -> int:
+    lod = QStyleOptionGraphicsItem.levelOfDetailFromTransform(painter.worldTransform())
+    bucket = round(math.log2(lod)) if lod > 0 else 0
+    return min(max(bucket, MIN_ZOOM_BUCKET), MAX_ZOOM_BUCKET)
+
+# Blit the cached tiles covering the exposed part of an SVG layer drawn
+# into `rect`
+def draw_tiles(painter: QPainter, renderer: QSvgRenderer, key: str,
+               rect: QRectF, exposed: QRectF):
+    exposed = exposed.intersected(rect)
+    if exposed.isEmpty():
+        return
+    bucket = zoom_bucket(painter)
+    span = TILE_SIZE / 2.0 ** bucket # Layer units per tile
+    left = math.floor(exposed.left() / span)
+    right = math.ceil(exposed.right() / span)
+    top = math.floor(exposed.top() / span)
+    bottom = math.ceil(exposed.bottom() / span)
+    for j in range(top, bottom):
+        for i in range(left, right):
+            pixmap = TILE_CACHE.tile(renderer, key, rect, bucket, i, j)
+            painter.drawPixmap(QRectF(i * span, j * span, span, span), pixmap,
+                               QRectF(pixmap.rect()))
+
+# The outline and ocean layers. They never move, so ShipMap paints them in
+# drawBackground, where the view caches them once per zoom, instead of
+# keeping them as scene items that are repainted behind every moving ship.
+class Background:
+    LAYERS = (OUTLINE_ID, OCEAN_ID) # Bottom to top
+
+    def __init__(self):
+        self._layers = []
+        for layer in self.LAYERS:
+            path = get_svg(layer)
+            renderer = QSvgRenderer(path)
+            self._layers.append((path, renderer, QRectF(QPointF(0, 0),
+                                                        QSizeF(renderer.defaultSize()))))
+
+    def paint(self, painter: QPainter, exposed: QRectF):
+        for path, renderer, rect in self._layers:
+            draw_tiles(painter, renderer, path, rect, exposed)
+
 #TODO: Fenders, Bollards, Water Trees
 class PortItem(QGraphicsSvgItem):
     def __init__(self, graphics_view: QGraphicsView, path: str,
@@ -32,30 +126,30 @@ class PortItem(QGraphicsSvgItem):
         super().__init__(path, x=x, y=y)
         self._graph = weakref.ref(graphics_view)
         self.setFlag(QGraphicsRectItem.GraphicsItemFlag.ItemIsMovable |
-                     QGraphicsRectItem.GraphicsItemFlag.ItemSendsGeometryChanges)
+                     QGraphicsRectItem.GraphicsItemFlag.ItemSendsGeometryChanges |
+                     QGraphicsRectItem.GraphicsItemFlag.ItemUsesExtendedStyleOption)
         self.setZValue(z_val)
+        self._svg_key = path
 
         # Show item
         graphics_view.scene().addItem(self)
         self.show()
 
     def paint(self, painter: QPainter, option, widget):
-        # Draw shape
-        self.renderer().render(painter, QRectF(0, 0, SCENE_WIDTH, SCENE_HEIGHT))
+        draw_tiles(painter, self.renderer(), self._svg_key, self.boundingRect(),
+                   option.exposedRect)
 
+# `row` is the bollard's row in the port layout's bollard registry
 class Bollard(PortItem):
-    def __init__(self, graphics_view: QGraphicsView, x: float, y: float):
+    def __init__(self, graphics_view: QGraphicsView, x: float, y: float, row: int):
         super().__init__(graphics_view, get_svg(BOLLARD_ID), x=x, y=y)
-        #FIXME:
-        # self.connect(str(Bollard), graphics_view.TimePane.TimelineView.Timeline.BollardSelect.add_bollard)
+        self.row = row
+
+    @typing.override
+    def mousePressEvent(self, event: QGraphicsSceneMouseEvent):
+        self._graph().bollard_clicked.emit(self.row)
+        super().mousePressEvent(event)
+
 class WaterTree(PortItem):
     def __init__(self, graphics_view: QGraphicsView, x: float, y: float):
         super().__init__(graphics_view, get_svg(WATER_TREE_ID), x=x, y=y)
-
-class Outline(PortItem):
-    def __init__(self, graphics_view: QGraphicsView):
-        super().__init__(graphics_view, get_svg(OUTLINE_ID), x=0, y=0)
-
-class Ocean(PortItem):
-    def __init__(self, graphics_view: QGraphicsView):
-        super().__init__(graphics_view, get_svg(OCEAN_ID), x=0, y=0)
@@ -0,0 +1,169 @@
+import os
+import json
+import functools
+import numpy as np
+
+# Port layout read from geometry/port_layout.json: the quay line and every
+# bollard, shore gangway and water tree on it. Headless, so the solver can
+# use it without Qt.
+#
+# Distances along the quay ("chainage") and scene coordinates are in feet.
+# Heights are in feet, the apron's above chart datum and a gangway's sill
+# limits relative to the apron.
+
+LAYOUT_PATH = os.path.join(os.getcwd(), "geometry", "port_layout.json")
+
+# Bollards sorted by chainage, one array per attribute
+class BollardRegistry:
+    def __init__(self, ids: list[str], chainage, x, y, swl):
+        order = np.argsort(np.asarray(chainage, dtype=np.float64), kind="stable")
+        self.ids = [ids[i] for i in order]
+        self.chainage = np.asarray(chainage, dtype=np.float64)[order]
+        self.x = np.asarray(x, dtype=np.float64)[order]
+        self.y = np.asarray(y, dtype=np.float64)[order]
+        self.swl = np.asarray(swl, dtype=np.float64)[order] # Safe working load, tonnes
+
+    # Bollards every `spacing` along a straight quay, used when no layout exists
+    @classmethod
+    def uniform(cls, length: float, spacing: float):
+        chainage = np.arange(0, length + spacing / 2, spacing)
+        return cls([f"B{i + 1}" for i in range(len(chainage))], chainage,
+                   chainage, np.zeros(len(chainage)), np.zeros(len(chainage)))
+
+    def __len__(self) -> int:
+        return len(self.chainage)
+
+    # Indices of the bollards with lo <= chainage <= hi
+    def in_range(self, lo: float, hi: float) -> np.ndarray:
+        return np.arange(np.searchsorted(self.chainage, lo, side="left"),
+                         np.searchsorted(self.chainage, hi, side="right"))
+
+    # Number of bollards inside each [lo, hi] interval
+    def count(self, lo, hi) -> np.ndarray:
+        return (np.searchsorted(self.chainage, hi, side="right") -
+                np.searchsorted(self.chainage, lo, side="left"))
+
+    # Indices of the k bollards closest to a chainage, nearest first
+    def nearest(self, chainage: float, k: int = 1) -> np.ndarray:
+        k = min(k, len(self))
+        right = int(np.searchsorted(self.chainage, chainage))
+        left = right - 1
+        found = []
+
+        # Walk outwards from the insertion point, taking the closer side
+        while len(found) < k:
+            if right >= len(self) or (left >= 0 and
+                chainage - self.chainage[left] <= self.chainage[right] - chainage):
+                found.append(left)
+                left -= 1
+            else:
+                found.append(right)
+                right += 1
+        return np.array(found, dtype=np.int64)
+
+    # Row of each chainage value, -1 where no bollard sits exactly there
+    def lookup(self, chainages) -> np.ndarray:
+        chainages = np.asarray(chainages, dtype=np.float64)
+        rows = np.searchsorted(self.chainage, chainages).clip(0, max(len(self) - 1, 0))
+        if len(self) == 0:
+            return np.full(chainages.shape, -1)
+        return np.where(self.chainage[rows] == chainages, rows, -1)
+
+# Shore gangways sorted by chainage. A gangway slides up to `reach` feet
+# either way along the quay and lands on doors at least `min_width` wide with
+# their sill between `min_sill` and `max_sill` feet above the apron, below it
+# when negative. Where a sill stands depends on the tide, see tides.py.
+class GangwayRegistry:
+    def __init__(self, ids: list[str], chainage, x, y, reach, min_sill, max_sill, min_width):
+        order = np.argsort(np.asarray(chainage, dtype=np.float64), kind="stable")
+        self.ids = [ids[i] for i in order]
+        self.chainage = np.asarray(chainage, dtype=np.float64)[order]
+        self.x = np.asarray(x, dtype=np.float64)[order]
+        self.y = np.asarray(y, dtype=np.float64)[order]
+        self.reach = np.asarray(reach, dtype=np.float64)[order]
+        self.min_sill = np.asarray(min_sill, dtype=np.float64)[order]
+        self.max_sill = np.asarray(max_sill, dtype=np.float64)[order]
+        self.min_width = np.asarray(min_width, dtype=np.float64)[order]
+
+    @classmethod
+    def empty(cls):
+        return cls([], *[[]] * 7)
+
+    def __len__(self) -> int:
+        return len(self.chainage)
+
+# Water trees sorted by chainage. A ship can take water from one that stands
+# within `reach` feet, its hose length, of the hull along the quay.
+class WaterTreeRegistry:
+    def __init__(self, ids: list[str], chainage, x, y, reach):
+        order = np.argsort(np.asarray(chainage, dtype=np.float64), kind="stable")
+        self.ids = [ids[i] for i in order]
+        self.chainage = np.asarray(chainage, dtype=np.float64)[order]
+        self.x = np.asarray(x, dtype=np.float64)[order]
+        self.y = np.asarray(y, dtype=np.float64)[order]
+        self.reach = np.asarray(reach, dtype=np.float64)[order]
+
+    @classmethod
+    def empty(cls):
+        return cls([], *[[]] * 4)
+
+    def __len__(self) -> int:
+        return len(self.chainage)
+
+# Layouts without gangways or water trees put no limit on where doors and
+# hulls may lie
+class PortLayout:
+    def __init__(self, quay_start, quay_end, bollards: BollardRegistry,
+                 gangways: GangwayRegistry | None = None,
+                 water_trees: WaterTreeRegistry | None = None,
+                 apron_height: float = 0.0):
+        self.quay_start = np.asarray(quay_start, dtype=np.float64)
+        self.quay_end = np.asarray(quay_end, dtype=np.float64)
+        self.bollards = bollards
+        self.gangways = gangways if gangways is not None else GangwayRegistry.empty()
+        self.water_trees = water_trees if water_trees is not None else WaterTreeRegistry.empty()
+        self.apron_height = float(apron_height)
+        direction = self.quay_end - self.quay_start
+        self.quay_length = float(np.hypot(*direction))
+        self._direction = direction / self.quay_length
+
+    # Scene coordinates of chainage values, shape (..., 2), `offset` feet off
+    # the quay line towards the water
+    def point(self, chainage, offset=0.0) -> np.ndarray:
+        chainage = np.asarray(chainage, dtype=np.float64)
+        offset = np.asarray(offset, dtype=np.float64)
+        normal = np.array([-self._direction[1], self._direction[0]])
+        return (self.quay_start + chainage[..., None] * self._direction +
+                offset[..., None] * normal)
+
+    # Chainage of the projection of scene points onto the quay line
+    def chainage(self, x, y) -> np.ndarray:
+        return ((np.asarray(x) - self.quay_start[0]) * self._direction[0] +
+                (np.asarray(y) - self.quay_start[1]) * self._direction[1])
+
+    # Distance of scene points from the quay line, positive on the water side
+    def offset(self, x, y) -> np.ndarray:
+        return ((np.asarray(y) - self.quay_start[1]) * self._direction[0] -
+                (np.asarray(x) - self.quay_start[0]) * self._direction[1])
+
+@functools.cache
+def load_layout(path: str = LAYOUT_PATH) -> PortLayout:
+    with open(path) as file:
+        d = json.load(file)
+    bollards = d["bollards"]
+    registry = BollardRegistry([b["id"] for b in bollards],
+                               [b["chainage"] for b in bollards],
+                               [b["x"] for b in bollards],
+                               [b["y"] for b in bollards],
+                               [b["swl"] for b in bollards])
+    gangways = d.get("gangways", [])
+    gangway_registry = GangwayRegistry([g["id"] for g in gangways],
+                                       *([g[key] for g in gangways] for key in
+                                         ("chainage", "x", "y", "reach", "min_sill",
+                                          "max_sill", "min_width")))
+    water_trees = d.get("water_trees", [])
+    water_tree_registry = WaterTreeRegistry([t["id"] for t in water_trees],
+                                            *([t[key] for t in water_trees] for key in
+                                              ("chainage", "x", "y", "reach")))
+    return PortLayout(d["quay"]["start"], d["quay"]["end"], registry, gangway_registry,
+                      water_tree_registry, d["quay"].get("apron_height", 0.0))
@@ -0,0 +1,153 @@
+import os
+import time
+import multiprocessing
+import concurrent.futures
+import numpy as np
+
+import berth_solver
+
+# Portfolio search: one berth problem is split into components that do not
+# interact (see berth_solver.Problem.components), and each component is
+# handed to differently configured solvers, each in its own process. Per
+# component the first solver to prove its plan optimal wins and the others
+# are dropped, otherwise the plan that drops the fewest calls by the
+# deadline is taken. The plans of all components are merged at the end, so
+# solve time follows the largest component rather than the whole problem.
+#
+# Workers live in one process pool that is reused between solves. Stopping
+# them goes through a shared generation counter, a worker gives up as soon
+# as the counter moves past the generation it was started for.
+#
+# Headless, nothing in here may import Qt.
+
+DEADLINE = 10.0 # Seconds a portfolio may search
+GRACE = 1.0 # Seconds stopped workers get to hand back their best plan
+MAX_NODES = 1_000_000 # Per worker, the deadline normally ends the search first
+
+# Fixed strategies, tried first. Any further workers get seeded random ones.
+STRATEGIES = (
+    {"variable_order": "mrv", "value_order": "chainage"},
+    {"variable_order": "mrv", "value_order": "centre"},
+    {"variable_order": "arrival", "value_order": "chainage"},
+    {"variable_order": "mrv", "value_order": "reverse"},
+    {"variable_order": "arrival", "value_order": "centre"},
+)
+
+_pool = None
+_generation = None # Shared with the workers
+
+# Strategies for `count` workers
+def strategies(count: int) -> list[dict]:
+    chosen = list(STRATEGIES[:count])
+    for seed in range(count - len(chosen)):
+        chosen.append({"variable_order": "random" if seed % 2 else "mrv",
+                       "value_order": "random", "seed": seed})
+    return chosen
+
+def _init_worker(generation):
+    global _generation
+    _generation = generation
+
+# A search gets `limit` seconds from when a worker picks it up, but never
+# runs past `deadline`
+def _run(problem: berth_solver.Problem, strategy: dict, generation: int,
+         deadline: float, limit: float, max_nodes: int) -> tuple:
+    stop = lambda: _generation.value != generation
+    deadline = min(deadline, time.time() + limit)
+    solution = berth_solver.Solver(problem, max_nodes, deadline=deadline, stop=stop,
+                                   **strategy).solve()
+    return solution.starts, solution.sides, solution.bollards, solution.nodes, solution.optimal
+
+# Workers are started fresh rather than forked, the GUI calls in from a
+# thread of a process running Qt
+def _executor() -> concurrent.futures.ProcessPoolExecutor:
+    global _pool, _generation
+    if _pool is None:
+        context = multiprocessing.get_context("spawn")
+        _generation = context.Value("q", 0, lock=False)
+        _pool = concurrent.futures.ProcessPoolExecutor(
+            os.cpu_count(), mp_context=context, initializer=_init_worker,
+            initargs=(_generation,))
+    return _pool
+
+def shutdown():
+    global _pool
+    if _pool is not None:
+        cancel()
+        _pool.shutdown(wait=True, cancel_futures=True)
+        _pool = None
+
+# Stop every running portfolio, each hands back the best plan found so far
+def cancel():
+    if _generation is not None:
+        _generation.value += 1
+
+# Better plans first: proven optimal, fewer dropped calls, fewer nodes
+_rank = lambda solution = berth_solver.Solution: (not solution.optimal, solution.dropped,
+                                                  solution.nodes)
+
+# `progress(best, finished, total)` is called on the calling thread each
+# time a search finishes, with the plan put together from the best of every
+# component so far
+def solve(problem: berth_solver.Problem, deadline: float = DEADLINE,
+          workers: int | None = None, max_nodes: int = MAX_NODES,
+          progress=None) -> berth_solver.Solution:
+    pool = _executor()
+    workers = workers or os.cpu_count()
+    generation = _generation.value
+    end = time.time() + deadline
+
+    # Components are searched side by side, and single calls right here.
+    # Every component's first strategy is queued before any second one.
+    groups = problem.components()
+    parts = [problem.subproblem(rows) for rows in groups]
+    best = [None] * len(parts)
+    for i, part in enumerate(parts):
+        if len(part.calls) == 1:
+            best[i] = berth_solver.Solver(part).solve()
+
+    # First strategies share the pool's time, longer components get more
+    sizes = np.array([len(part.calls) if solution is None else 0
+                      for part, solution in zip(parts, best)], dtype=np.float64)
+    shares = deadline * min(os.cpu_count(), max(np.count_nonzero(sizes), 1)) * \
+        sizes / max(sizes.sum(), 1)
+    tasks = {}
+    for k, strategy in enumerate(strategies(workers)):
+        for i, part in enumerate(parts):
+            if best[i] is None:
+                limit = shares[i] if k == 0 else deadline
+                tasks[pool.submit(_run, part, strategy, generation, end, limit,
+                                  max_nodes)] = i
+
+    merged = lambda: berth_solver.Solution.merge(
+        problem, groups, [solution if solution is not None else
+                          berth_solver.Solver(part, 0).solve()
+                          for part, solution in zip(parts, best)])
+    finished = 0
+    try:
+        for future in concurrent.futures.as_completed(tasks, timeout=deadline + GRACE):
+            finished += 1
+            if future.cancelled():
+                continue
+            i = tasks[future]
+            solution = berth_solver.Solution(parts[i], *future.result())
+            if best[i] is None or _rank(solution) < _rank(best[i]):
+                best[i] = solution
+            # Other strategies still queued for a solved component are not needed
+            if best[i].optimal:
+                for other, j in tasks.items():
+                    if j == i:
+                        other.cancel()
+            if progress is not None:
+                progress(merged(), finished, len(tasks))
+            if all(solution is not None and solution.optimal for solution in best):
+                break
+    except concurrent.futures.TimeoutError:
+        pass
+    finally:
+        # Free the pool for the next solve
+        if _generation.value == generation:
+            cancel()
+        for future in tasks:
+            future.cancel()
+    return merged()
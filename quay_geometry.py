@@ -0,0 +1,308 @@
+import os
+import re
+import math
+import hashlib
+import functools
+import xml.etree.ElementTree as ElementTree
+import numpy as np
+
+import port_layout
+
+# Quay edge taken from the drawn port layers rather than the straight line
+# of the layout file. The ocean layer's outline is the waterline; the stretch
+# of it between the layout's quay start and end, with every group transform
+# applied, becomes a polyline with the chainage of each vertex. It answers
+# for many points at once:
+#
+#   point      chainage and offset to scene coordinates
+#   project    scene coordinates to the nearest chainage and the offset
+#   clearance  feet between hull polygons and the quay edge, negative where
+#              a hull cuts into the land
+#
+# Parsing the SVG is slow next to the queries, so the polyline is kept in a
+# small .npz file next to the drawings and only parsed again when the drawing
+# or the quay ends change.
+#
+# Offsets are positive towards the water, as in port_layout.PortLayout.
+#
+# Headless, nothing in here may import Qt.
+
+OCEAN_PATH = os.path.join(os.getcwd(), "geometry", "ocean.svg")
+EDGE_CACHE_PATH = os.path.join(os.getcwd(), "geometry", "quay_edge.npz")
+VERSION = 1 # Bump when parsing changes what the cached edge holds
+CURVE_STEPS = 8 # Segments a Bézier curve is flattened into
+
+_NUMBER = r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?"
+_TOKEN = re.compile(rf"[MmLlHhVvZzCcQq]|{_NUMBER}")
+_TRANSFORM = re.compile(r"(\w+)\s*\(([^)]*)\)")
+
+# 3x3 affine matrix of an SVG transform attribute. Functions SVG does not
+# know are skipped, as Qt's renderer does.
+def parse_transform(text: str) -> np.ndarray:
+    matrix = np.eye(3)
+    for name, arguments in _TRANSFORM.findall(text or ""):
+        a = [float(value) for value in re.findall(_NUMBER, arguments)]
+        step = np.eye(3)
+        if name == "matrix" and len(a) == 6:
+            step[:2] = [[a[0], a[2], a[4]], [a[1], a[3], a[5]]]
+        elif name == "translate" and a:
+            step[:2, 2] = a[0], a[1] if len(a) > 1 else 0.0
+        elif name == "scale" and a:
+            step[0, 0], step[1, 1] = a[0], a[1] if len(a) > 1 else a[0]
+        elif name == "rotate" and a:
+            angle = np.radians(a[0])
+            cx, cy = (a[1], a[2]) if len(a) == 3 else (0.0, 0.0)
+            cos, sin = np.cos(angle), np.sin(angle)
+            step[:2] = [[cos, -sin, cx - cos * cx + sin * cy],
+                        [sin, cos, cy - sin * cx - cos * cy]]
+        elif name == "skewX" and a:
+            step[0, 1] = np.tan(np.radians(a[0]))
+        elif name == "skewY" and a:
+            step[1, 0] = np.tan(np.radians(a[0]))
+        matrix = matrix @ step
+    return matrix
+
+# Subpaths of a path's d attribute as (k, 2) vertex arrays. Curves are
+# flattened into CURVE_STEPS segments, arcs are not supported.
+def parse_path(d: str) -> list[np.ndarray]:
+    tokens = _TOKEN.findall(d)
+    subpaths, points = [], []
+    current = start = np.zeros(2)
+    command = None
+    i = 0
+    while i < len(tokens):
+        if tokens[i].isalpha():
+            command = tokens[i]
+            i += 1
+            if command in "Zz":
+                if points:
+                    points.append(start)
+                    current = start
+                continue
+        elif command is None:
+            raise ValueError(f"path data starts with a number: {d[:20]!r}")
+
+        relative = command.islower()
+        base = current if relative else np.zeros(2)
+        upper = command.upper()
+        size = {"M": 2, "L": 2, "H": 1, "V": 1, "C": 6, "Q": 4}[upper]
+        values = np.array(tokens[i:i + size], dtype=np.float64)
+        if len(values) == 0 and i == len(tokens):
+            break # A trailing bare command, as in "... Z M", draws nothing
+        if len(values) < size:
+            raise ValueError(f"path data ends inside a {command} command")
+        i += size
+
+        if upper == "M":
+            if len(points) > 1:
+                subpaths.append(np.array(points))
+            current = start = base + values
+            points = [current]
+            command = "l" if relative else "L" # Further pairs are lines
+            continue
+        if upper == "L":
+            current = base + values
+            points.append(current)
+        elif upper == "H":
+            current = np.array([values[0] + (current[0] if relative else 0.0), current[1]])
+            points.append(current)
+        elif upper == "V":
+            current = np.array([current[0], values[0] + (current[1] if relative else 0.0)])
+            points.append(current)
+        else:
+            # Bernstein form of the curve at every sample at once
+            controls = np.vstack([current, base + values.reshape(-1, 2)])
+            degree = len(controls) - 1
+            t = np.linspace(0, 1, CURVE_STEPS + 1)[1:]
+            weights = np.array([math.comb(degree, k) * t ** k * (1 - t) ** (degree - k)
+                                for k in range(degree + 1)])
+            current = controls[-1]
+            points.extend(weights.T @ controls)
+    if len(points) > 1:
+        subpaths.append(np.array(points))
+    return subpaths
+
+# Every path of an SVG file in its user coordinates, group transforms applied
+def read_paths(path: str) -> list[np.ndarray]:
+    polylines = []
+
+    def walk(element, matrix):
+        matrix = matrix @ parse_transform(element.get("transform"))
+        if element.tag.rsplit("}", 1)[-1] == "path" and element.get("d"):
+            for points in parse_path(element.get("d")):
+                polylines.append(points @ matrix[:2, :2].T + matrix[:2, 2])
+        for child in element:
+            walk(child, matrix)
+
+    walk(ElementTree.parse(path).getroot(), np.eye(3))
+    return polylines
+
+# Foot of each point on a polyline: (segment, parameter, distance)
+def _nearest_on_polyline(polyline: np.ndarray, points: np.ndarray) -> tuple:
+    a, b = polyline[:-1], polyline[1:]
+    ab = b - a
+    t = np.einsum("psk,sk->ps", points[:, None] - a, ab) / np.maximum((ab ** 2).sum(1), 1e-12)
+    t = t.clip(0, 1)
+    foot = a + t[..., None] * ab
+    distance = np.hypot(*np.moveaxis(points[:, None] - foot, -1, 0))
+    segment = distance.argmin(axis=1)
+    rows = np.arange(len(points))
+    return segment, t[rows, segment], distance[rows, segment]
+
+class QuayEdge:
+    def __init__(self, points):
+        self.points = np.asarray(points, dtype=np.float64)
+        steps = np.hypot(*np.diff(self.points, axis=0).T)
+        self.chainage = np.concatenate(([0.0], np.cumsum(steps)))
+        self.length = float(self.chainage[-1])
+        # Unit direction and water side normal of every segment
+        self._direction = np.diff(self.points, axis=0) / np.maximum(steps, 1e-12)[:, None]
+        self._normal = np.column_stack((-self._direction[:, 1], self._direction[:, 0]))
+
+    # Stretch of the outline of `polygon` between the points nearest to
+    # `start` and `end`, taking the shorter way round
+    @classmethod
+    def from_outline(cls, polygon: np.ndarray, start, end):
+        ring = polygon if np.array_equal(polygon[0], polygon[-1]) else \
+            np.vstack([polygon, polygon[:1]])
+        segment, t, _ = _nearest_on_polyline(ring, np.array([start, end], dtype=np.float64))
+        foot = ring[segment] + t[:, None] * (ring[segment + 1] - ring[segment])
+        # Vertices passed going either way round, from the segment of the
+        # start to the segment of the end
+        n = len(ring) - 1
+        s0, s1 = int(segment[0]), int(segment[1])
+        ahead, behind = (s1 - s0) % n, (s0 - s1) % n
+        if s0 == s1:
+            ahead, behind = (0, n) if t[1] >= t[0] else (n, 0)
+        forward = [foot[0], *ring[[(s0 + 1 + k) % n for k in range(ahead)]], foot[1]]
+        backward = [foot[0], *ring[[(s0 - k) % n for k in range(behind)]], foot[1]]
+        length = lambda path: np.hypot(*np.diff(np.array(path), axis=0).T).sum()
+        points = np.array(min(forward, backward, key=length))
+        keep = np.concatenate(([True], np.hypot(*np.diff(points, axis=0).T) > 1e-9))
+        return cls(points[keep])
+
+    # Segment holding every chainage, ends extended
+    def _segment(self, chainage: np.ndarray) -> np.ndarray:
+        return (np.searchsorted(self.chainage, chainage, side="right") - 1).clip(
+            0, len(self.points) - 2)
+
+    # Scene coordinates of chainage values, shape (..., 2), `offset` feet off
+    # the quay edge towards the water
+    def point(self, chainage, offset=0.0) -> np.ndarray:
+        chainage = np.asarray(chainage, dtype=np.float64)
+        offset = np.asarray(offset, dtype=np.float64)
+        segment = self._segment(chainage)
+        along = (chainage - self.chainage[segment])[..., None]
+        return (self.points[segment] + along * self._direction[segment] +
+                offset[..., None] * self._normal[segment])
+
+    # Chainage and offset of the nearest point on the quay edge to every
+    # scene point. Past either end the end segments run on.
+    def project(self, x, y) -> tuple[np.ndarray, np.ndarray]:
+        x, y = np.broadcast_arrays(np.asarray(x, dtype=np.float64),
+                                   np.asarray(y, dtype=np.float64))
+        points = np.column_stack((x.ravel(), y.ravel()))
+        segment, _, _ = _nearest_on_polyline(self.points, points)
+        relative = points - self.points[segment]
+        along = np.einsum("pk,pk->p", relative, self._direction[segment])
+        # Only the end segments reach past their vertices
+        last = len(self.points) - 2
+        length = self.chainage[segment + 1] - self.chainage[segment]
+        along = np.where(segment == 0, along, np.maximum(along, 0.0))
+        along = np.where(segment == last, along, np.minimum(along, length))
+        offset = np.einsum("pk,pk->p", relative, self._normal[segment])
+        return ((self.chainage[segment] + along).reshape(x.shape), offset.reshape(x.shape))
+
+    def chainage_of(self, x, y) -> np.ndarray:
+        return self.project(x, y)[0]
+
+    def offset_of(self, x, y) -> np.ndarray:
+        return self.project(x, y)[1]
+
+    # Corners of straight hulls lying alongside, shape (n, 4, 2). Each hull
+    # runs on the chord between the edge points at its ends and `width` out
+    # into the water.
+    def hulls(self, starts, lengths, widths) -> np.ndarray:
+        starts, lengths, widths = np.broadcast_arrays(
+            *(np.asarray(a, dtype=np.float64) for a in (starts, lengths, widths)))
+        aft, fore = self.point(starts), self.point(starts + lengths)
+        chord = fore - aft
+        chord /= np.maximum(np.hypot(*chord.T), 1e-12)[:, None]
+        out = np.column_stack((-chord[:, 1], chord[:, 0])) * widths[:, None]
+        return np.stack((aft, fore, fore + out, aft + out), axis=1)
+
+    # Least distance from each hull polygon (n, p, 2) to the quay edge,
+    # negative by how far the deepest corner lies on the land side
+    def clearance(self, hulls: np.ndarray) -> np.ndarray:
+        hulls = np.asarray(hulls, dtype=np.float64)
+        n, p, _ = hulls.shape
+        # Hull corners against the edge, signed
+        _, offset = self.project(hulls[..., 0], hulls[..., 1])
+        clearance = offset.min(axis=1)
+
+        # Edge vertices against the hull outlines, which catches a bend of
+        # the quay poking in between two corners
+        a = hulls
+        ab = np.roll(hulls, -1, axis=1) - a
+        v = self.points[None, :, None, :] - a[:, None] # (n, k, p, 2)
+        t = (np.einsum("nkpc,npc->nkp", v, ab) /
+             np.maximum((ab ** 2).sum(-1), 1e-12)[:, None]).clip(0, 1)
+        gap = np.hypot(*np.moveaxis(v - t[..., None] * ab[:, None], -1, 0)).min(axis=2)
+        # Even-odd rule for edge vertices inside a hull
+        y0, y1 = a[:, None, :, 1], (a + ab)[:, None, :, 1]
+        py, px = self.points[None, :, None, 1], self.points[None, :, None, 0]
+        crosses = (y0 > py) != (y1 > py)
+        x_cross = a[:, None, :, 0] + (py - y0) / np.where(y1 != y0, y1 - y0, 1.0) * ab[:, None, :, 0]
+        inside = (crosses & (px < x_cross)).sum(axis=2) % 2 == 1
+        gap = np.where(inside, -gap, gap).min(axis=1)
+        return np.minimum(clearance, gap)
+
+    def save(self, path: str, key: str):
+        temp = f"{path}.tmp"
+        with open(temp, "wb") as out:
+            np.savez(out, points=self.points, key=np.array(key))
+        os.replace(temp, path)
+
+# What the cached edge was built from
+def edge_key(path: str, layout: port_layout.PortLayout) -> str:
+    with open(path, "rb") as file:
+        data = file.read()
+    ends = np.concatenate(([VERSION], layout.quay_start, layout.quay_end)).astype(np.float64)
+    return hashlib.blake2b(data + ends.tobytes(), digest_size=16).hexdigest()
+
+# Quay edge of the layout's quay ends on the ocean layer, read from the
+# cache when it was built from the same drawing. A missing or malformed
+# drawing gives the layout's straight quay line, on which Quay behaves as
+# Quay.from_layout(layout, None), so the planner and batch runs still start.
+@functools.cache
+def load_edge(path: str = OCEAN_PATH, cache: str = EDGE_CACHE_PATH,
+              layout: port_layout.PortLayout | None = None) -> QuayEdge:
+    layout = layout if layout is not None else port_layout.load_layout()
+    straight = QuayEdge([layout.quay_start, layout.quay_end])
+    try:
+        key = edge_key(path, layout)
+    except OSError:
+        return straight
+    try:
+        with np.load(cache) as entry:
+            if str(entry["key"]) == key:
+                return QuayEdge(entry["points"])
+    except (OSError, ValueError, KeyError):
+        pass
+
+    # The water polygon whose outline passes nearest both quay ends
+    ends = np.array([layout.quay_start, layout.quay_end])
+    try:
+        polygons = [points for points in read_paths(path) if len(points) > 2]
+        if not polygons:
+            raise ValueError(f"no water outline in {path}")
+        polygon = min(polygons, key=lambda points: _nearest_on_polyline(
+            np.vstack([points, points[:1]]), ends)[2].sum())
+        edge = QuayEdge.from_outline(polygon, layout.quay_start, layout.quay_end)
+    except (ValueError, ElementTree.ParseError):
+        return straight
+    try:
+        edge.save(cache, key)
+    except OSError:
+        pass # Parsed again next time
+    return edge
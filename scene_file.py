@@ -0,0 +1,278 @@
+import os
+import io
+import json
+import zlib
+import struct
+import datetime
+import numpy as np
+
+from fleet_store import SHIP_DTYPE, DOOR_DTYPE
+
+# Scene files keep the schedule arrangements of a whole cruise season. The
+# file is a header, a run of chunks holding one day each, and an index of
+# every day's chunk. Opening a file only reads the header and the index, and
+# any chunk can be decoded on its own.
+#
+#   header   MAGIC, version, index offset, index length
+#   chunks   zlib compressed, see DayPlan.encode
+#   index    INDEX_DTYPE rows sorted by day
+#
+# Saving appends the chunks of the days that changed, then a new index, and
+# only then points the header at it, so an interrupted save leaves the file
+# as it was. Space of replaced chunks is reclaimed by compact().
+#
+# Headless, nothing in here may import Qt.
+
+MAGIC = b"BERTHSCN"
+VERSION = 1
+HEADER = struct.Struct("<8sIQQ") # Magic, version, index offset, index length
+COMPACT_RATIO = 0.5 # Compact on save once this share of the file is stale
+
+INDEX_DTYPE = np.dtype([("day", np.int64), # datetime.date.toordinal()
+                        ("offset", np.int64),
+                        ("length", np.int64),
+                        ("crc", np.uint32)])
+
+# One call of a day. start is NaN for calls without a berth, bollards are
+# rows bollard_start:bollard_start + bollard_count of DayPlan.bollards.
+SLOT_DTYPE = np.dtype([("ship", np.int32), # Row in DayPlan.ships
+                       ("arrival", np.int64),
+                       ("departure", np.int64),
+                       ("start", np.float64),
+                       ("end", np.float64),
+                       ("side", np.int8),
+                       ("bollard_start", np.int32),
+                       ("bollard_count", np.int32)])
+
+class SceneError(Exception):
+    pass
+
+# Schedule of one day. The ships it uses are copied in, so a day decodes
+# without the fleet library.
+class DayPlan:
+    def __init__(self, names: list[str], ships: np.ndarray, door_names: list[str],
+                 doors: np.ndarray, slots: np.ndarray, bollards: np.ndarray):
+        self.names = list(names)
+        self.ships = np.asarray(ships, SHIP_DTYPE)
+        self.door_names = list(door_names)
+        self.doors = np.asarray(doors, DOOR_DTYPE) # doors["ship"] is a row of ships
+        self.slots = np.asarray(slots, SLOT_DTYPE)
+        self.bollards = np.asarray(bollards, np.float64) # Chainages
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+    # `calls` holds (ship id, arrival, departure, berth or None) per slot,
+    # berths as returned by berth_solver.Solution.berths
+    @classmethod
+    def build(cls, store, calls: list[tuple]):
+        rows = {}
+        door_ids = []
+        slots = np.zeros(len(calls), SLOT_DTYPE)
+        bollards = []
+        for i, (ship, arrival, departure, berth) in enumerate(calls):
+            if ship not in rows:
+                rows[ship] = len(rows)
+                door_ids.extend(store.doors_of(ship).tolist())
+            slots[i] = (rows[ship], arrival, departure, np.nan, np.nan, -1,
+                        len(bollards), 0)
+            if berth is not None:
+                slots[i]["start"] = berth.start
+                slots[i]["end"] = berth.end
+                slots[i]["side"] = berth.side
+                slots[i]["bollard_count"] = len(berth.bollards)
+                bollards.extend(np.asarray(berth.bollards, np.float64).tolist())
+
+        ships = list(rows)
+        doors = store.doors[door_ids].copy()
+        doors["ship"] = [rows[ship] for ship in doors["ship"].tolist()]
+        return cls([store.names[ship] for ship in ships], store.ships[ships],
+                   [store.door_names[door] for door in door_ids], doors, slots,
+                   np.array(bollards, np.float64))
+
+    # Values of a ship in the layout of the ship .json files
+    def ship_dict(self, row: int) -> dict:
+        d = {field: self.ships[field][row].item() for field in SHIP_DTYPE.names}
+        for door in np.flatnonzero(self.doors["ship"] == row).tolist():
+            d[self.door_names[door]] = {field: self.doors[field][door].item()
+                                        for field in DOOR_DTYPE.names[1:]}
+        return d
+
+    def bollards_of(self, slot: int) -> np.ndarray:
+        start, count = self.slots["bollard_start"][slot], self.slots["bollard_count"][slot]
+        return self.bollards[start:start + count]
+
+    # Names and array sizes as a JSON line, followed by the raw arrays
+    def encode(self) -> bytes:
+        tables = (self.ships, self.doors, self.slots, self.bollards)
+        head = json.dumps({"names": self.names, "door_names": self.door_names,
+                           "counts": [len(table) for table in tables]}).encode()
+        buffer = io.BytesIO()
+        buffer.write(head + b"\n")
+        for table in tables:
+            buffer.write(np.ascontiguousarray(table).tobytes())
+        return zlib.compress(buffer.getvalue())
+
+    @classmethod
+    def decode(cls, data: bytes):
+        raw = zlib.decompress(data)
+        newline = raw.index(b"\n")
+        head = json.loads(raw[:newline])
+        offset = newline + 1
+        tables = []
+        for dtype, count in zip((SHIP_DTYPE, DOOR_DTYPE, SLOT_DTYPE, np.dtype(np.float64)),
+                                head["counts"]):
+            tables.append(np.frombuffer(raw, dtype, count, offset).copy())
+            offset += dtype.itemsize * count
+        return cls(head["names"], tables[0], head["door_names"], *tables[1:])
+
+class SceneFile:
+    def __init__(self, path: str):
+        self.path = path
+        self._index = np.zeros(0, INDEX_DTYPE)
+        self._plans = {} # Decoded days by ordinal
+        self._dirty = set()
+        self._removed = set()
+        if os.path.exists(path):
+            self._read_index()
+
+    def _read_index(self):
+        with open(self.path, "rb") as file:
+            header = file.read(HEADER.size)
+            if len(header) < HEADER.size:
+                raise SceneError(f"{self.path} is not a scene file")
+            magic, version, offset, length = HEADER.unpack(header)
+            if magic != MAGIC:
+                raise SceneError(f"{self.path} is not a scene file")
+            if version > VERSION:
+                raise SceneError(f"{self.path} needs a newer version (file version {version})")
+            file.seek(offset)
+            self._index = np.frombuffer(file.read(length), INDEX_DTYPE).copy()
+
+    # Days with a plan, saved or not
+    def days(self) -> list[datetime.date]:
+        ordinals = (set(self._index["day"].tolist()) | self._dirty) - self._removed
+        return [datetime.date.fromordinal(day) for day in sorted(ordinals)]
+
+    def __contains__(self, day: datetime.date) -> bool:
+        ordinal = day.toordinal()
+        return ordinal not in self._removed and (ordinal in self._dirty or
+                                                 self._row(ordinal) is not None)
+
+    def _row(self, ordinal: int) -> int | None:
+        row = int(np.searchsorted(self._index["day"], ordinal))
+        if row < len(self._index) and self._index["day"][row] == ordinal:
+            return row
+        return None
+
+    # Plan of a day, decoded on first use. None for days without one.
+    def load(self, day: datetime.date) -> DayPlan | None:
+        ordinal = day.toordinal()
+        if ordinal in self._removed:
+            return None
+        if ordinal in self._plans:
+            return self._plans[ordinal]
+        row = self._row(ordinal)
+        if row is None:
+            return None
+        entry = self._index[row]
+        with open(self.path, "rb") as file:
+            file.seek(int(entry["offset"]))
+            data = file.read(int(entry["length"]))
+        if zlib.crc32(data) != int(entry["crc"]):
+            raise SceneError(f"Chunk of {day} in {self.path} is corrupt")
+        plan = DayPlan.decode(data)
+        self._plans[ordinal] = plan
+        return plan
+
+    # Drop decoded days that are not in `keep` and have no unsaved changes
+    def evict(self, keep: list[datetime.date]):
+        keep = {day.toordinal() for day in keep} | self._dirty
+        for ordinal in [ordinal for ordinal in self._plans if ordinal not in keep]:
+            del self._plans[ordinal]
+
+    def put(self, day: datetime.date, plan: DayPlan):
+        ordinal = day.toordinal()
+        self._plans[ordinal] = plan
+        self._dirty.add(ordinal)
+        self._removed.discard(ordinal)
+
+    def remove(self, day: datetime.date):
+        ordinal = day.toordinal()
+        self._plans.pop(ordinal, None)
+        self._dirty.discard(ordinal)
+        self._removed.add(ordinal)
+
+    @property
+    def modified(self) -> bool:
+        return bool(self._dirty or self._removed)
+
+    # Bytes of the file still referenced by the index
+    def _live_size(self) -> int:
+        return HEADER.size + int(self._index["length"].sum()) + self._index.nbytes
+
+    def save(self):
+        if not os.path.exists(self.path):
+            self._rewrite()
+            return
+        if not self.modified:
+            return
+
+        with open(self.path, "r+b") as file:
+            file.seek(0, os.SEEK_END)
+            rows = {int(entry["day"]): entry for entry in self._index
+                    if int(entry["day"]) not in self._removed}
+            for ordinal in sorted(self._dirty):
+                data = self._plans[ordinal].encode()
+                rows[ordinal] = (ordinal, file.tell(), len(data), zlib.crc32(data))
+                file.write(data)
+            index = np.array([tuple(rows[ordinal]) for ordinal in sorted(rows)], INDEX_DTYPE)
+            index_offset = file.tell()
+            file.write(index.tobytes())
+            file.flush()
+            os.fsync(file.fileno())
+
+            # The new index is complete on disk, switch the header over to it
+            file.seek(0)
+            file.write(HEADER.pack(MAGIC, VERSION, index_offset, index.nbytes))
+            file.flush()
+            os.fsync(file.fileno())
+            size = file.seek(0, os.SEEK_END)
+
+        self._index = index
+        self._dirty.clear()
+        self._removed.clear()
+        if self._live_size() < size * COMPACT_RATIO:
+            self.compact()
+
+    # Rewrite the file with only the chunks still in use
+    def compact(self):
+        for day in self.days():
+            self.load(day)
+        self._rewrite()
+
+    def _rewrite(self):
+        ordinals = sorted((set(self._index["day"].tolist()) | self._dirty) - self._removed)
+        chunks = []
+        for ordinal in ordinals:
+            plan = self._plans.get(ordinal) or self.load(datetime.date.fromordinal(ordinal))
+            chunks.append(plan.encode())
+
+        temp = f"{self.path}.tmp"
+        index = np.zeros(len(chunks), INDEX_DTYPE)
+        with open(temp, "wb") as file:
+            file.write(b"\0" * HEADER.size)
+            for i, (ordinal, data) in enumerate(zip(ordinals, chunks)):
+                index[i] = (ordinal, file.tell(), len(data), zlib.crc32(data))
+                file.write(data)
+            index_offset = file.tell()
+            file.write(index.tobytes())
+            file.seek(0)
+            file.write(HEADER.pack(MAGIC, VERSION, index_offset, index.nbytes))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp, self.path)
+
+        self._index = index
+        self._dirty.clear()
+        self._removed.clear()
@@ -0,0 +1,176 @@
+import os
+import sqlite3
+import datetime
+import contextlib
+import numpy as np
+
+import berth_solver
+import scene_file
+
+# Local season schedule kept in SQLite, so plans survive a restart and can
+# be queried by time, berth and ship without loading whole days.
+#
+# Call times are absolute seconds, day ordinal * SECONDS_IN_DAY plus the time
+# of day, so calls running past midnight stay a single row. Every call is
+# filed under the day it arrives on, and no call may last longer than
+# MAX_STAY_DAYS, which lets window queries narrow to a range of days on the
+# (day, berth_start) index before testing the times.
+#
+# Headless, nothing in here may import Qt.
+
+SCHEDULE_PATH = os.path.join(os.getcwd(), "schedule.db")
+SECONDS_IN_DAY = 60 * 60 * 24
+MAX_STAY_DAYS = 7
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS calls (
+    id INTEGER PRIMARY KEY,
+    day INTEGER NOT NULL,
+    ship TEXT NOT NULL,
+    arrival INTEGER NOT NULL,
+    departure INTEGER NOT NULL,
+    berth_start REAL,
+    berth_end REAL,
+    side INTEGER
+);
+CREATE TABLE IF NOT EXISTS call_bollards (
+    call INTEGER NOT NULL REFERENCES calls(id) ON DELETE CASCADE,
+    chainage REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS calls_day_berth ON calls(day, berth_start);
+CREATE INDEX IF NOT EXISTS calls_ship_day ON calls(ship, day);
+CREATE INDEX IF NOT EXISTS call_bollards_call ON call_bollards(call);
+"""
+
+CALL_COLUMNS = "id, day, ship, arrival, departure, berth_start, berth_end, side"
+
+# Absolute seconds of a time of day on a date
+instant = lambda day = datetime.date, seconds = int: day.toordinal() * SECONDS_IN_DAY + seconds
+
+class ScheduledCall:
+    __slots__ = ("id", "day", "ship", "arrival", "departure", "berth")
+
+    def __init__(self, row: tuple, bollards: np.ndarray):
+        self.id, day, self.ship, self.arrival, self.departure, start, end, side = row
+        self.day = datetime.date.fromordinal(day)
+        self.berth = None
+        if start is not None:
+            self.berth = berth_solver.Berth(start, end, side, bollards)
+
+    def __repr__(self):
+        return (f"ScheduledCall({self.ship!r}, {self.day}, {self.arrival}-{self.departure}, "
+                f"{self.berth})")
+
+class ScheduleDB:
+    def __init__(self, path: str = SCHEDULE_PATH):
+        self.path = path
+        self._connection = sqlite3.connect(path)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute("PRAGMA foreign_keys=ON")
+        self._connection.executescript(SCHEMA)
+        self._batch_depth = 0
+
+    def close(self):
+        self._connection.close()
+
+    # Writes inside a batch share one transaction, committed when the
+    # outermost batch ends
+    @contextlib.contextmanager
+    def batch(self):
+        self._batch_depth += 1
+        try:
+            yield self
+        except BaseException:
+            self._batch_depth -= 1
+            if self._batch_depth == 0:
+                self._connection.rollback()
+            raise
+        self._batch_depth -= 1
+        if self._batch_depth == 0:
+            self._connection.commit()
+
+    # Replace the calls of a day with those of a plan
+    def put_day(self, day: datetime.date, plan: scene_file.DayPlan):
+        with self.batch():
+            self._connection.execute("DELETE FROM calls WHERE day = ?", (day.toordinal(),))
+            bollards = []
+            for i, slot in enumerate(plan.slots):
+                if slot["departure"] - slot["arrival"] > MAX_STAY_DAYS * SECONDS_IN_DAY:
+                    raise ValueError(f"Call of {plan.names[slot['ship']]} is longer "
+                                     f"than {MAX_STAY_DAYS} days")
+                berthed = not np.isnan(slot["start"])
+                cursor = self._connection.execute(
+                    f"INSERT INTO calls ({CALL_COLUMNS}) VALUES (NULL, ?, ?, ?, ?, ?, ?, ?)",
+                    (day.toordinal(), plan.names[slot["ship"]],
+                     instant(day, int(slot["arrival"])), instant(day, int(slot["departure"])),
+                     float(slot["start"]) if berthed else None,
+                     float(slot["end"]) if berthed else None,
+                     int(slot["side"]) if berthed else None))
+                bollards.extend((cursor.lastrowid, float(chainage))
+                                for chainage in plan.bollards_of(i))
+            self._connection.executemany(
+                "INSERT INTO call_bollards (call, chainage) VALUES (?, ?)", bollards)
+
+    def remove_day(self, day: datetime.date):
+        with self.batch():
+            self._connection.execute("DELETE FROM calls WHERE day = ?", (day.toordinal(),))
+
+    # Calls for the rows of a query on the calls table, with their bollards
+    def _calls(self, where: str, parameters: tuple) -> list[ScheduledCall]:
+        rows = self._connection.execute(
+            f"SELECT {CALL_COLUMNS} FROM calls WHERE {where} ORDER BY arrival, id",
+            parameters).fetchall()
+        if not rows:
+            return []
+        bollards = {row[0]: [] for row in rows}
+        ids = list(bollards)
+        for start in range(0, len(ids), 500): # Below SQLite's parameter limit
+            chunk = ids[start:start + 500]
+            for call, chainage in self._connection.execute(
+                f"SELECT call, chainage FROM call_bollards WHERE call IN "
+                f"({', '.join('?' * len(chunk))}) ORDER BY rowid", chunk):
+                bollards[call].append(chainage)
+        return [ScheduledCall(row, np.array(bollards[row[0]], np.float64)) for row in rows]
+
+    def calls_on(self, day: datetime.date) -> list[ScheduledCall]:
+        return self._calls("day = ?", (day.toordinal(),))
+
+    # Calls alongside at any time in [t0, t1), optionally only those whose
+    # berth overlaps [c0, c1) of quay chainage. Times are absolute, see instant.
+    def overlapping(self, t0: int, t1: int, c0: float | None = None,
+                    c1: float | None = None) -> list[ScheduledCall]:
+        first = t0 // SECONDS_IN_DAY - MAX_STAY_DAYS
+        last = t1 // SECONDS_IN_DAY
+        where = "day BETWEEN ? AND ? AND arrival < ? AND departure > ?"
+        parameters = (first, last, t1, t0)
+        if c0 is not None and c1 is not None:
+            where += " AND berth_start < ? AND berth_end > ?"
+            parameters += (c1, c0)
+        return self._calls(where, parameters)
+
+    # Every call of a ship between two dates, inclusive
+    def ship_calls(self, ship: str, first: datetime.date,
+                   last: datetime.date) -> list[ScheduledCall]:
+        return self._calls("ship = ? AND day BETWEEN ? AND ?",
+                           (ship, first.toordinal(), last.toordinal()))
+
+    # Dates between first and last, inclusive, that have calls
+    def days_with_calls(self, first: datetime.date, last: datetime.date) -> list[datetime.date]:
+        rows = self._connection.execute(
+            "SELECT DISTINCT day FROM calls WHERE day BETWEEN ? AND ? ORDER BY day",
+            (first.toordinal(), last.toordinal()))
+        return [datetime.date.fromordinal(day) for day, in rows]
+
+    # Plan of a day built against the fleet library. Calls of ships that are
+    # no longer in the library are left out.
+    def load_day(self, day: datetime.date, store) -> scene_file.DayPlan | None:
+        calls = []
+        base = instant(day, 0)
+        for call in self.calls_on(day):
+            ship = store.find(call.ship)
+            if ship is not None:
+                calls.append((ship, call.arrival - base, call.departure - base, call.berth))
+        if not calls:
+            return None
+        return scene_file.DayPlan.build(store, calls)
@@ -11,6 +11,9 @@ from PySide6.QtWidgets import *
 from PySide6.QtGui import *
 
 import port_items
+import fleet_store
+import fleet_loader
+import ship_hull
 from main import get_icon
 
 # https://en.wikipedia.org/wiki/Port_and_starboard
@@ -62,6 +65,28 @@ DOOR_ATTR = {
 
 get_index = lambda d = dict, s = str: list(d.keys()).index(s)
 
+# Types edited through a dialog or toggle, which always hold a value
+BUTTON_TYPES = (Qt.BrushStyle, QColor, Side)
+
+# Parses an entry's text, returning the value and an error message
+def _compile_parser(attr_type):
+    def parse(text: str) -> tuple:
+        if text == '':
+            return None, "A value is required"
+        try:
+            return call(attr_type, text), None
+        except (TypeError, ValueError) as error:
+            return None, str(error)
+    return parse
+
+# Parsers compiled once per attribute type of the ship and door schemas
+PARSERS = {attr_type: _compile_parser(attr_type)
+           for attr_type in (*SHIP_ATTR.values(), *DOOR_ATTR.values())
+           if attr_type not in BUTTON_TYPES}
+
+field_label = lambda s = str: s.replace('_', ' ').capitalize()
+error_summary = lambda n = int: '' if n == 0 else f"{n} invalid field{'s' if n > 1 else ''}"
+
 class StyleIcon(QIcon):
     class IconEngine(QIconEngine):
         def __init__(self, value: QColor | Qt.BrushStyle):
@@ -153,95 +178,11 @@ class WarningDialog(QDialog):
         self.layout().addWidget(self.message, 1, 1, 1, 1)
         self.layout().addWidget(self.button, 2, 1, 1, 1)
 
-class Label(QStandardItem):
-    def __init__(self, text: str = None):
-        self.item_text = text if type(text) == str else ''
-        super().__init__(self.item_text)
-        self.setFlags(LABEL_FLAGS)
-
-class Entry(QStandardItem):
-    def __init__(self):
-        super().__init__('')
-        self.setFlags(ENTRY_FLAGS)
-
-    def set_value(self, value):
-        self.setText(str(value))
-
-class AddShipButton(QStandardItem):
-    def __init__(self):
-        super().__init__("Add ship")
-        self.setFlags(LABEL_SELECTABLE_FLAGS)
-        icon = QIcon(ADD_ICON)
-        self.setIcon(icon)
-
-class AddDoorButton(QStandardItem):
-    def __init__(self):
-        super().__init__("Add door")
-        self.setFlags(LABEL_SELECTABLE_FLAGS)
-        icon = QIcon(ADD_ICON)
-        self.setIcon(icon)
-
-class ValueButton(QStandardItem):
-    def __init__(self, typing):
-        super().__init__('')
-        self.setFlags(LABEL_SELECTABLE_FLAGS)
-        self.typing = typing
-        self.value = None
-
-    def set_value(self, value):
-        self.value = call(self.typing, value)
-        self.setIcon(StyleIcon(self.value))
-
-class ColorButton(ValueButton):
-    def __init__(self, color: QColor | None = None):
-        super().__init__(QColor)
-        if color == None:
-            self.set_value(Qt.GlobalColor(random.randint(0, len(Qt.GlobalColor) - 1)))
-        else:    
-            self.set_value(color)
-
-class PatternButton(ValueButton):
-    def __init__(self, pattern: Qt.BrushStyle | None = None):
-        super().__init__(Qt.BrushStyle)
-        if pattern == None:
-            self.set_value(pattern_arr[random.randint(0, len(pattern_arr) - 1)])
-        else:
-            self.set_value(pattern)
-
-class SideButton(ValueButton):
-    def __init__(self, side: Side | None = None):
-        super().__init__(Side)
-        self.i = 0
-        if side == None:
-            self.set_value(Side.both)
-        else:
-            self.set_value(Side(side))
-        self._update_side()
-
-    @typing.override
-    def set_value(self, value):
-        if type(value) != self.typing:
-            try:
-                value = call(self.typing, value)
-            except Exception:
-                raise TypeError(f"{self.__class__} takes {self.typing} type")
-        self.value = value
-        self._update_side()
-
-    def _update_side(self):
-        icon = QIcon(SIDE_ICONS.get(self.value))
-        self.setIcon(icon)
-
-    def increment_side(self):
-        self.i = (self.i + 1) % len(Side)
-        self.value = Side(self.i)
-        self._update_side()
-
 class ShipView(QTreeView):
     def __init__(self):
         super().__init__(wordWrap=True, expandsOnDoubleClick=True,
                          uniformRowHeights=True)
-        self.setModel(ShipModel(self))
+        self.setModel(FleetModel(self))
         self.setObjectName("Editor")
         self.clicked.connect(self.model().item_press)
 
@@ -252,335 +193,515 @@ class ShipView(QTreeView):
         self.setSelectionMode(self.SelectionMode.SingleSelection)
 
         # Debug
-        # x = Ship(self.model(), "Ship Test", 5, Qt.BrushStyle.Dense4Pattern,
-        #             Qt.GlobalColor.blue, 5,
-        #             {"sds": {"side": 2,
-        #                     "bow_distance": 1,
-        #                     "stern_distance": 1,
-        #                     "width": 1,
-        #                     "height": 1,
-        #                     "height_above_waterline": 1}})
         # ship_from_json(self.model(), "Enchanted Princess")
         #TODO: Enforce equal column widths
 
+    @property
+    def store(self) -> fleet_store.FleetStore:
+        return self.model().store
+
+    # Load every ship file of a directory, reporting the files that failed
+    def load_library(self, directory: str = SHIP_DIR) -> fleet_loader.LoadReport:
+        store, report = fleet_loader.load_library(directory)
+        self.model().set_store(store)
+        if report.errors:
+            text = '\n'.join(f"{name}: {error}" for name, error in report.errors.items())
+            WarningDialog(f"Some ships could not be loaded:\n{text}").exec()
+        return report
+
     # Variables ship and is_first_drag will exist during a drag operation
     def startDrag(self, supportedActions):
-        self.ship = self.model().itemFromIndex(self.selectedIndexes()[0])
+        self.ship = self.model().ship(self.selectedIndexes()[0])
         self.is_first_drag = True
         return super().startDrag(supportedActions)
 
-class ShipModel(QStandardItemModel):
-    def __init__(self, parent: QObject = None):
-        super().__init__(0, COLUMN_COUNT, parent)
-        self.setHorizontalHeaderLabels([''] * COLUMN_COUNT) # Empty headers
-        self._add_ship_button_append()
-
-        # Check the validity of the ship after it's been changed
-        self.change_connect = lambda: self.itemChanged.connect(lambda x: self.check_ships())
-        self.change_disconnect = lambda: self.itemChanged.disconnect()
-        self.change_connect()
+# Tree model read straight from a fleet_store.FleetStore. Nothing is built per
+# ship: top level rows are fetched in batches as the view scrolls, and ship and
+# door subtrees are only counted once they have been expanded.
+#
+# The internal id of an index names its parent: 0 for top level rows,
+# (ship << 2) | SHIP_NODE for a ship's rows and (door << 2) | DOOR_NODE for
+# a door's rows.
+ROOT_NODE = 0
+SHIP_NODE = 1
+DOOR_NODE = 2
+FETCH_BATCH = 256
+
+class FleetModel(QAbstractItemModel):
+    def __init__(self, parent: QObject = None, store: fleet_store.FleetStore | None = None):
+        super().__init__(parent)
+        self.store = store if store is not None else fleet_store.FleetStore()
+        self._fetched = 0
+        self._open_ships = set()
+        self._open_doors = set()
+        self._ships = {} # Ship handles, created when a ship is dragged or scheduled
+        self._entries = {} # (table, id, field): (text, error) of rejected entries
+        self._icons = {}
+        self._update_validity()
+
+    # Replace the whole fleet, e.g. after loading a library
+    def set_store(self, store: fleet_store.FleetStore):
+        self.beginResetModel()
+        self.store = store
+        self._fetched = 0
+        self._open_ships.clear()
+        self._open_doors.clear()
+        self._ships.clear()
+        self._entries.clear()
+        self._update_validity()
+        self.endResetModel()
+
+    def _update_validity(self):
+        self._ship_valid = list(self.store.valid())
+        self._door_valid = list(self.store.door_valid())
+
+    # Re-check one ship and its doors after an edit
+    def _check_ship(self, ship: int):
+        self._ship_valid[ship] = self.store.is_valid(ship)
+        doors = self.store.doors_of(ship)
+        for door, valid in zip(doors, self.store.door_valid(doors)):
+            self._door_valid[door] = bool(valid)
+
+    # Identify the row behind an index as (kind, id, field)
+    def _node(self, index: QModelIndex) -> tuple:
+        node = index.internalId()
+        tag, key = node & 3, node >> 2
+        row = index.row()
+        if tag == ROOT_NODE:
+            return ("ship", row, None) if row < self._fetched else ("add_ship", None, None)
+        if tag == SHIP_NODE:
+            if row < len(fleet_store.SHIP_FIELDS):
+                return ("ship_field", key, fleet_store.SHIP_FIELDS[row])
+            doors = self.store.doors_of(key)
+            row -= len(fleet_store.SHIP_FIELDS)
+            return ("door", int(doors[row]), None) if row < len(doors) else ("add_door", key, None)
+        return ("door_field", key, fleet_store.DOOR_FIELDS[row])
+
+    def ship_index(self, ship: int, column: int = 0) -> QModelIndex:
+        return self.createIndex(ship, column, ROOT_NODE)
+
+    # Fetch top level rows until `ship` has one
+    def fetch_ship(self, ship: int):
+        while ship >= self._fetched and self.canFetchMore(QModelIndex()):
+            self.fetchMore(QModelIndex())
+
+    def door_index(self, door: int, column: int = 0) -> QModelIndex:
+        ship = int(self.store.doors["ship"][door])
+        row = len(fleet_store.SHIP_FIELDS) + self.store.door_index(door)
+        return self.createIndex(row, column, (ship << 2) | SHIP_NODE)
 
-    def item_press(self, index: QModelIndex):
-        button = self.itemFromIndex(index)
-        if button.__class__ == AddShipButton:
-            self.add_ship()
-        elif button.__class__ == AddDoorButton:
-            ship: Ship
-            ship = button.parent()
-            ship.add_door()
-        elif button.__class__ == PatternButton:
-            button: PatternButton
-            pattern_dialog = PatternDialog()
-            pattern_dialog.exec()
-            pattern = pattern_dialog.return_pattern()
-            button.set_value(pattern)
-        elif button.__class__ == ColorButton:
-            button: ColorButton
-            color_dialog = QColorDialog()
-            color_dialog.exec()
-            color = color_dialog.selectedColor()
-            button.set_value(color)
-        elif button.__class__ == SideButton:
-            button: SideButton
-            button.increment_side()
-
-    def add_ship(self, name: str | None = None):
-        if type(name == None):
-            Ship(self, f"Ship {self.rowCount()}")
-        elif type(name == str):
-            Ship(self, name)
-        self.check_ships()
-
-    def _add_ship_button_append(self):
-        self.add_ship_button = AddShipButton()
-        self.appendRow([self.add_ship_button, Label()])
+    @typing.override
+    def index(self, row: int, column: int, parent: QModelIndex = QModelIndex()) -> QModelIndex:
+        if not self.hasIndex(row, column, parent):
+            return QModelIndex()
+        if not parent.isValid():
+            return self.createIndex(row, column, ROOT_NODE)
+        kind, key, _ = self._node(parent)
+        if kind == "ship":
+            return self.createIndex(row, column, (key << 2) | SHIP_NODE)
+        return self.createIndex(row, column, (key << 2) | DOOR_NODE)
 
-    @Slot()
-    def check_ships(self):
-        i = 0
-        while True:
-            item = self.item(i, 0)
-            if item == None or item.__class__ == AddShipButton:
-                break
-            else:
-                ship: Ship
-                ship = item
-                ship.check()
-            i += 1
-
-    def _check_value(self, item: QStandardItem):
-        if item.__class__ == AddShipButton:
-            pass 
-        #TODO: Ship and Door name checking
-        elif item.__class__ == Ship or item.__class__ == Ship.Door:
-           pass
-        else:
-            ship_item: Ship.ShipItem
-            self.change_disconnect()
-            ship_item = self.itemFromIndex(item.index().siblingAtColumn(0))
-            ship_item.check_valid()
-            self.change_connect()
-
-class Ship(QStandardItem):
-    class ShipItem(QStandardItem):
-        def __init__(self, parent: QStandardItem, name: str, typing):
-            super().__init__(name)
-            self.setFlags(LABEL_FLAGS)
-            self.parent_item = parent
-            self.name = name
-            self.text_name = name.replace('_', ' ').capitalize()
-            self.typing = typing
-            self.valid = False
-
-            # Set Name
-            self.setText(self.text_name)
-            self._add_item()
-
-        # Add item to ship; add special button instead of an entry if necessary
-        def _add_item(self):
-            if self.typing == Qt.BrushStyle:
-                self.entry = PatternButton()
-            elif self.typing == QColor:
-                self.entry = ColorButton()
-            elif self.typing == Side:
-                self.entry = SideButton()
-            else:
-                self.entry = Entry()
-            self.parent_item.appendRow([self, self.entry])
-
-        def check_valid(self) -> bool:
-            try:
-                item = self.model().itemFromIndex(self.index().siblingAtColumn(1))
-                if(item.__class__ == ColorButton or
-                   item.__class__ == PatternButton or
-                   item.__class__ == SideButton):
-                    self.valid = True
-                else:
-                    if item.text() == '':
-                        self.valid = False
-                    else:
-                        item_value = call(self.typing, item.text())
-                        if type(item_value) == self.typing:
-                            self.valid = True
-                        else:
-                            self.valid = False
-            except Exception as error:
-                self.valid = False
-                WarningDialog(str(error)).exec()
-            if self.valid:
-                color = Qt.GlobalColor.green
-            else:
-                color = Qt.GlobalColor.red
-                item.setText('')
-            self.setForeground(color)
-            return self.valid
-
-    class Door(ShipItem):
-        def __init__(self, parent: QStandardItem, name: str):
-            super().__init__(parent, name, type(self))
-            for key in DOOR_ATTR.keys():
-                parent.ShipItem(self, key, DOOR_ATTR[key])
-            self.valid = False
-
-        # Add door to ship, but make the entry element unchangeable
-        @typing.override
-        def _add_item(self):
-            self.parent_item.appendRow([self, Label()])
+    @typing.override
+    def parent(self, index: QModelIndex = QModelIndex()) -> QModelIndex:
+        if not index.isValid():
+            return QModelIndex()
+        node = index.internalId()
+        tag, key = node & 3, node >> 2
+        if tag == SHIP_NODE:
+            return self.ship_index(key)
+        if tag == DOOR_NODE:
+            return self.door_index(key)
+        return QModelIndex()
 
-        def is_valid(self) -> bool:
-            return self.valid
+    @typing.override
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        if not parent.isValid():
+            return self._fetched + 1 # Trailing "Add ship" row
+        if parent.column() != 0:
+            return 0
+        kind, key, _ = self._node(parent)
+        if kind == "ship" and key in self._open_ships:
+            return len(fleet_store.SHIP_FIELDS) + len(self.store.doors_of(key)) + 1
+        if kind == "door" and key in self._open_doors:
+            return len(fleet_store.DOOR_FIELDS)
+        return 0
 
-        def set_valid(self, b: bool):
-            self.valid = b
+    @typing.override
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return COLUMN_COUNT
 
-            # Change color to green if valid, red if invalid
-            if self.is_valid():
-                self.setForeground(Qt.GlobalColor.green)
-            else:
-                self.setForeground(Qt.GlobalColor.red)
+    @typing.override
+    def hasChildren(self, parent: QModelIndex = QModelIndex()) -> bool:
+        if not parent.isValid():
+            return True
+        return parent.column() == 0 and self._node(parent)[0] in ("ship", "door")
 
-    def __init__(self, parent: QStandardItemModel, name: str, *args):
-        parent.removeRow(parent.add_ship_button.row())
-        super().__init__(name)
-        self.setFlags(SHIP_INVALID_FLAGS)
+    @typing.override
+    def canFetchMore(self, parent: QModelIndex) -> bool:
+        if not parent.isValid():
+            return self._fetched < len(self.store)
+        kind, key, _ = self._node(parent)
+        return ((kind == "ship" and key not in self._open_ships) or
+                (kind == "door" and key not in self._open_doors))
 
-        row = parent.rowCount()
-        parent.setItem(row, 0, self)
-        parent.setItem(row, 1, Label())
-        for key in SHIP_ATTR.keys():
-            self.ShipItem(self, key, SHIP_ATTR[key])
+    @typing.override
+    def fetchMore(self, parent: QModelIndex):
+        if not parent.isValid():
+            count = min(FETCH_BATCH, len(self.store) - self._fetched)
+            if count <= 0:
+                return
+            self.beginInsertRows(QModelIndex(), self._fetched, self._fetched + count - 1)
+            self._fetched += count
+            self.endInsertRows()
+            return
+        kind, key, _ = self._node(parent)
+        if kind == "ship":
+            count = len(fleet_store.SHIP_FIELDS) + len(self.store.doors_of(key)) + 1
+            self.beginInsertRows(parent, 0, count - 1)
+            self._open_ships.add(key)
+            self.endInsertRows()
+        elif kind == "door":
+            self.beginInsertRows(parent, 0, len(fleet_store.DOOR_FIELDS) - 1)
+            self._open_doors.add(key)
+            self.endInsertRows()
+
+    def _icon(self, attr_type, value) -> QIcon:
+        key = (attr_type, value)
+        if key not in self._icons:
+            if attr_type == Side:
+                self._icons[key] = QIcon(SIDE_ICONS.get(Side(value)))
+            elif attr_type == QColor:
+                self._icons[key] = StyleIcon(QColor(value))
+            else:
+                self._icons[key] = StyleIcon(Qt.BrushStyle(value))
+        return self._icons[key]
+
+    def _field(self, kind: str, key: int, field: str) -> tuple:
+        if kind == "ship_field":
+            return "ship", SHIP_ATTR[field], self.store.ship_value(key, field)
+        return "door", DOOR_ATTR[field], self.store.door_value(key, field)
+
+    # Error message of a field, None if it holds a value
+    def field_error(self, kind: str, key: int, field: str) -> str | None:
+        table, attr_type, value = self._field(kind, key, field)
+        entry = self._entries.get((table, key, field))
+        if entry is not None:
+            return entry[1]
+        missing = value != value if type(value) == float else value < 0
+        return "A value is required" if missing else None
 
-        parent._add_ship_button_append()
+    @typing.override
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        kind, key, field = self._node(index)
+        column = index.column()
+
+        if kind in ("add_ship", "add_door"):
+            if column == 0 and role == Qt.ItemDataRole.DisplayRole:
+                return "Add ship" if kind == "add_ship" else "Add door"
+            if column == 0 and role == Qt.ItemDataRole.DecorationRole:
+                return self._icon_add()
+            return None
+
+        if kind in ("ship", "door"):
+            valid = self._ship_valid[key] if kind == "ship" else self._door_valid[key]
+            if column == 0 and role in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.EditRole):
+                if kind == "ship":
+                    return self.store.names[key]
+                return self.store.door_names[key]
+            if column == 0 and role == Qt.ItemDataRole.ForegroundRole:
+                return QColor(Qt.GlobalColor.green if valid else Qt.GlobalColor.red)
+            if kind == "ship" and role == Qt.ItemDataRole.ToolTipRole and not valid:
+                return '\n'.join(f"{door}: {field}: {error}" if door else f"{field}: {error}"
+                                  for _, door, field, error in self.errors(key)) or None
+            if column == 1 and role == Qt.ItemDataRole.DisplayRole:
+                if kind == "ship" and len(self.store.doors_of(key)) == 0:
+                    return "No doors"
+                if kind == "ship":
+                    return error_summary(self.store.missing_count(key))
+                return error_summary(sum(self.field_error("door_field", key, f) is not None
+                                         for f in fleet_store.DOOR_FIELDS))
+            return None
+
+        table, attr_type, value = self._field(kind, key, field)
+        error = self.field_error(kind, key, field)
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return error
+        if column == 0:
+            if role == Qt.ItemDataRole.DisplayRole:
+                return field_label(field)
+            if role == Qt.ItemDataRole.ForegroundRole:
+                return QColor(Qt.GlobalColor.red if error else Qt.GlobalColor.green)
+            return None
+        if attr_type in BUTTON_TYPES:
+            if role == Qt.ItemDataRole.DecorationRole and error is None:
+                return self._icon(attr_type, value)
+            return None
+        if role in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.EditRole):
+            entry = self._entries.get((table, key, field))
+            if entry is not None:
+                return entry[0]
+            return '' if error else str(value)
+        return None
+
+    def _icon_add(self) -> QIcon:
+        if "add" not in self._icons:
+            self._icons["add"] = QIcon(ADD_ICON)
+        return self._icons["add"]
 
-        if len(args) == 0:
-            self.valid = False
+    @typing.override
+    def flags(self, index: QModelIndex) -> Qt.ItemFlag:
+        if not index.isValid():
+            return Qt.ItemFlag.NoItemFlags
+        kind, key, field = self._node(index)
+        if kind in ("add_ship", "add_door"):
+            return LABEL_SELECTABLE_FLAGS
+        if kind == "ship" and index.column() == 0:
+            return SHIP_VALID_FLAGS if self._ship_valid[key] else SHIP_INVALID_FLAGS
+        if kind in ("ship_field", "door_field") and index.column() == 1:
+            if self._field(kind, key, field)[1] in BUTTON_TYPES:
+                return LABEL_SELECTABLE_FLAGS
+            return ENTRY_FLAGS
+        return LABEL_FLAGS
+
+    #TODO: Ship and Door name checking
+    @typing.override
+    def setData(self, index: QModelIndex, value, role: int = Qt.ItemDataRole.EditRole) -> bool:
+        if role != Qt.ItemDataRole.EditRole or not index.isValid():
+            return False
+        kind, key, field = self._node(index)
+        if kind == "ship" and index.column() == 0:
+            self.store.names[key] = str(value)
+            self.dataChanged.emit(index, index)
+            return True
+        if kind not in ("ship_field", "door_field") or index.column() != 1:
+            return False
+        self.set_field(kind, key, field, value)
+        return True
+
+    # Store a field's new value and re-check only the field, its door and ship
+    def set_field(self, kind: str, key: int, field: str, value):
+        table, attr_type, _ = self._field(kind, key, field)
+        if attr_type in BUTTON_TYPES:
+            parsed, error = value, None
         else:
-            for i, arg in enumerate(args):
-                if i < self.ship_item_count():
-                    # Set text value if normal entry, else assumed to be ValueButton
-                    child = self.child(i, 1)
-                    #FIXME: Integrate error checking
-                    if self.child(i, 1).__class__ == Entry:
-                        child: Entry
-                        child.setText(str(arg))
-                    else:
-                        child: ValueButton
-                        child.set_value(arg)
-                else:
-                    if type(arg) == dict:
-                        arg: dict
-                        name = list(arg.keys())[0]
-                        door = self.Door(self, name)
-                        #FIXME: Integrate error checking
-                        for i, key in enumerate(arg[name]):
-                            child = door.child(i, 1)
-                            value = arg.get(name)[key]
-                            if child.__class__ == Entry:
-                                child: Entry
-                                child.setText(str(value))
-                            else:
-                                child: ValueButton
-                                child.set_value(value)
-                    else:
-                        raise TypeError(f"Door arguments must be type dict, not {type(arg)}")
-        self.add_door_button_append()
-        self.check()
-
-    def ship_item_count(self) -> int:
-        count = 0
-        for i in range(self.rowCount()):
-            if type(self.child(i, 0)) != Ship.ShipItem:
-                return count
-            else:
-                count += 1
-        return count
-
-    def add_door_button_append(self):
-        self.add_door_button = AddDoorButton()
-        self.appendRow([self.add_door_button, Label()])
+            parsed, error = PARSERS[attr_type](str(value))
+        if error is None:
+            self._entries.pop((table, key, field), None)
+        else:
+            self._entries[(table, key, field)] = (str(value), error)
 
-    def add_door(self, name: str | None = None):
-        self.removeRow(self.rowCount() - 1)
-        if type(name == None):
+        if table == "ship":
+            ship = key
+            self.store.set_ship_value(key, field, parsed)
+            row = fleet_store.SHIP_FIELDS.index(field)
+            parent = self.ship_index(ship)
+        else:
+            ship = int(self.store.doors["ship"][key])
+            self.store.set_door_value(key, field, parsed)
+            row = fleet_store.DOOR_FIELDS.index(field)
+            parent = self.door_index(key)
+            self.dataChanged.emit(parent, parent.siblingAtColumn(1))
+        self._check_ship(ship)
+        self.dataChanged.emit(self.index(row, 0, parent), self.index(row, 1, parent))
+        self.dataChanged.emit(self.ship_index(ship), self.ship_index(ship, 1))
+
+    def add_ship(self, name: str | None = None) -> int:
+        if name is None:
+            name = f"Ship {len(self.store)}"
+        values = {"pattern": pattern_arr[random.randint(0, len(pattern_arr) - 1)].value,
+                  "color": QColor(Qt.GlobalColor(random.randint(0, len(Qt.GlobalColor) - 1))).rgb()}
+        return self._insert_ship(lambda: self.store.add_ship(name, values))
+
+    def add_from_dict(self, name: str, d: dict) -> int:
+        return self._insert_ship(lambda: self.store.add_from_dict(name, d))
+
+    # Add a ship to the store, showing it straight away if every ship is fetched
+    def _insert_ship(self, add) -> int:
+        shown = self._fetched == len(self.store)
+        if shown:
+            self.beginInsertRows(QModelIndex(), self._fetched, self._fetched)
+        ship = add()
+        self._ship_valid.append(False)
+        self._door_valid.extend([False] * (self.store.door_count - len(self._door_valid)))
+        self._check_ship(ship)
+        if shown:
+            self._fetched += 1
+            self.endInsertRows()
+        return ship
+
+    def add_door(self, ship: int, name: str | None = None) -> int:
+        if name is None:
             # TODO: Add "autoname" bool, set to true until changed by user
             # So if a door is removed, the other door's numbers will be adjusted
-            self.Door(self, f"Door {self.rowCount() - self.ship_item_count() + 1}")
-        elif type(name == str):
-            self.Door(self, name)
-        self.add_door_button_append()
-        self.check()
+            name = f"Door {len(self.store.doors_of(ship)) + 1}"
+        values = {"side": Side.both.value}
+        if ship in self._open_ships:
+            row = len(fleet_store.SHIP_FIELDS) + len(self.store.doors_of(ship))
+            self.beginInsertRows(self.ship_index(ship), row, row)
+            door = self.store.add_door(ship, name, values)
+            self._door_valid.append(False)
+            self.endInsertRows()
+        else:
+            door = self.store.add_door(ship, name, values)
+            self._door_valid.append(False)
+        self._check_ship(ship)
+        self.dataChanged.emit(self.ship_index(ship), self.ship_index(ship, 1))
+        return door
+
+    def item_press(self, index: QModelIndex):
+        kind, key, field = self._node(index)
+        if kind == "add_ship":
+            self.add_ship()
+        elif kind == "add_door":
+            self.add_door(key)
+        elif kind in ("ship_field", "door_field") and index.column() == 1:
+            attr_type = self._field(kind, key, field)[1]
+            if attr_type == Qt.BrushStyle:
+                pattern_dialog = PatternDialog()
+                pattern_dialog.exec()
+                pattern = pattern_dialog.return_pattern()
+                self.set_field(kind, key, field, pattern.value)
+            elif attr_type == QColor:
+                color_dialog = QColorDialog()
+                color_dialog.exec()
+                color = color_dialog.selectedColor()
+                self.set_field(kind, key, field, color.rgb())
+            elif attr_type == Side:
+                side = self._field(kind, key, field)[2]
+                self.set_field(kind, key, field, (side + 1) % len(Side))
+
+    # Handle on a ship for the map and the scheduler
+    def ship(self, index: QModelIndex):
+        kind, key, _ = self._node(index)
+        if kind != "ship":
+            return None
+        if key not in self._ships:
+            self._ships[key] = Ship(self.store, key)
+        return self._ships[key]
+
+    # Invalid fields of one ship, or of every ship, as (ship, door, field,
+    # error) tuples. `door` is the door's name, '' for fields of the ship.
+    def errors(self, ship: int | None = None) -> list[tuple[str, str, str, str]]:
+        ships = np.flatnonzero(~self.store.valid()) if ship is None else [ship]
+        errors = []
+        for ship in ships:
+            for field in fleet_store.SHIP_FIELDS:
+                error = self.field_error("ship_field", ship, field)
+                if error is not None:
+                    errors.append((self.store.names[ship], '', field_label(field), error))
+            for door in self.store.doors_of(ship):
+                for field in fleet_store.DOOR_FIELDS:
+                    error = self.field_error("door_field", door, field)
+                    if error is not None:
+                        errors.append((self.store.names[ship], self.store.door_names[door],
+                                       field_label(field), error))
+        return errors
+
+# A ship of the fleet store, and its graphic once dragged onto the map
+class Ship:
+    def __init__(self, store: fleet_store.FleetStore, ship_id: int):
+        self.store = store
+        self.id = ship_id
+        self.ship_graphic = None
+
+    def text(self) -> str:
+        return self.store.names[self.id]
 
     def is_valid(self) -> bool:
-        return self.valid
-
-    def set_valid(self, b: bool):
-        # Check if ship has at least one door
-        i = 0
-        has_doors: bool
-        has_doors = False
-        while True:
-            child = self.child(i, 0)
-            if child == None:
-                break
-            elif type(child) == self.Door:
-                has_doors = True
-            i += 1
-
-        # Set invalid if ship has no doors, even if method argued true
-        self.valid = b and has_doors
-
-        # Change color to green if valid, red if invalid
-        if self.is_valid():
-            self.setForeground(Qt.GlobalColor.green)
-            self.setFlags(SHIP_VALID_FLAGS)
-        else:
-            self.setForeground(Qt.GlobalColor.red)
-            self.setFlags(SHIP_INVALID_FLAGS)
-
-    def check(self):
-        self.model().change_disconnect()
-        ship_valid = True
-        i = 0
-        while True:
-            item = self.child(i, 0)
-            if item.__class__ == Ship.ShipItem:
-                item: Ship.ShipItem
-                if not item.check_valid():
-                    ship_valid = False
-            elif item.__class__ == Ship.Door:
-                j = 0
-                item: Ship.Door
-                door_valid = True
-                while True:
-                    door_item = item.child(j, 0)
-                    if door_item.__class__ == Ship.ShipItem:
-                        door_item: Ship.ShipItem
-                        if not door_item.check_valid():
-                            door_valid = False
-                            ship_valid = False
-                    else:
-                        break
-                    j += 1
-                item.set_valid(door_valid)
-            else:
-                break
-            i += 1
-        self.set_valid(ship_valid)
-        self.model().change_connect()
+        return self.store.is_valid(self.id)
+
+    # Values of the ship in the layout of the ship .json files
+    def to_dict(self) -> dict:
+        return self.store.to_dict(self.id)
 
-    class ShipGraphic(QGraphicsPathItem):
-        def __init__(self, ship: QStandardItem, pos: QPointF):
-            path = QPainterPath()
-            path.addRect(pos.x(), pos.y(), 5, 5)
-            super().__init__(path)
+    # Hull drawn from cached paths. Zoomed out it drops the door markers and
+    # label, and further out the hull becomes a plain rectangle.
+    class ShipGraphic(QGraphicsItem):
+        def __init__(self, ship, pos: QPointF):
+            super().__init__()
+            self.ship = ship
+            self.conflict = False
+            self.geometry = None
+            self.paths = None
+            self.update_geometry()
+            self.setPos(pos)
+
+            # Moving ships are blitted from their own cached pixmap instead
+            # of being redrawn on every move
+            self.setCacheMode(self.CacheMode.DeviceCoordinateCache)
+
+        # Port side to puts the bow at the high chainage end, starboard side to
+        # turns the hull around about its centre
+        def set_side(self, side: int):
+            transform = QTransform()
+            if side == Side.starboard.value and self.geometry is not None:
+                length, width, _ = self.geometry
+                transform = QTransform(-1, 0, 0, -1, length, width)
+            self.setTransform(transform)
+
+        # Call after the ship's length, width or doors change
+        def update_geometry(self):
+            geometry = ship_hull.hull_geometry(self.ship.store, self.ship.id)
+            if self.paths is not None and geometry == self.geometry:
+                return
+            self.prepareGeometryChange()
+            self.geometry = geometry
+            self.paths = ship_hull.hull_paths(geometry)
+
+        @typing.override
+        def boundingRect(self) -> QRectF:
+            return self.paths.bounds.adjusted(-1, -1, 1, 1)
+
+        @typing.override
+        def shape(self) -> QPainterPath:
+            return self.paths.hull
+
+        @typing.override
+        def paint(self, painter: QPainter, option: QStyleOptionGraphicsItem, widget=None):
+            store, ship = self.ship.store, self.ship.id
+            lod = option.levelOfDetailFromTransform(painter.worldTransform())
+            color = QColor(int(max(store.ships["color"][ship], 0)))
+            pen = QPen(Qt.GlobalColor.red if self.conflict else Qt.GlobalColor.black)
+            pen.setCosmetic(True)
+            painter.setPen(pen)
+
+            if lod < ship_hull.SILHOUETTE_LOD:
+                painter.setBrush(color)
+                painter.drawPath(self.paths.silhouette)
+                return
+
+            pattern = int(store.ships["pattern"][ship])
+            style = Qt.BrushStyle(pattern) if pattern > 0 else Qt.BrushStyle.SolidPattern
+            painter.setBrush(QBrush(color, style))
+            painter.drawPath(self.paths.hull)
+            if lod < ship_hull.DETAIL_LOD:
+                return
+
+            painter.setBrush(Qt.GlobalColor.black)
+            painter.drawPath(self.paths.doors)
+            painter.drawText(self.paths.bounds, Qt.AlignmentFlag.AlignCenter, self.ship.text())
+
+        # Outline the ship red while it overlaps another berthed ship
+        def set_conflict(self, b: bool):
+            if self.conflict != b:
+                self.conflict = b
+                self.update()
 
     def draw_ship_graphic(self, parent: QGraphicsView, pos: QPointF):
         self.ship_graphic = self.ShipGraphic(self, pos)
         parent.scene().addItem(self.ship_graphic)
         self.ship_graphic.show()
-        # width = self.child(get_index(SHIP_ATTR, "width"))
-        # height = self.child(get_index(SHIP_ATTR, "height"))
 
+    # Skip moves that would not change anything, each one repaints the scene
     def move_ship_graphic(self, pos: QPointF):
-        self.ship_graphic.setPos(pos)
+        if self.ship_graphic.pos() != pos:
+            self.ship_graphic.setPos(pos)
 
-def ship_from_json(model: QStandardItemModel, ship_name: str):
+def ship_from_json(model: FleetModel, ship_name: str):
     path = os.path.join(SHIP_DIR, f"{ship_name}.json")
     if os.path.isfile(path):
         with open(path) as file: s = file.read()
         d = json.loads(s)
-        ship = Ship(model, ship_name)
-
-        # Process ship items
-        for i, key in enumerate(SHIP_ATTR):
-            val = call(SHIP_ATTR[key], d[list(d.keys())[i]])
-            ship.child(i, 1).set_value(val)
-
-        # # Process doors
-        for j in range(i+1, len(d)):
-            door_name = list(d.keys())[j]
-            ship.add_door(door_name)
-            for k, key in enumerate(DOOR_ATTR.keys()):
-                val = call(DOOR_ATTR[key], d[door_name][key])
-                ship.child(j).child(k, 1).set_value(val)
-            # ship.add_door({door_name : d[door_name]})
+        model.add_from_dict(ship_name, d)
@@ -0,0 +1,72 @@
+import functools
+import numpy as np
+
+from PySide6.QtCore import *
+from PySide6.QtGui import *
+
+import berth_solver
+import fleet_store
+
+# Hull outlines of the fleet's ships as painter paths, shared by the map's
+# ship graphics and the plan sheets. Only needs QtGui, so export workers can
+# draw hulls without pulling in the editor or the main window.
+
+HULL_CACHE_SIZE = 512 # Distinct hull geometries kept
+DETAIL_LOD = 0.5 # Door markers and labels are drawn above this zoom
+SILHOUETTE_LOD = 0.125 # Below this zoom hulls are drawn as plain rectangles
+DOOR_MARK_DEPTH = 4.0
+PLACEHOLDER_SIZE = 5.0 # Hulls without a valid length and width
+
+# Paths of one hull shape, in item coordinates with the stern at x = 0, the
+# bow towards +x and the port side along y = 0
+class HullPaths:
+    def __init__(self, hull: QPainterPath, silhouette: QPainterPath,
+                 doors: QPainterPath):
+        self.hull = hull
+        self.silhouette = silhouette
+        self.doors = doors
+        self.bounds = hull.boundingRect()
+
+# Everything the hull shape depends on, as a hashable key. None for ships
+# whose length or width is missing.
+def hull_geometry(store: fleet_store.FleetStore, ship: int) -> tuple | None:
+    length = store.ships["length"][ship]
+    width = store.ships["width"][ship]
+    if not (np.isfinite(length) and np.isfinite(width) and length > 0 and width > 0):
+        return None
+    doors = store.doors[store.doors_of(ship)]
+    doors = doors[(doors["side"] >= 0) & np.isfinite(doors["bow_distance"]) &
+                  np.isfinite(doors["width"])]
+    return (float(length), float(width),
+            tuple(zip(doors["side"].tolist(), doors["bow_distance"].tolist(),
+                      doors["width"].tolist())))
+
+@functools.lru_cache(maxsize=HULL_CACHE_SIZE)
+def hull_paths(geometry: tuple | None) -> HullPaths:
+    if geometry is None:
+        path = QPainterPath()
+        path.addRect(0, 0, PLACEHOLDER_SIZE, PLACEHOLDER_SIZE)
+        return HullPaths(path, path, QPainterPath())
+    length, width, doors = geometry
+
+    # Square stern, parallel body and a bow that narrows to a point
+    bow = min(width * 1.5, length * 0.25)
+    hull = QPainterPath(QPointF(0, 0))
+    hull.lineTo(length - bow, 0)
+    hull.quadTo(length, 0, length, width / 2)
+    hull.quadTo(length, width, length - bow, width)
+    hull.lineTo(0, width)
+    hull.closeSubpath()
+
+    silhouette = QPainterPath()
+    silhouette.addRect(0, 0, length, width)
+
+    # Doors sit on the hull edge of their side, measured back from the bow
+    marks = QPainterPath()
+    for side, bow_distance, door_width in doors:
+        x = length - bow_distance - door_width / 2
+        if side in (berth_solver.PORT, berth_solver.BOTH):
+            marks.addRect(x, 0, door_width, DOOR_MARK_DEPTH)
+        if side in (berth_solver.STARBOARD, berth_solver.BOTH):
+            marks.addRect(x, width - DOOR_MARK_DEPTH, door_width, DOOR_MARK_DEPTH)
+    return HullPaths(hull, silhouette, marks)
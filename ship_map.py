@@ -1,12 +1,24 @@
+import typing
+import numpy as np
+
 from PySide6.QtCore import *
 from PySide6.QtGui import *
 from PySide6.QtWidgets import *
 from PySide6.QtSvgWidgets import *
 
 import port_items
+import port_layout
+import quay_geometry
+import berth_solver
+import playback
 
 SCENE_WIDTH = 3500
 SCENE_HEIGHT = 1000
+BOLLARD_RADIUS = 2 # Half the size of bollard.svg
+WATER_TREE_RADIUS = 20 # Half the size of water_tree.svg
+FRAME_INTERVAL = 16 # Milliseconds between drag updates, about 60 per second
+SNAP_DISTANCE = 200 # Ships dropped closer than this to the quay edge snap to it
+BSP_TREE_DEPTH = 6 # Fixed so moving ships never trigger a rebuild of the tree
 
 ZOOM_IN_SHORTCUT = QKeyCombination(Qt.KeyboardModifier.ControlModifier,
                                    Qt.Key.Key_Equal)
@@ -14,6 +26,8 @@ ZOOM_OUT_SHORTCUT = QKeyCombination(Qt.KeyboardModifier.ControlModifier,
                                     Qt.Key.Key_Minus)
 
 class ShipMap(QGraphicsView):
+    bollard_clicked = Signal(int) # Row in the layout's bollard registry
+
     def __init__(self, parent: QObject=None):
         super().__init__(parent)
 
@@ -23,31 +37,179 @@ class ShipMap(QGraphicsView):
         self._scene_rect = QRectF(0, 0, SCENE_WIDTH, SCENE_HEIGHT)
         self.setSceneRect(self._scene_rect)
 
-        # Configurations
+        # Configurations. The background is composited once per zoom level
+        # into the view's cache, items are found through the scene's BSP
+        # tree, and only the bounding rects of changed items are repainted.
         self.setCacheMode(QGraphicsView.CacheModeFlag.CacheBackground)
         self.setRenderHint(QPainter.RenderHint.Antialiasing)
         self.setTransformationAnchor(QGraphicsView.ViewportAnchor.AnchorUnderMouse)
         self.setResizeAnchor(QGraphicsView.ViewportAnchor.AnchorUnderMouse)
-        self._scene.setItemIndexMethod(QGraphicsScene.ItemIndexMethod.NoIndex)
+        self.setViewportUpdateMode(QGraphicsView.ViewportUpdateMode.SmartViewportUpdate)
+        self._scene.setItemIndexMethod(QGraphicsScene.ItemIndexMethod.BspTreeIndex)
+        self._scene.setBspTreeDepth(BSP_TREE_DEPTH)
 
         # Background
-        port_items.Outline(self)
-        port_items.Ocean(self)
+        self._background = port_items.Background()
+
+        # Bollards and water trees from the port layout, centred on their coordinates
+        self.port_layout = port_layout.load_layout()
+        bollards = self.port_layout.bollards
+        for row in range(len(bollards)):
+            port_items.Bollard(self, bollards.x[row] - BOLLARD_RADIUS,
+                               bollards.y[row] - BOLLARD_RADIUS, row)
+        trees = self.port_layout.water_trees
+        for row in range(len(trees)):
+            port_items.WaterTree(self, trees.x[row] - WATER_TREE_RADIUS,
+                                 trees.y[row] - WATER_TREE_RADIUS)
+
+        # Quay occupancy and the time shown on the timeline, used to flag
+        # clashes while dragging
+        self.occupancy = None
+        self.time = 0
+        self.quay_edge = quay_geometry.load_edge()
+        self.quay = berth_solver.Quay.from_layout(self.port_layout, self.quay_edge)
+
+        # Drag state. Mouse moves only record the latest position, the frame
+        # timer applies it at most once per FRAME_INTERVAL.
+        self._drag_ship = None
+        self._drag_pos = None
+        self._positions = np.zeros(0) # Starts where the dragged hull can moor
+        self._blocked = None # Per start, True while it clashes with the occupancy
+        self._frame_timer = QTimer(self)
+        self._frame_timer.setSingleShot(True)
+        self._frame_timer.setInterval(FRAME_INTERVAL)
+        self._frame_timer.timeout.connect(self._apply_drag)
+
+        # Ships of the current plan, placed from its keyframes at self.time
+        self._playback = playback.Playback([])
+        self._plan_graphics = []
+
+    @typing.override
+    def drawBackground(self, painter: QPainter, rect: QRectF):
+        super().drawBackground(painter, rect)
+        self._background.paint(painter, rect)
+
+    def set_occupancy(self, index):
+        self.occupancy = index
+        self._blocked = None
+
+    @Slot(int)
+    def set_time(self, time: int):
+        self.time = time
+        self._blocked = None
+        self._update_playback()
+
+    # Show a new plan. `ships` and `sides` line up with the calls of `plan`.
+    # Every call gets its own graphic, a ship may call more than once.
+    def set_playback(self, plan: playback.Playback, ships: list, sides: list[int]):
+        for graphic in self._plan_graphics:
+            self._scene.removeItem(graphic)
+        self._playback = plan
+        self._plan_graphics = []
+        for ship, side in zip(ships, sides):
+            graphic = ship.ShipGraphic(ship, QPointF(0, 0))
+            graphic.set_side(side)
+            self._scene.addItem(graphic)
+            self._plan_graphics.append(graphic)
+        self._update_playback()
+
+    # Move every ship of the plan to its state at self.time. Only reads the
+    # precomputed keyframes, so it is cheap enough for every slider tick.
+    def _update_playback(self):
+        if len(self._plan_graphics) == 0:
+            return
+        chainage, offset, state = self._playback.at(self.time)
+        visible = playback.Playback.visible(state)
+        points = self.quay_edge.point(chainage, offset)
+        for i, graphic in enumerate(self._plan_graphics):
+            if graphic.isVisible() != visible[i]:
+                graphic.setVisible(bool(visible[i]))
+            pos = QPointF(points[i, 0], points[i, 1])
+            if visible[i] and graphic.pos() != pos:
+                graphic.setPos(pos)
+
+    # Call whenever entries of the occupancy index change
+    @Slot()
+    def update_occupancy(self):
+        self._blocked = None
+
+    # Clashes of every snap position with the ships alongside at self.time,
+    # computed once per drag and again only after the time or occupancy change.
+    # Hulls must keep the solver's clearance, as in Problem.free_mask.
+    def _blocked_positions(self, length: float) -> np.ndarray:
+        if self._blocked is None:
+            self._blocked = np.zeros(len(self._positions), dtype=bool)
+            if self.occupancy is not None:
+                for key in self.occupancy.at(self.time):
+                    c0, c1, _, _ = self.occupancy.get(key)
+                    self._blocked |= ((self._positions < c1 + berth_solver.CLEARANCE) &
+                                      (self._positions + length >
+                                       c0 - berth_solver.CLEARANCE))
+        return self._blocked
+
+    # Snap position nearest a chainage, preferring clash free ones. Returns
+    # (start, clashes), or None when the hull can moor nowhere.
+    def _snap(self, chainage: float, length: float) -> tuple[float, bool] | None:
+        if len(self._positions) == 0:
+            return None
+        blocked = self._blocked_positions(length)
+        free = self._positions[~blocked]
+        candidates = free if len(free) else self._positions
+        i = int(np.searchsorted(candidates, chainage))
+        if i == len(candidates) or (i > 0 and
+            chainage - candidates[i - 1] < candidates[i] - chainage):
+            i -= 1
+        return float(candidates[i]), len(free) == 0
 
     def dragEnterEvent(self, event):
         event.acceptProposedAction()
+        ship = event.source().ship
+        length = ship.store.ship_value(ship.id, "length")
+        width = ship.store.ship_value(ship.id, "width")
+        self._positions = np.zeros(0)
+        if np.isfinite(length) and np.isfinite(width):
+            doors = berth_solver.Call.from_store(ship.store, ship.id, ship.text(), 0, 0).doors
+            self._positions = berth_solver.berth_positions(self.quay, length, doors=doors,
+                                                           width=width)
+        self._blocked = None
+        self._drag_ship = ship
         if event.source().is_first_drag:
-            event.source().ship.draw_ship_graphic(self, QPointF(0, 0))
+            ship.draw_ship_graphic(self, QPointF(0, 0))
             event.source().is_first_drag = False
 
     def dropEvent(self, event):
         event.acceptProposedAction()
+        self._frame_timer.stop()
+        self._apply_drag()
+        self._drag_ship = None
 
     def dragMoveEvent(self, event):
         event.acceptProposedAction()
-        pos = QPointF(event.posF().x() - self.viewportTransform().dx(),
-                      event.posF().y() - self.viewportTransform().dy()) 
-        event.source().ship.move_ship_graphic(pos)
+        self._drag_pos = self.mapToScene(event.position().toPoint())
+        if not self._frame_timer.isActive():
+            self._frame_timer.start()
+
+    # Move the dragged ship to the last recorded position, snapped onto the
+    # quay edge when close to it
+    @Slot()
+    def _apply_drag(self):
+        ship, pos = self._drag_ship, self._drag_pos
+        if ship is None or pos is None or ship.ship_graphic is None:
+            return
+        self._drag_pos = None
+        length = ship.store.ship_value(ship.id, "length")
+        snap = None
+        chainage, offset = self.quay_edge.project(pos.x(), pos.y())
+        if abs(float(offset)) < SNAP_DISTANCE:
+            snap = self._snap(float(chainage), length)
+        if snap is None:
+            ship.move_ship_graphic(pos)
+            ship.ship_graphic.set_conflict(False)
+            return
+        start, clashes = snap
+        x, y = self.quay_edge.point(start)
+        ship.move_ship_graphic(QPointF(x, y))
+        ship.ship_graphic.set_conflict(clashes)
 
     #TODO: Create side shell plan view with integrated "auto scroll down" thing
     # def resizeEvent(self, event):
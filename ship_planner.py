@@ -1,15 +1,43 @@
+import typing
+import datetime
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
+
 from PySide6.QtCore import *
+from PySide6.QtGui import *
 from PySide6.QtWidgets import *
 
 import ship_map
+import berth_solver
+import portfolio
+import optimiser
+import solver_cache
+import occupancy
+import port_layout
+import quay_geometry
+import playback
+import scene_file
+import schedule_db
+import tides
+import berth_gantt
 
 SECONDS_IN_DAY = 60 * 60 * 24
+FRAME_INTERVAL = 16 # Milliseconds between playback frames
+PLAYBACK_STEP = 60 # Seconds of port time per playback frame
+REPAIR_DELAY = 300 # Milliseconds without window edits before the plan is repaired
 
 class Timeline(QWidget):
+    time_changed = Signal(int)
+    day_closing = Signal(object) # datetime.date about to be left
+    day_changed = Signal(object, object) # New datetime.date, its DayPlan from the scene or None
+
     def __init__(self, parent: QObject=None):
         super().__init__(parent)
         self.setObjectName("Timeline")
-        self.date_dict = {}
+        self.occupancy = None
+        self.workable = {}
+        self.scene = None
+        self.schedule = None
         self.setLayout(QGridLayout(self))
         self.setSizePolicy(QSizePolicy.Policy.MinimumExpanding,
                             QSizePolicy.Policy.Maximum)
@@ -28,19 +56,29 @@ class Timeline(QWidget):
         self.time_edit = QTimeEdit(self)
         self.layout().addWidget(self.time_edit, 1, 2, 1, 1)
 
+        # Playback steps the slider through the day
+        self.play_button = QPushButton("Play", self)
+        self.play_button.setCheckable(True)
+        self.play_button.toggled.connect(self.set_playing)
+        self.layout().addWidget(self.play_button, 1, 3, 1, 1)
+        self._play_timer = QTimer(self)
+        self._play_timer.setInterval(FRAME_INTERVAL)
+        self._play_timer.timeout.connect(self._step)
+
+        # Calls alongside at the current time
+        self.alongside_label = QLabel(self)
+        self.layout().addWidget(self.alongside_label, 2, 0, 1, 3)
+
         # Initialize variables from initial values of calender and time edit
         self.date = self.calender.selectedDate()
         self.time = self.time_edit.time()
 
-        # Connect signals after time and date are assigned
-        self.connect_time_edit = lambda: self.time_edit.timeChanged.connect(lambda x: self.update_time(x))
-        self.disconnect_time_edit = lambda: self.time_edit.timeChanged.disconnect()
-
-        self.connect_slider = lambda: self.slider.valueChanged.connect(lambda x: self.update_time(x))
-        self.disconnect_slider = lambda: self.slider.valueChanged.disconnect()
-
-        self.connect_time_edit()
-        self.connect_slider()
+        # Connect signals after time and date are assigned. Each widget is
+        # updated with its signals blocked so they do not feed back.
+        self.time_edit.timeChanged.connect(self.update_time)
+        self.slider.valueChanged.connect(self.update_time)
+        self.calender.selectionChanged.connect(self._select_date)
+        self.calender.currentPageChanged.connect(self._mark_days)
 
     def update_time(self, time: QTime | int):
         if type(time) == QTime:
@@ -48,9 +86,9 @@ class Timeline(QWidget):
             self.time = time.hour() * 3600 + time.minute() * 60 + time.second()
 
             # Change time edit value
-            self.disconnect_slider()
-            self.slider.setValue(self.time)
-            self.connect_slider()
+            with QSignalBlocker(self.slider):
+                self.slider.setValue(self.time)
+            self.time_changed.emit(self.time)
 
         elif type(time) == int:
             time: int
@@ -60,9 +98,99 @@ class Timeline(QWidget):
             self.time = QTime(h, m, s)
 
             # Change time slider value
-            self.disconnect_time_edit()
-            self.time_edit.setTime(self.time)
-            self.connect_time_edit()
+            with QSignalBlocker(self.time_edit):
+                self.time_edit.setTime(self.time)
+            self.time_changed.emit(time)
+        self.update_alongside()
+
+    @Slot(bool)
+    def set_playing(self, playing: bool):
+        if playing:
+            self._play_timer.start()
+        else:
+            self._play_timer.stop()
+        self.play_button.setText("Pause" if playing else "Play")
+
+    @Slot()
+    def _step(self):
+        self.slider.setValue((self.slider.value() + PLAYBACK_STEP) % SECONDS_IN_DAY)
+
+    def set_occupancy(self, index: occupancy.OccupancyIndex):
+        self.occupancy = index
+        self.update_alongside()
+
+    # Minutes of the day each berthed call can work its doors, by occupancy key
+    @Slot(object)
+    def set_workable(self, workable: dict):
+        self.workable = workable
+        self.update_alongside()
+
+    # Season file the selected date is read from
+    def set_scene(self, scene: scene_file.SceneFile):
+        self.scene = scene
+        self.date = self.calender.selectedDate()
+        self._load_date()
+
+    # Local schedule store, used for days while no scene file is open
+    def set_schedule(self, schedule: schedule_db.ScheduleDB):
+        self.schedule = schedule
+        self.date = self.calender.selectedDate()
+        self._mark_days(self.calender.yearShown(), self.calender.monthShown())
+        self._load_date()
+
+    @Slot()
+    def _select_date(self):
+        if self.scene is not None or self.schedule is not None:
+            self.day_closing.emit(self.date.toPython())
+            self._mark_days(self.calender.yearShown(), self.calender.monthShown())
+        self.date = self.calender.selectedDate()
+        self._load_date()
+
+    # Embolden the dates of the shown month that have calls, read from the
+    # schedule store one month at a time
+    @Slot(int, int)
+    def _mark_days(self, year: int, month: int):
+        if self.schedule is None:
+            return
+        self.calender.setDateTextFormat(QDate(), QTextCharFormat())
+        bold = QTextCharFormat()
+        bold.setFontWeight(QFont.Weight.Bold)
+        first = datetime.date(year, month, 1) - datetime.timedelta(days=7)
+        last = first + datetime.timedelta(days=7 * 7) # The calendar shows six weeks
+        for day in self.schedule.days_with_calls(first, last):
+            self.calender.setDateTextFormat(QDate(day), bold)
+
+    # Decode the selected date and its neighbours, so stepping a day either
+    # way does not touch the file, and drop every other decoded day
+    def _load_date(self):
+        day = self.date.toPython()
+        plan = None
+        if self.scene is not None:
+            days = [day + datetime.timedelta(days=offset) for offset in (-1, 0, 1)]
+            for neighbour in days:
+                self.scene.load(neighbour)
+            self.scene.evict(days)
+            plan = self.scene.load(day)
+        elif self.schedule is None:
+            return
+        self.day_changed.emit(day, plan)
+
+    @Slot()
+    def update_alongside(self):
+        if self.occupancy is None:
+            return
+        time = berth_gantt.seconds(self.get_time())
+        alongside = self.occupancy.at(time)
+        conflicts = sum(1 for key in alongside if self.occupancy.conflicts(key))
+        minute = time // tides.MINUTE
+        cut_off = sum(1 for key in alongside
+                      if key in self.workable and not self.workable[key][minute])
+        text = f"Alongside: {len(alongside)}"
+        if conflicts:
+            text += f" ({conflicts} in conflict)"
+        if cut_off:
+            text += f", {cut_off} out of gangway reach at this tide"
+        self.alongside_label.setText(text)
 
     def get_date(self):
         return self.calender.selectedDate()
@@ -71,61 +199,451 @@ class Timeline(QWidget):
         return  self.time_edit.time()
 
 class Scheduler(QWidget):
+    occupancy_changed = Signal()
+    workable_changed = Signal(object) # Slot -> minutes of the day its doors can be worked
+    playback_changed = Signal(object, list, list) # Playback, ships, sides
+
     def __init__(self, parent: QObject=None):
         super().__init__(parent)
         self.setObjectName("Scheduler")
         self.setSizePolicy(QSizePolicy.Policy.MinimumExpanding,
                             QSizePolicy.Policy.Preferred)
-        self.ship_arr = []
-        self._layout = QGridLayout()
-        self._group_box = QGroupBox()
-        self._group_box.setLayout(self._layout)
+        self.ship_model = None
+        self.scene = None
+        self.schedule = None
+        self.day = None
+        self.modified = False # Plan of the shown day differs from what is stored
+        self.quay = berth_solver.Quay.from_layout(port_layout.load_layout(),
+                                                  quay_geometry.load_edge())
+        try:
+            self.tides = tides.load_tides()
+        except (OSError, ValueError, KeyError):
+            self.tides = None # Door heights go unchecked
+        self.occupancy = occupancy.OccupancyIndex()
+        self.cache = solver_cache.SolverCache()
+        self._solve_thread = None
+        self._optimise_thread = None
+        self._repair_pending = set() # Slots whose window changed since the last repair
+        self._repair_timer = QTimer(self)
+        self._repair_timer.setSingleShot(True)
+        self._repair_timer.setInterval(REPAIR_DELAY)
+        self._repair_timer.timeout.connect(self._repair)
+
+        # Calls of the shown day, drawn as a Gantt chart of the berths
+        self.call_model = berth_gantt.CallModel(self.quay.registry, self)
+        self.call_model.window_changed.connect(self._window_changed)
+        self.call_model.ship_changed.connect(self._ship_changed)
+        self.call_model.bollards_changed.connect(self._bollards_changed)
+        self.gantt = berth_gantt.GanttView(self.quay, self)
+        self.gantt.setModel(self.call_model)
+        self._add_button = QPushButton("Add Call", self)
+        self._add_button.pressed.connect(self._add_call)
 
-        scroll = QScrollArea()
-        scroll.setSizePolicy(QSizePolicy.Policy.Minimum,
-                                QSizePolicy.Policy.Expanding)
-        scroll.setWidget(self._group_box)
-        scroll.setWidgetResizable(True)
+        self._solve_button = QPushButton("Solve", self)
+        self._solve_button.pressed.connect(self._solve_pressed)
+        self._optimise_button = QPushButton("Optimise", self)
+        self._optimise_button.pressed.connect(self._optimise_pressed)
+        self._repair_box = QCheckBox("Repair plan on change", self)
+        self._repair_box.setChecked(True)
+        self._status = QLabel(self)
 
         layout = QVBoxLayout(self)
-        layout.addWidget(scroll)
+        layout.addWidget(self.gantt)
+        layout.addWidget(self._add_button)
+        layout.addWidget(self._solve_button)
+        layout.addWidget(self._optimise_button)
+        layout.addWidget(self._repair_box)
+        layout.addWidget(self._status)
+
+    # Model holding the ships that can be picked in each slot
+    def set_ship_model(self, model: QAbstractItemModel):
+        self.ship_model = model
+        self.call_model.set_ship_model(model)
+
+    def set_scene(self, scene: scene_file.SceneFile):
+        self.scene = scene
+
+    def set_schedule(self, schedule: schedule_db.ScheduleDB):
+        self.schedule = schedule
+
+    # Plan of the shown day, ready to be stored in the scene
+    def day_plan(self) -> scene_file.DayPlan:
+        calls = []
+        for slot in self._filled_slots():
+            calls.append((slot.ship.id, *slot.window(), slot.berth))
+        return scene_file.DayPlan.build(self.ship_model.store, calls)
+
+    # Keep the shown day's changes before another day is shown. They always
+    # go to the local schedule, and to the scene file while one is open.
+    @Slot(object)
+    def close_day(self, day: datetime.date):
+        if self.modified:
+            plan = self.day_plan()
+            if self.scene is not None:
+                self.scene.put(day, plan)
+            if self.schedule is not None:
+                self.schedule.put_day(day, plan)
+        self.modified = False
+
+    # Replace the slots with the calls of a stored day. Without a scene file
+    # the day is read from the local schedule. Ships missing from the library
+    # are added from their copy in the plan.
+    @Slot(object, object)
+    def show_day(self, day: datetime.date, plan: scene_file.DayPlan | None):
+        self._repair_timer.stop()
+        self._repair_pending.clear()
+        self.stop_solving()
+        self.stop_optimising()
+        self.day = day
+        if plan is None and self.scene is None and self.schedule is not None:
+            plan = self.schedule.load_day(day, self.ship_model.store)
+        self.occupancy.clear()
+
+        slots = []
+        store = self.ship_model.store if self.ship_model is not None else None
+        for i in range(len(plan) if plan is not None and store is not None else 0):
+            row = plan.slots[i]
+            name = plan.names[row["ship"]]
+            ship = store.find(name)
+            if ship is None:
+                ship = self.ship_model.add_from_dict(name, plan.ship_dict(int(row["ship"])))
+            self.ship_model.fetch_ship(ship)
+            slot = berth_gantt.ShipCall(self.ship_model.ship(self.ship_model.ship_index(ship)),
+                                        int(row["arrival"]), int(row["departure"]))
+            if not np.isnan(row["start"]):
+                slot.berth = berth_solver.Berth(float(row["start"]), float(row["end"]),
+                                                int(row["side"]), plan.bollards_of(i))
+                self.occupancy.insert(slot, slot.berth.start, slot.berth.end, *slot.window())
+            slots.append(slot)
+
+        for slot in self.occupancy:
+            slot.conflicts = len(self.occupancy.conflicts(slot))
+        self.call_model.set_slots(slots)
+        self._status.setText("")
+        self.modified = False
+        self.occupancy_changed.emit()
+        self._update_workable()
+        self._publish_playback()
+
+    # Add an empty call and open the ship picker on its bar
+    @Slot()
+    def _add_call(self):
+        row = self.call_model.add_slot(berth_gantt.ShipCall())
+        index = self.call_model.index(row, berth_gantt.SHIP)
+        self.gantt.setCurrentIndex(index)
+        self.gantt.scrollTo(index)
+        self.gantt.edit(index)
 
-        self._spawn_button = QPushButton("Add Ship: ", self)
-        self._spawn_button.pressed.connect(self._spawn_timeline)
-        self._layout.addWidget(self._spawn_button, 0, 0, 1, 1)
+    # Slots that have a valid ship selected
+    def _filled_slots(self) -> list:
+        return [slot for slot in self.call_model.slots if slot.valid()]
 
     @Slot()
-    def _spawn_timeline(self):
-        pos = self._layout.indexOf(self._spawn_button)
-        button = self._layout.itemAt(pos).widget()
-        self._layout.removeWidget(button)
-        self._layout.addWidget(self.ShipSlot())
-        self._layout.addWidget(button)
-
-    class ShipSlot(QWidget):
-        def __init__(self, parent: QObject=None):
+    def _solve_pressed(self):
+        if self._solve_thread is None:
+            self.solve()
+        else:
+            portfolio.cancel()
+
+    # Search for berths on a worker thread, the plan is applied once it
+    # reports back
+    @Slot()
+    def solve(self):
+        if self._solve_thread is not None:
+            return
+        self.stop_optimising()
+        # The search places every call, edits waiting for a repair included
+        self._repair_timer.stop()
+        self._repair_pending.clear()
+        slots = self._filled_slots()
+        calls = [slot.to_call(i) for i, slot in enumerate(slots)]
+        thread = self.SolveThread(berth_solver.Problem(calls, self.quay), self.cache, self)
+        thread.progress.connect(self._solve_progress)
+        thread.solved.connect(lambda solution: self._apply_solution(thread, slots, calls,
+                                                                    solution))
+        thread.failed.connect(self._solve_failed)
+        thread.finished.connect(lambda: self._solve_finished(thread))
+        thread.finished.connect(thread.deleteLater)
+        self._solve_thread = thread
+        self._solve_button.setText("Stop")
+        self._status.setText(f"Solving {len(calls)} calls...")
+        thread.start()
+
+    # Stop a running search and drop its result
+    def stop_solving(self):
+        thread = self._solve_thread
+        if thread is None:
+            return
+        thread.solved.disconnect()
+        portfolio.cancel()
+        thread.wait()
+        self._solve_finished(thread)
+
+    # Also reached when the search raised, so the button never stays on Stop.
+    # Edits that came in while it ran are repaired now.
+    def _solve_finished(self, thread: QThread):
+        if self._solve_thread is thread:
+            self._solve_thread = None
+            self._solve_button.setText("Solve")
+            if self._repair_pending:
+                self._repair()
+
+    @Slot(str)
+    def _solve_failed(self, message: str):
+        self._status.setText(f"Solving failed: {message}")
+
+    @Slot(object, int, int)
+    def _solve_progress(self, best: berth_solver.Solution, finished: int, total: int):
+        self._status.setText(f"Searching, {finished} of {total} searches done, "
+                             f"best drops {best.dropped} calls")
+
+    # A plan from a search that was stopped is for windows or ships that have
+    # changed since, and is dropped
+    def _apply_solution(self, thread: QThread, slots: list, calls: list,
+                        solution: berth_solver.Solution):
+        if self._solve_thread is not thread:
+            return
+        self._solve_finished(thread)
+        self._set_berths(slots, calls, solution)
+        unassigned = len(solution.unassigned())
+        if unassigned:
+            self._status.setText(f"{unassigned} of {len(calls)} calls could not be berthed")
+        else:
+            self._status.setText(f"Berthed {len(calls)} calls")
+        if unassigned and not solution.optimal:
+            self._status.setText(self._status.text() + ", best plan found in time")
+
+    @Slot()
+    def _optimise_pressed(self):
+        if self._optimise_thread is None:
+            self.optimise()
+        else:
+            self.stop_optimising()
+
+    # Keep improving the current plan on a worker thread, every better plan
+    # is shown as it is found. Stopping keeps the best one.
+    @Slot()
+    def optimise(self):
+        if self._optimise_thread is not None or self._solve_thread is not None:
+            return
+        slots = self._filled_slots()
+        calls = [slot.to_call(i) for i, slot in enumerate(slots)]
+        problem = berth_solver.Problem(calls, self.quay)
+        current = None
+        if any(slot.berth is not None for slot in slots):
+            current = berth_solver.Solution.from_berths(problem, [slot.berth for slot in slots])
+        thread = self.OptimiseThread(optimiser.Optimiser(problem, current), self)
+        thread.improved.connect(lambda solution, values:
+                                self._show_improved(slots, calls, solution, values))
+        thread.finished.connect(lambda: self._optimise_finished(thread))
+        thread.finished.connect(thread.deleteLater)
+        self._optimise_thread = thread
+        self._optimise_button.setText("Stop Optimising")
+        self._status.setText(f"Optimising {len(calls)} calls...")
+        thread.start()
+
+    def stop_optimising(self):
+        thread = self._optimise_thread
+        if thread is None:
+            return
+        thread.improved.disconnect()
+        thread.optimiser.stop()
+        thread.wait()
+        self._optimise_finished(thread)
+
+    def _optimise_finished(self, thread: QThread):
+        if self._optimise_thread is thread:
+            self._optimise_thread = None
+            self._optimise_button.setText("Optimise")
+            if self._repair_pending:
+                self._repair()
+
+    def _show_improved(self, slots: list, calls: list, solution: berth_solver.Solution,
+                       values: dict):
+        self._set_berths(slots, calls, solution)
+        self._status.setText(f"Optimising: {values['dropped']} dropped, "
+                             f"gangway travel {values['gangway']:.0f} ft, "
+                             f"{values['water']} hose moves, "
+                             f"{values['bollards']} bollard changes, "
+                             f"{values['clearance']:.0f} ft short of clearance")
+
+    # Give every slot its berth in `solution` and count what it clashes with
+    def _set_berths(self, slots: list, calls: list, solution: berth_solver.Solution):
+        berths = solution.berths()
+        self.occupancy.clear()
+        for slot, call in zip(slots, calls):
+            berth = berths.get(call.name)
+            slot.berth = berth
+            slot.conflicts = 0
+            if berth is not None:
+                self.occupancy.insert(slot, berth.start, berth.end, *slot.window())
+        for slot in self.occupancy:
+            slot.conflicts = len(self.occupancy.conflicts(slot))
+        self.modified = True
+        self.call_model.refresh()
+        self.occupancy_changed.emit()
+        self._update_workable()
+        self._publish_playback()
+
+    # Check the doors of every berthed call against the tide over the shown
+    # day, on the side it lies
+    @Slot()
+    def _update_workable(self):
+        slots = [slot for slot in self._filled_slots() if slot.berth is not None]
+        workable = {}
+        if self.tides is not None and self.day is not None and slots:
+            calls = [slot.to_call(i) for i, slot in enumerate(slots)]
+            mask = tides.workable(self.tides, calls, self.quay,
+                                  schedule_db.instant(self.day, 0))
+            workable = {slot: mask[i, slot.berth.side] for i, slot in enumerate(slots)}
+        for slot in self.call_model.slots:
+            slot.workable = workable.get(slot)
+        self.call_model.refresh()
+        self.workable_changed.emit(workable)
+
+    # Mend the plan around the slots whose window changed, leaving every
+    # other berth where it is. Slots changed while a search runs stay pending
+    # until it finishes.
+    @Slot()
+    def _repair(self):
+        if self._solve_thread is not None or self._optimise_thread is not None:
+            return
+        changed, self._repair_pending = self._repair_pending, set()
+        if not self._repair_box.isChecked():
+            return
+        slots = self._filled_slots()
+        rows = np.array([i for i, slot in enumerate(slots) if slot in changed], dtype=np.int64)
+        if not len(rows):
+            return
+        calls = [slot.to_call(i) for i, slot in enumerate(slots)]
+        problem = berth_solver.Problem(calls, self.quay)
+        current = berth_solver.Solution.from_berths(problem, [slot.berth for slot in slots])
+        solution = berth_solver.repair(problem, current, rows)
+        if solution is current:
+            return
+
+        self._set_berths(slots, calls, solution)
+        kept = current.assigned & solution.assigned
+        moved = int((kept & ((solution.starts != current.starts) |
+                             (solution.sides != current.sides))).sum())
+        berthed = int((~current.assigned & solution.assigned).sum())
+        lost = int((current.assigned & ~solution.assigned).sum())
+        self._status.setText(f"Repaired plan: {moved} moved, {berthed} berthed, "
+                             f"{lost} could not be berthed")
+
+    # A call got another ship. Its berth was sized for the old hull, so it is
+    # dropped and the call queued for a repair, the same as a moved window.
+    @Slot(object)
+    def _ship_changed(self, slot):
+        self.stop_solving()
+        self.stop_optimising()
+        self.modified = True
+        self._repair_pending.add(slot)
+        self._repair_timer.start()
+        if slot in self.occupancy:
+            before = self.occupancy.conflicts(slot)
+            self.occupancy.discard(slot)
+            for other in before:
+                other.conflicts = len(self.occupancy.conflicts(other))
+        slot.berth = None
+        slot.conflicts = 0
+        self.call_model.refresh()
+        self.occupancy_changed.emit()
+        self._update_workable()
+        self._publish_playback()
+
+    # Bollards only change what a berth is made fast to, not where it lies
+    @Slot(object)
+    def _bollards_changed(self, slot):
+        self.stop_optimising()
+        self.modified = True
+
+    # A bollard clicked on the map is made fast to, or let go from, the
+    # berth of the selected call. `bollard` is a row of the bollard registry.
+    @Slot(int)
+    def toggle_bollard(self, bollard: int):
+        index = self.gantt.currentIndex()
+        if index.isValid() and self.call_model.slots[index.row()].berth is not None:
+            self.call_model.toggle_bollard(index.row(), bollard)
+
+    # Move a berthed slot to its new time window and flag what it now clashes with
+    @Slot(object)
+    def _window_changed(self, slot):
+        self.stop_solving()
+        self.stop_optimising()
+        self.modified = True
+        self._repair_pending.add(slot)
+        self._repair_timer.start()
+        if slot not in self.occupancy:
+            return
+        before = self.occupancy.conflicts(slot)
+        c0, c1, _, _ = self.occupancy.get(slot)
+        self.occupancy.move(slot, c0, c1, *slot.window())
+        after = self.occupancy.conflicts(slot)
+        for other in set(before) | set(after) | {slot}:
+            other.conflicts = len(self.occupancy.conflicts(other))
+        self.call_model.refresh()
+        self.occupancy_changed.emit()
+        self._publish_playback()
+
+    # Keyframes of every berthed slot. Only rebuilt when the plan changes,
+    # never per time step. A call holds a single berth, so each one gets a
+    # single segment and plays back arriving, alongside and departing only,
+    # playback.SHIFTING needs a call with several berths.
+    def _publish_playback(self):
+        slots = [slot for slot in self.call_model.slots if slot in self.occupancy]
+        segments = []
+        for slot in slots:
+            c0, _, t0, t1 = self.occupancy.get(slot)
+            segments.append([(t0, t1, c0)])
+        self.playback_changed.emit(playback.Playback(segments, slots),
+                                   [slot.ship for slot in slots],
+                                   [slot.berth.side for slot in slots])
+
+    # Runs a portfolio search off the GUI thread. Problems solved before come
+    # straight from the cache, similar ones start from a cached plan.
+    class SolveThread(QThread):
+        progress = Signal(object, int, int) # Best solution, searches finished, total
+        solved = Signal(object)
+        failed = Signal(str)
+
+        def __init__(self, problem: berth_solver.Problem, cache: solver_cache.SolverCache,
+                     parent: QObject=None):
+            super().__init__(parent)
+            self.problem = problem
+            self.cache = cache
+
+        @typing.override
+        def run(self):
+            try:
+                solution = self._solve()
+            except (OSError, BrokenProcessPool) as error:
+                self.failed.emit(str(error) or type(error).__name__)
+                return
+            self.solved.emit(solution)
+
+        def _solve(self) -> berth_solver.Solution:
+            solution = self.cache.get(self.problem)
+            if solution is None:
+                solution = self.cache.warm_start(self.problem)
+                if solution is None or not solution.feasible:
+                    searched = portfolio.solve(self.problem, progress=self.progress.emit)
+                    if solution is None or searched.dropped <= solution.dropped:
+                        solution = searched
+                try:
+                    self.cache.put(self.problem, solution)
+                except OSError:
+                    pass # Only a lost speed up
+            return solution
+
+    # Runs an anytime optimiser off the GUI thread until it is stopped
+    class OptimiseThread(QThread):
+        improved = Signal(object, object) # Solution, its optimiser.evaluate values
+
+        def __init__(self, optimiser: optimiser.Optimiser, parent: QObject=None):
             super().__init__(parent)
-            self.left_bound = QTimeEdit(self)
-            self.right_bound = QTimeEdit(self)
-            self.ship_select = self.ShipSelect(self)
-            self.bollard_select = self.BollardSelect(self)
-
-            layout = QGridLayout(self)
-            layout.addWidget(self.left_bound, 0, 0, 1, 1)
-            layout.addWidget(self.right_bound, 0, 1, 1, 1)
-            layout.addWidget(self.ship_select, 2, 0, 1, 1)
-            layout.addWidget(self.bollard_select, 2, 1, 1, 1)
-
-        class ShipSelect(QListView):
-            def __init__(self, parent: QObject):
-                super().__init__(parent)
-                self.setSelectionMode(self.SelectionMode.SingleSelection)
-
-        class BollardSelect(QListView):
-            def __init__(self, parent: QObject):
-                super().__init__(parent)
-                self.setSelectionMode(self.SelectionMode.MultiSelection)
-
-            @Slot()
-            def add_bollard(bollard):
-                print(bollard)
\ No newline at end of file
+            self.optimiser = optimiser
+
+        @typing.override
+        def run(self):
+            self.optimiser.run(improved=self.improved.emit)
\ No newline at end of file
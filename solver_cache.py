@@ -0,0 +1,182 @@
+import os
+import glob
+import zipfile
+import hashlib
+import collections
+import numpy as np
+
+import berth_solver
+
+# On-disk cache of solved berth problems. A problem is reduced to a stable
+# key: the quay (length, bollards, gangways, water trees, edge, position
+# step, clearance) and every call's length, width, doors and time window, in a
+# canonical order so the order of the slots and the names of the ships do
+# not matter. Ship attributes that only affect drawing are left out, they
+# cannot change a plan.
+#
+# Every entry is one .npz file named <quay key>-<problem key>.npz, holding
+# the plan in canonical call order. Files are touched on use and the least
+# recently used ones are deleted once the cache grows past its budget.
+#
+# Only plans proven optimal are handed back as they are. A plan from a search
+# that was stopped or ran out of time is kept, but only to warm start the next
+# search, so solving again can still find a better one.
+#
+# A problem that misses can still warm start from the most similar recent
+# entry on the same quay: calls that match keep their cached berth and the
+# rest are placed by berth_solver.repair.
+#
+# Headless, nothing in here may import Qt.
+
+CACHE_PATH = os.path.join(os.getcwd(), "solver_cache")
+CACHE_BUDGET = 64 * 1024 * 1024 # Bytes
+VERSION = 2 # Bump when the solver changes what a plan means
+NEAR_CANDIDATES = 32 # Recent entries compared for a warm start
+NEAR_SHARE = 0.5 # Share of the calls that must match for a warm start
+
+# Digest of every call, from what the solver looks at
+def call_digests(problem: berth_solver.Problem) -> np.ndarray:
+    digests = np.zeros(len(problem.calls), dtype=np.uint64)
+    for i, call in enumerate(problem.calls):
+        doors = call.doors[np.lexsort(call.doors.T[::-1])]
+        data = np.concatenate(([call.length, call.width, call.arrival, call.departure],
+                               doors.ravel())).astype(np.float64)
+        digests[i] = int.from_bytes(hashlib.blake2b(data.tobytes(), digest_size=8).digest(),
+                                    "little")
+    return digests
+
+def quay_key(problem: berth_solver.Problem) -> str:
+    quay = problem.quay
+    gangways, trees = quay.gangways, quay.water_trees
+    edge = quay.edge.points.ravel() if quay.edge is not None else np.zeros(0)
+    data = np.concatenate(([VERSION, quay.length, problem.step, problem.clearance,
+                            len(quay.bollards), len(gangways), len(trees), len(edge)],
+                           quay.bollards, gangways.chainage, gangways.reach, gangways.min_width,
+                           trees.chainage, trees.reach, edge)).astype(np.float64)
+    return hashlib.blake2b(data.tobytes(), digest_size=8).hexdigest()
+
+# Key of a problem, and the canonical order of its calls
+def problem_key(problem: berth_solver.Problem) -> tuple[str, np.ndarray]:
+    digests = call_digests(problem)
+    order = np.argsort(digests, kind="stable")
+    data = quay_key(problem).encode() + digests[order].tobytes()
+    return hashlib.sha256(data).hexdigest(), order
+
+class SolverCache:
+    def __init__(self, path: str = CACHE_PATH, budget: int = CACHE_BUDGET):
+        self.path = path
+        self.budget = budget
+        os.makedirs(path, exist_ok=True)
+
+    def _file(self, problem: berth_solver.Problem, key: str) -> str:
+        return os.path.join(self.path, f"{quay_key(problem)}-{key}.npz")
+
+    @staticmethod
+    def _read(file: str) -> dict | None:
+        try:
+            with np.load(file) as entry:
+                return {name: entry[name] for name in entry.files}
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+            return None
+
+    # Cached optimal plan of exactly this problem, or None
+    def get(self, problem: berth_solver.Problem) -> berth_solver.Solution | None:
+        key, order = problem_key(problem)
+        file = self._file(problem, key)
+        entry = self._read(file)
+        if entry is None or not bool(entry["optimal"]):
+            return None
+        try:
+            os.utime(file)
+        except OSError:
+            pass
+
+        n = len(problem.calls)
+        starts = np.full(n, np.nan)
+        sides = np.full(n, berth_solver.FREE, dtype=np.int64)
+        starts[order] = entry["starts"]
+        sides[order] = entry["sides"]
+        bollards = [berth_solver.NO_BOLLARDS] * n
+        pieces = np.split(entry["bollards"], np.cumsum(entry["counts"])[:-1])
+        for row, piece in zip(order.tolist(), pieces):
+            bollards[row] = piece
+        return berth_solver.Solution(problem, starts, sides, bollards, 0,
+                                     bool(entry["optimal"]))
+
+    def put(self, problem: berth_solver.Problem, solution: berth_solver.Solution):
+        key, order = problem_key(problem)
+        file = self._file(problem, key)
+        temp = f"{file}.tmp"
+        bollards = [np.asarray(solution.bollards[row], np.int64) for row in order.tolist()]
+        with open(temp, "wb") as out:
+            np.savez(out, digests=call_digests(problem)[order], starts=solution.starts[order],
+                     sides=solution.sides[order],
+                     bollards=np.concatenate(bollards) if bollards else np.zeros(0, np.int64),
+                     counts=np.array([len(b) for b in bollards], np.int64),
+                     optimal=solution.optimal)
+        os.replace(temp, file)
+        self._evict()
+
+    # Delete the least recently used entries until the cache fits its budget
+    def _evict(self):
+        files = []
+        for file in glob.glob(os.path.join(self.path, "*.npz")):
+            try:
+                stat = os.stat(file)
+            except OSError:
+                continue
+            files.append((stat.st_mtime_ns, stat.st_size, file))
+        files.sort()
+        size = sum(entry[1] for entry in files)
+        for _, file_size, file in files:
+            if size <= self.budget:
+                break
+            try:
+                os.remove(file)
+            except OSError:
+                continue
+            size -= file_size
+
+    # Plan of a problem with the berths of the most similar recent entry on
+    # the same quay, the calls it has no berth for are placed by a repair.
+    # None if no entry shares enough calls.
+    def warm_start(self, problem: berth_solver.Problem) -> berth_solver.Solution | None:
+        digests = call_digests(problem)
+        pattern = os.path.join(self.path, f"{quay_key(problem)}-*.npz")
+        files = sorted(glob.glob(pattern), key=lambda file: os.stat(file).st_mtime_ns
+                       if os.path.exists(file) else 0, reverse=True)[:NEAR_CANDIDATES]
+
+        wanted = collections.Counter(digests.tolist())
+        best, best_shared = None, 0
+        for file in files:
+            entry = self._read(file)
+            if entry is None:
+                continue
+            shared = sum((wanted & collections.Counter(entry["digests"].tolist())).values())
+            if shared > best_shared:
+                best, best_shared = entry, shared
+        if best is None or best_shared < NEAR_SHARE * len(problem.calls):
+            return None
+
+        # Hand out the cached berths to matching calls
+        pieces = np.split(best["bollards"], np.cumsum(best["counts"])[:-1])
+        cached = collections.defaultdict(list)
+        for i, digest in enumerate(best["digests"].tolist()):
+            cached[digest].append(i)
+        berths = []
+        for call, digest in zip(problem.calls, digests.tolist()):
+            rows = cached.get(digest)
+            i = rows.pop() if rows else None
+            if i is None or best["sides"][i] < 0:
+                berths.append(None)
+                continue
+            start = float(best["starts"][i])
+            berths.append(berth_solver.Berth(start, start + call.length, int(best["sides"][i]),
+                                             problem.quay.bollards[pieces[i]]))
+        warm = berth_solver.Solution.from_berths(problem, berths)
+
+        # A repair is only optimal with the cached berths held in place. A plan
+        # that berths every call cannot be beaten, anything less is unproven.
+        solution = berth_solver.repair(problem, warm, np.flatnonzero(~warm.assigned))
+        solution.optimal = solution.feasible
+        return solution
@@ -0,0 +1,21 @@
+import numpy as np
+
+import berth_solver
+from test_repair import HOUR, make_call
+
+def test_capacity_bound_proves_a_drop():
+    # Three 1000 ft hulls with clearance between them do not fit on the quay
+    calls = [make_call(f"c{i}", 1000.0, 8 * HOUR, 17 * HOUR) for i in range(3)]
+    solution = berth_solver.solve(calls)
+    assert solution.dropped == 1
+    assert solution.optimal
+    assert solution.nodes < berth_solver.MAX_NODES // 10
+    assert not solution.clashes().any()
+
+def test_identical_calls_are_all_berthed():
+    calls = [make_call(f"c{i}", 600.0, 8 * HOUR, 17 * HOUR) for i in range(4)]
+    solution = berth_solver.solve(calls)
+    assert solution.feasible
+    assert solution.optimal
+    assert not solution.clashes().any()
+    assert len(np.unique(solution.starts)) == 4
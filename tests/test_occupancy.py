@@ -0,0 +1,57 @@
+import random
+
+from occupancy import OccupancyIndex
+
+# Entries overlapping a rectangle, found by testing every entry
+def linear_overlaps(entries: dict, c0: float, c1: float, t0: float, t1: float,
+                    exclude=None) -> list:
+    return [key for key, (e0, e1, s0, s1) in entries.items()
+            if e0 < c1 and e1 > c0 and s0 < t1 and s1 > t0 and key != exclude]
+
+def random_entry(rng: random.Random) -> tuple:
+    c0 = rng.uniform(0, 2800)
+    t0 = rng.randrange(0, 86400, 600)
+    return c0, c0 + rng.uniform(100, 1200), t0, t0 + rng.randrange(600, 36000, 600)
+
+def test_overlaps_match_linear_scan():
+    rng = random.Random(2)
+    index = OccupancyIndex()
+    entries = {}
+    for key in range(300):
+        entries[key] = random_entry(rng)
+        index.insert(key, *entries[key])
+
+    for step in range(400):
+        key = rng.randrange(400)
+        action = rng.random()
+        if action < 0.3 and key in entries:
+            index.remove(key)
+            del entries[key]
+        elif action < 0.6:
+            entries[key] = random_entry(rng)
+            index.move(key, *entries[key])
+
+        query = random_entry(rng)
+        assert sorted(index.overlaps(*query)) == sorted(linear_overlaps(entries, *query))
+        if key in entries:
+            assert sorted(index.conflicts(key)) == sorted(
+                linear_overlaps(entries, *entries[key], exclude=key))
+    assert len(index) == len(entries)
+
+def test_touching_entries_do_not_overlap():
+    index = OccupancyIndex()
+    index.insert("a", 0, 100, 0, 3600)
+    assert index.is_free(100, 200, 0, 3600)
+    assert index.is_free(0, 100, 3600, 7200)
+    assert not index.is_free(99, 200, 3599, 7200)
+
+def test_at_lists_entries_alongside():
+    index = OccupancyIndex()
+    index.insert("a", 0, 100, 0, 3600)
+    index.insert("b", 500, 900, 1800, 7200)
+    index.insert("c", 1000, 1500, 7200, 9000)
+    assert sorted(index.at(2000)) == ["a", "b"]
+    assert index.at(7200) == ["c"]
+    index.discard("b")
+    index.discard("b")
+    assert index.at(2000) == ["a"]
@@ -0,0 +1,60 @@
+import numpy as np
+
+import berth_solver
+
+HOUR = 3600
+
+def make_call(name: str, length: float, arrival: int, departure: int) -> berth_solver.Call:
+    doors = np.zeros((1, len(berth_solver.DOOR_FIELDS)))
+    doors[0, berth_solver.DOOR_SIDE] = berth_solver.BOTH
+    doors[0, berth_solver.DOOR_BOW] = length / 2
+    doors[0, berth_solver.DOOR_WIDTH] = 12.0
+    doors[0, berth_solver.DOOR_SILL] = 15.0
+    return berth_solver.Call(name, length, 110.0, doors, arrival, departure)
+
+# Three ships alongside together and one that arrives after they left
+def make_calls() -> list[berth_solver.Call]:
+    return [make_call("a", 800.0, 7 * HOUR, 16 * HOUR),
+            make_call("b", 700.0, 8 * HOUR, 17 * HOUR),
+            make_call("c", 600.0, 9 * HOUR, 15 * HOUR),
+            make_call("d", 900.0, 18 * HOUR, 23 * HOUR)]
+
+def berths_of(solution: berth_solver.Solution) -> list:
+    berths = solution.berths()
+    return [berths.get(call.name) for call in solution.problem.calls]
+
+def test_nothing_to_repair():
+    problem = berth_solver.Problem(make_calls())
+    solution = berth_solver.Solver(problem).solve()
+    assert solution.feasible
+    assert berth_solver.repair(problem, solution, np.array([0])) is solution
+
+def test_clash_is_repaired_locally():
+    problem = berth_solver.Problem(make_calls())
+    berths = berths_of(berth_solver.Solver(problem).solve())
+
+    # Move c onto a's berth, as a drag in the planner would
+    a, c = berths[0], berths[2]
+    berths[2] = berth_solver.Berth(a.start, a.start + 600.0, c.side, a.bollards)
+    current = berth_solver.Solution.from_berths(problem, berths)
+    assert current.clashes()[[0, 2]].all()
+
+    repaired = berth_solver.repair(problem, current, np.array([2]))
+    assert repaired.feasible
+    assert not repaired.clashes().any()
+    # d is alongside alone and never part of the repair
+    assert repaired.starts[3] == current.starts[3]
+
+def test_unberthed_call_is_placed_around_the_others():
+    calls = make_calls()
+    problem = berth_solver.Problem(calls)
+    berths = berths_of(berth_solver.Solver(problem).solve())
+    berths[1] = None
+    current = berth_solver.Solution.from_berths(problem, berths)
+
+    repaired = berth_solver.repair(problem, current, np.array([1]))
+    assert repaired.feasible
+    assert not repaired.clashes().any()
+    kept = np.array([0, 2, 3])
+    assert np.array_equal(repaired.starts[kept], current.starts[kept])
+    assert np.array_equal(repaired.sides[kept], current.sides[kept])
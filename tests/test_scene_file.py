@@ -0,0 +1,100 @@
+import os
+import datetime
+import numpy as np
+import pytest
+
+import berth_solver
+import fleet_store
+import scene_file
+
+DAY = datetime.date(2026, 5, 1)
+
+def make_store() -> fleet_store.FleetStore:
+    store = fleet_store.FleetStore()
+    door = {"side": berth_solver.BOTH, "bow_distance": 300.0, "stern_distance": 600.0,
+            "width": 12.0, "height": 8.0, "height_above_waterline": 15.0}
+    store.add_from_dict("Aurora", {"length": 900.0, "pattern": 0, "color": 0xff0000,
+                                   "width": 110.0, "Forward": door})
+    store.add_from_dict("Borealis", {"length": 1100.0, "pattern": 1, "color": 0x00ff00,
+                                     "width": 130.0, "Aft": dict(door, side=berth_solver.PORT)})
+    return store
+
+def make_plan(store, offset: float = 0.0) -> scene_file.DayPlan:
+    berth = berth_solver.Berth(100.0 + offset, 1000.0 + offset, berth_solver.STARBOARD,
+                               np.array([60.0, 120.0, 960.0, 1020.0]) + offset)
+    return scene_file.DayPlan.build(store, [(0, 7 * 3600, 17 * 3600, berth),
+                                            (1, 8 * 3600, 18 * 3600, None)])
+
+def assert_same_plan(a: scene_file.DayPlan, b: scene_file.DayPlan):
+    assert a.names == b.names
+    assert a.door_names == b.door_names
+    assert a.ships.tobytes() == b.ships.tobytes()
+    assert a.doors.tobytes() == b.doors.tobytes()
+    assert a.slots.tobytes() == b.slots.tobytes()
+    assert np.array_equal(a.bollards, b.bollards)
+
+def test_round_trip(tmp_path):
+    store = make_store()
+    path = str(tmp_path / "season.scene")
+    scene = scene_file.SceneFile(path)
+    plans = {DAY + datetime.timedelta(days=i): make_plan(store, 10.0 * i) for i in range(3)}
+    for day, plan in plans.items():
+        scene.put(day, plan)
+    scene.save()
+
+    reopened = scene_file.SceneFile(path)
+    assert reopened.days() == sorted(plans)
+    for day, plan in plans.items():
+        assert_same_plan(reopened.load(day), plan)
+    assert reopened.load(DAY - datetime.timedelta(days=1)) is None
+
+    plan = reopened.load(DAY)
+    assert plan.ship_dict(0)["Forward"]["bow_distance"] == 300.0
+    assert plan.bollards_of(0).tolist() == [60.0, 120.0, 960.0, 1020.0]
+    assert len(plan.bollards_of(1)) == 0
+    assert np.isnan(plan.slots["start"][1])
+
+def test_append_then_compact(tmp_path):
+    store = make_store()
+    path = str(tmp_path / "season.scene")
+    scene = scene_file.SceneFile(path)
+    for i in range(4):
+        scene.put(DAY + datetime.timedelta(days=i), make_plan(store))
+    scene.save()
+    size = os.path.getsize(path)
+
+    # Replacing a day appends its chunk and leaves the old one behind
+    changed = make_plan(store, 50.0)
+    scene.put(DAY, changed)
+    scene.remove(DAY + datetime.timedelta(days=3))
+    assert scene.modified
+    scene.save()
+    assert not scene.modified
+    assert os.path.getsize(path) > size
+
+    scene.compact()
+    assert os.path.getsize(path) == scene._live_size() < size
+    reopened = scene_file.SceneFile(path)
+    assert reopened.days() == [DAY + datetime.timedelta(days=i) for i in range(3)]
+    assert_same_plan(reopened.load(DAY), changed)
+    assert_same_plan(reopened.load(DAY + datetime.timedelta(days=2)), make_plan(store))
+
+def test_newer_version_is_refused(tmp_path):
+    path = str(tmp_path / "season.scene")
+    scene = scene_file.SceneFile(path)
+    scene.put(DAY, make_plan(make_store()))
+    scene.save()
+    with open(path, "r+b") as file:
+        magic, version, offset, length = scene_file.HEADER.unpack(
+            file.read(scene_file.HEADER.size))
+        file.seek(0)
+        file.write(scene_file.HEADER.pack(magic, scene_file.VERSION + 1, offset, length))
+
+    with pytest.raises(scene_file.SceneError, match="newer version"):
+        scene_file.SceneFile(path)
+
+def test_other_files_are_refused(tmp_path):
+    path = tmp_path / "notes.scene"
+    path.write_bytes(b"not a scene file at all, just some text")
+    with pytest.raises(scene_file.SceneError, match="not a scene file"):
+        scene_file.SceneFile(str(path))
@@ -0,0 +1,90 @@
+import datetime
+import numpy as np
+import pytest
+
+import berth_solver
+import fleet_store
+import scene_file
+import schedule_db
+from schedule_db import SECONDS_IN_DAY, instant
+
+DAY = datetime.date(2026, 5, 1)
+
+@pytest.fixture
+def store() -> fleet_store.FleetStore:
+    store = fleet_store.FleetStore()
+    door = {"side": berth_solver.BOTH, "bow_distance": 300.0, "stern_distance": 600.0,
+            "width": 12.0, "height": 8.0, "height_above_waterline": 15.0}
+    for name, length in (("Aurora", 900.0), ("Borealis", 1100.0)):
+        store.add_from_dict(name, {"length": length, "pattern": 0, "color": 0,
+                                   "width": 110.0, "Forward": door})
+    return store
+
+@pytest.fixture
+def db(tmp_path):
+    db = schedule_db.ScheduleDB(str(tmp_path / "schedule.db"))
+    yield db
+    db.close()
+
+def berth(start: float, length: float) -> berth_solver.Berth:
+    return berth_solver.Berth(start, start + length, berth_solver.PORT,
+                              np.array([start - 60.0, start + length + 60.0]))
+
+# Aurora from 07:00 to 17:00 at 100 ft, Borealis from 20:00 to 06:00 the
+# next morning at 1500 ft
+def two_calls(store) -> scene_file.DayPlan:
+    return scene_file.DayPlan.build(store, [
+        (0, 7 * 3600, 17 * 3600, berth(100.0, 900.0)),
+        (1, 20 * 3600, SECONDS_IN_DAY + 6 * 3600, berth(1500.0, 1100.0))])
+
+def test_put_and_load_day(db, store):
+    plan = two_calls(store)
+    db.put_day(DAY, plan)
+    calls = db.calls_on(DAY)
+    assert [call.ship for call in calls] == ["Aurora", "Borealis"]
+    assert calls[1].departure == instant(DAY + datetime.timedelta(days=1), 6 * 3600)
+    assert calls[0].berth.bollards.tolist() == [40.0, 1060.0]
+
+    loaded = db.load_day(DAY, store)
+    assert loaded.names == plan.names
+    assert loaded.slots.tobytes() == plan.slots.tobytes()
+    assert np.array_equal(loaded.bollards, plan.bollards)
+    assert db.load_day(DAY + datetime.timedelta(days=1), store) is None
+
+def test_put_day_replaces_the_day(db, store):
+    db.put_day(DAY, two_calls(store))
+    db.put_day(DAY, scene_file.DayPlan.build(store, [(1, 9 * 3600, 12 * 3600, None)]))
+    calls = db.calls_on(DAY)
+    assert [call.ship for call in calls] == ["Borealis"]
+    assert calls[0].berth is None
+    db.remove_day(DAY)
+    assert db.calls_on(DAY) == []
+
+def test_overlapping_finds_calls_past_midnight(db, store):
+    db.put_day(DAY, two_calls(store))
+    next_day = DAY + datetime.timedelta(days=1)
+    early = [call.ship for call in db.overlapping(instant(next_day, 0), instant(next_day, 3600))]
+    assert early == ["Borealis"]
+    assert db.overlapping(instant(next_day, 6 * 3600), instant(next_day, 7 * 3600)) == []
+
+    midday = (instant(DAY, 12 * 3600), instant(DAY, 22 * 3600))
+    assert len(db.overlapping(*midday)) == 2
+    assert [call.ship for call in db.overlapping(*midday, 0.0, 1000.0)] == ["Aurora"]
+    assert [call.ship for call in db.overlapping(*midday, 1000.0, 1500.0)] == []
+
+def test_ship_calls_and_days(db, store):
+    for i in (0, 2, 5):
+        db.put_day(DAY + datetime.timedelta(days=i), two_calls(store))
+    last = DAY + datetime.timedelta(days=4)
+    assert [call.day for call in db.ship_calls("Aurora", DAY, last)] == [
+        DAY, DAY + datetime.timedelta(days=2)]
+    assert db.days_with_calls(DAY + datetime.timedelta(days=1), last) == [
+        DAY + datetime.timedelta(days=2)]
+
+def test_long_call_rolls_back(db, store):
+    db.put_day(DAY, two_calls(store))
+    too_long = scene_file.DayPlan.build(
+        store, [(0, 0, (schedule_db.MAX_STAY_DAYS + 1) * SECONDS_IN_DAY, None)])
+    with pytest.raises(ValueError):
+        db.put_day(DAY, too_long)
+    assert len(db.calls_on(DAY)) == 2
@@ -0,0 +1,110 @@
+import os
+import time
+import threading
+import numpy as np
+import pytest
+
+pytest.importorskip("PySide6")
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide6.QtCore import QTime
+from PySide6.QtTest import QTest
+from PySide6.QtWidgets import QApplication
+
+import berth_gantt
+import berth_solver
+import fleet_store
+import portfolio
+import ship_planner
+import solver_cache
+
+HOUR = 3600
+
+# The parts of ship_editor.Ship a call needs
+class FakeShip:
+    def __init__(self, store: fleet_store.FleetStore, ship: int):
+        self.store = store
+        self.id = ship
+
+    def text(self) -> str:
+        return self.store.names[self.id]
+
+    def is_valid(self) -> bool:
+        return self.store.is_valid(self.id)
+
+@pytest.fixture(scope="module")
+def app():
+    return QApplication.instance() or QApplication([])
+
+@pytest.fixture
+def ship() -> FakeShip:
+    store = fleet_store.FleetStore()
+    door = {"side": berth_solver.BOTH, "bow_distance": 450.0, "stern_distance": 450.0,
+            "width": 12.0, "height": 8.0, "height_above_waterline": 15.0}
+    ship = store.add_from_dict("Aurora", {"length": 900.0, "pattern": 0, "color": 0,
+                                          "width": 110.0, "Forward": door})
+    return FakeShip(store, ship)
+
+# Scheduler with two calls one after the other on the same berth
+@pytest.fixture
+def scheduler(app, ship, tmp_path) -> ship_planner.Scheduler:
+    scheduler = ship_planner.Scheduler()
+    scheduler.cache = solver_cache.SolverCache(str(tmp_path))
+    first = berth_gantt.ShipCall(ship, 7 * HOUR, 12 * HOUR)
+    second = berth_gantt.ShipCall(ship, 13 * HOUR, 18 * HOUR)
+    scheduler.call_model.set_slots([first, second])
+    call = first.to_call(0)
+    berth = berth_solver.solve([call], scheduler.quay).berths()[call.name]
+    for slot in (first, second):
+        slot.berth = berth_solver.Berth(berth.start, berth.end, berth.side, berth.bollards)
+        scheduler.occupancy.insert(slot, berth.start, berth.end, *slot.window())
+    return scheduler
+
+# Move the second call's arrival into the first call's stay
+def edit_window(scheduler: ship_planner.Scheduler):
+    index = scheduler.call_model.index(1, berth_gantt.ARRIVAL)
+    assert scheduler.call_model.setData(index, QTime(10, 0))
+
+def assert_no_clashes(scheduler: ship_planner.Scheduler):
+    assert not scheduler._repair_pending
+    slots = scheduler._filled_slots()
+    calls = [slot.to_call(i) for i, slot in enumerate(slots)]
+    problem = berth_solver.Problem(calls, scheduler.quay)
+    plan = berth_solver.Solution.from_berths(problem, [slot.berth for slot in slots])
+    assert plan.feasible
+    assert not plan.clashes().any()
+    assert all(not scheduler.occupancy.conflicts(slot) for slot in slots)
+    assert [slot.conflicts for slot in slots] == [0, 0]
+    assert np.array_equal(scheduler.occupancy.get(slots[1])[2:], (10 * HOUR, 18 * HOUR))
+
+def test_window_edited_during_solve_is_repaired(scheduler, monkeypatch):
+    # A search that runs until it is stopped, then hands back a plan for
+    # the windows it was started with
+    cancelled = threading.Event()
+    monkeypatch.setattr(portfolio, "cancel", cancelled.set)
+    class SolveThread(ship_planner.Scheduler.SolveThread):
+        def _solve(self) -> berth_solver.Solution:
+            cancelled.wait(5)
+            return berth_solver.Solver(self.problem).solve()
+    scheduler.SolveThread = SolveThread
+
+    scheduler.solve()
+    edit_window(scheduler)
+    QTest.qWait(ship_planner.REPAIR_DELAY * 3)
+    assert scheduler._solve_thread is None
+    assert_no_clashes(scheduler)
+
+def test_repair_waits_for_optimiser(scheduler):
+    # An optimiser that finds nothing better until it is stopped
+    class OptimiseThread(ship_planner.Scheduler.OptimiseThread):
+        def run(self):
+            while not self.optimiser._stopped:
+                time.sleep(0.01)
+    scheduler.OptimiseThread = OptimiseThread
+
+    edit_window(scheduler)
+    scheduler.optimise()
+    QTest.qWait(ship_planner.REPAIR_DELAY * 2)
+    assert scheduler._repair_pending
+    scheduler.stop_optimising()
+    assert_no_clashes(scheduler)
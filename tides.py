@@ -0,0 +1,102 @@
+import os
+import csv
+import datetime
+import functools
+import numpy as np
+
+import berth_solver
+from schedule_db import instant
+
+# Tide at the quay, and when ships can work their doors from the gangways
+# because of it. The tide table lists predicted high and low waters, between
+# two of them the level follows half a cosine, the way tide tables are read
+# by hand.
+#
+# A ship floats, so a door's sill stands at the water level plus its height
+# above the waterline. A gangway lands on it while the sill is within the
+# gangway's min_sill to max_sill of the apron. workable checks every door of
+# every call against every gangway at every minute of a day in one pass.
+#
+# Times are absolute seconds, see schedule_db.instant, and heights are feet
+# above chart datum.
+#
+# Headless, nothing in here may import Qt.
+
+TIDE_PATH = os.path.join(os.getcwd(), "geometry", "tide_table.csv")
+MINUTE = 60
+MINUTES_IN_DAY = 24 * 60
+
+# High and low waters sorted by time
+class TideTable:
+    def __init__(self, times, heights):
+        order = np.argsort(np.asarray(times, dtype=np.int64), kind="stable")
+        self.times = np.asarray(times, dtype=np.int64)[order]
+        self.heights = np.asarray(heights, dtype=np.float64)[order]
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    # Water level at every time, NaN outside the table
+    def level(self, times) -> np.ndarray:
+        times = np.asarray(times, dtype=np.int64)
+        if len(self) < 2:
+            return np.full(times.shape, np.nan)
+        i = np.searchsorted(self.times, times, side="right") - 1
+        inside = (i >= 0) & (i < len(self) - 1)
+        i = i.clip(0, len(self) - 2)
+        h0, h1 = self.heights[i], self.heights[i + 1]
+        phase = (times - self.times[i]) / (self.times[i + 1] - self.times[i])
+        return np.where(inside, h0 + (h1 - h0) * (1 - np.cos(np.pi * phase)) / 2, np.nan)
+
+# Read a table of "time,height" rows, ISO local times. Lines starting with #
+# are comments.
+@functools.cache
+def load_tides(path: str = TIDE_PATH) -> TideTable:
+    times, heights = [], []
+    with open(path, newline="") as file:
+        for row in csv.DictReader(line for line in file if not line.startswith("#")):
+            when = datetime.datetime.fromisoformat(row["time"])
+            times.append(instant(when.date(), when.hour * 3600 + when.minute * 60 + when.second))
+            heights.append(float(row["height"]))
+    return TideTable(times, heights)
+
+# Per call, side and minute from t0, True while a door of the call on that
+# side has its sill within reach of a gangway it is wide enough for. Minutes
+# the tide table does not cover count as workable. Shape (calls, 2, minutes).
+def workable(tides: TideTable, calls: list[berth_solver.Call], quay: berth_solver.Quay,
+             t0: int, minutes: int = MINUTES_IN_DAY) -> np.ndarray:
+    mask = np.zeros((len(calls), len(berth_solver.SIDES), minutes), dtype=bool)
+    counts = np.array([len(call.doors) for call in calls], dtype=np.int64)
+    if not counts.sum():
+        return mask
+    doors = np.concatenate([call.doors for call in calls])
+    level = tides.level(t0 + MINUTE * np.arange(minutes))
+
+    # Sill of every door against the apron at every minute, (doors, minutes)
+    rise = level + doors[:, berth_solver.DOOR_SILL, None] - quay.apron_height
+    gangways = quay.gangways
+    if len(gangways):
+        fits = doors[:, berth_solver.DOOR_WIDTH, None] >= gangways.min_width
+        reached = ((rise[:, None, :] >= gangways.min_sill[:, None]) &
+                   (rise[:, None, :] <= gangways.max_sill[:, None]) &
+                   fits[:, :, None]).any(axis=1)
+    else:
+        reached = np.ones(rise.shape, dtype=bool)
+    reached |= np.isnan(level)
+
+    # Doors are grouped by call, a running count of reached doors tells
+    # which calls have one
+    ends = np.cumsum(counts)
+    door_side = doors[:, berth_solver.DOOR_SIDE]
+    for side in berth_solver.SIDES:
+        usable = (door_side == side) | (door_side == berth_solver.BOTH)
+        total = np.zeros((len(doors) + 1, minutes), dtype=np.int32)
+        np.cumsum(reached & usable[:, None], axis=0, out=total[1:])
+        mask[:, side] = total[ends] > total[ends - counts]
+    return mask
+
+# [start, end) seconds from the first minute of every run of True in a mask
+# row
+def windows(mask: np.ndarray) -> np.ndarray:
+    edges = np.flatnonzero(np.diff(np.concatenate(([False], mask, [False])).astype(np.int8)))
+    return edges.reshape(-1, 2) * MINUTE